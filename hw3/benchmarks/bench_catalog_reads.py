@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.db_manager import DBManager
+
+NUM_GAMES = 200
+NUM_READERS = 4
+DURATION = 2.0
+
+def make_db(data_dir):
+    db = DBManager(data_dir)
+    for i in range(NUM_GAMES):
+        db.add_game_update("bench_dev", {
+            "game_id": f"game_{i}",
+            "name": f"Game {i}",
+            "version": "1.0.0",
+            "description": "x" * 200,
+            "type": "CLI"
+        })
+    return db
+
+def run(db, with_writer):
+    stop = threading.Event()
+    reads = [0] * NUM_READERS
+    writes = [0]
+
+    def reader(idx):
+        n = 0
+        while not stop.is_set():
+            db.get_all_games()
+            db.get_game("game_7")
+            n += 1
+        reads[idx] = n
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            db.add_review(f"game_{i % NUM_GAMES}", "bench_player", 5, "nice")
+            i += 1
+        writes[0] = i
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(NUM_READERS)]
+    if with_writer:
+        threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(reads) / DURATION, writes[0] / DURATION
+
+def main():
+    data_dir = tempfile.mkdtemp(prefix="bench_catalog_")
+    try:
+        db = make_db(data_dir)
+        print(f"=== Catalog read benchmark ({NUM_GAMES} games, {NUM_READERS} readers, {DURATION}s) ===")
+        r, _ = run(db, with_writer=False)
+        print(f"Reads only:          {r:12.0f} reads/s")
+        r, w = run(db, with_writer=True)
+        print(f"Reads + 1 writer:    {r:12.0f} reads/s  ({w:.0f} writes/s, each a full JSON save)")
+    finally:
+        shutil.rmtree(data_dir)
+
+if __name__ == "__main__":
+    main()
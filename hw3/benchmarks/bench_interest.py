@@ -0,0 +1,146 @@
+import sys
+import os
+import random
+import struct
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.game_sdk import InterestGrid, OutboundQueue
+
+CLIENTS = 500
+ENTITIES = 50000
+TICKS = 20
+WORLD = 5000.0       # square side
+VIEW = 100.0         # view radius
+CELL = 50.0
+MOVING = 0.20        # share of entities that move each tick
+SPEED = 4.0          # units per tick
+UPDATE = struct.Struct(">Iff") # entity id, x, y
+
+def make_world(rng):
+    entities = {k: [rng.uniform(0, WORLD), rng.uniform(0, WORLD)] for k in range(ENTITIES)}
+    clients = {c: [rng.uniform(0, WORLD), rng.uniform(0, WORLD)] for c in range(CLIENTS)}
+    return entities, clients
+
+def step(rng, entities, clients):
+    """Moves a share of the entities and every client; returns the ids that moved."""
+    moved = rng.sample(range(ENTITIES), int(ENTITIES * MOVING))
+    for k in moved:
+        pos = entities[k]
+        pos[0] = min(max(pos[0] + rng.uniform(-SPEED, SPEED), 0), WORLD)
+        pos[1] = min(max(pos[1] + rng.uniform(-SPEED, SPEED), 0), WORLD)
+    for pos in clients.values():
+        pos[0] = min(max(pos[0] + rng.uniform(-SPEED, SPEED), 0), WORLD)
+        pos[1] = min(max(pos[1] + rng.uniform(-SPEED, SPEED), 0), WORLD)
+    return moved
+
+def queues():
+    return {c: OutboundQueue(max_bytes=1 << 30, max_messages=1 << 30) for c in range(CLIENTS)}
+
+def drain(outq):
+    total = sum(q.nbytes for q in outq.values())
+    for q in outq.values():
+        q.frames.clear()
+        q.nbytes = 0
+    return total
+
+def broadcast_all(ticks):
+    """Every update to every client, as the test game does today."""
+    rng = random.Random(1)
+    entities, clients = make_world(rng)
+    outq = queues()
+    sent = 0
+    elapsed = 0.0
+    for _ in range(ticks):
+        moved = step(rng, entities, clients)
+        t0 = time.perf_counter()
+        for k in moved:
+            data = UPDATE.pack(k, *entities[k])
+            for q in outq.values():
+                q.push(data)
+        elapsed += time.perf_counter() - t0
+        sent += drain(outq)
+    return elapsed / ticks, sent / ticks
+
+def rescan(ticks):
+    """Filtered, but every client's relevant set recomputed from the grid each tick."""
+    rng = random.Random(1)
+    entities, clients = make_world(rng)
+    outq = queues()
+    sent = 0
+    elapsed = 0.0
+    reach = int(-(-VIEW // CELL))
+    for _ in range(ticks):
+        moved = step(rng, entities, clients)
+        t0 = time.perf_counter()
+        grid = {}
+        for k, (x, y) in entities.items():
+            grid.setdefault((int(x // CELL), int(y // CELL)), []).append(k)
+        watchers = {}
+        for c, (x, y) in clients.items():
+            cx, cy = int(x // CELL), int(y // CELL)
+            for dx in range(-reach, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    for k in grid.get((cx + dx, cy + dy), ()):
+                        watchers.setdefault(k, []).append(c)
+        for k in moved:
+            data = UPDATE.pack(k, *entities[k])
+            for c in watchers.get(k, ()):
+                outq[c].push(data)
+        elapsed += time.perf_counter() - t0
+        sent += drain(outq)
+    return elapsed / ticks, sent / ticks
+
+def incremental(ticks):
+    """InterestGrid: positions updated in place, updates only to watchers."""
+    rng = random.Random(1)
+    entities, clients = make_world(rng)
+    outq = queues()
+    grid = InterestGrid(CELL, VIEW)
+    t0 = time.perf_counter()
+    for k, (x, y) in entities.items():
+        grid.set_entity(k, x, y)
+    for c, (x, y) in clients.items():
+        grid.set_viewer(c, x, y)
+    grid.pop_changes()
+    build = time.perf_counter() - t0
+    sent = changes = 0
+    elapsed = 0.0
+    for _ in range(ticks):
+        moved = step(rng, entities, clients)
+        t0 = time.perf_counter()
+        for c, (x, y) in clients.items():
+            grid.set_viewer(c, x, y)
+        for k in moved:
+            x, y = entities[k]
+            grid.set_entity(k, x, y)
+            data = UPDATE.pack(k, x, y)
+            for c in grid.watchers(k):
+                outq[c].push(data)
+        for c, (entered, left) in grid.pop_changes().items():
+            changes += len(entered) + len(left) # spawn/despawn messages would go here
+        elapsed += time.perf_counter() - t0
+        sent += drain(outq)
+    relevant = sum(len(grid.relevant(c)) for c in clients) / CLIENTS
+    return elapsed / ticks, sent / ticks, build, relevant, changes / ticks
+
+def main():
+    moving = int(ENTITIES * MOVING)
+    print(f"=== Interest management: {CLIENTS} clients, {ENTITIES} entities ({moving} moving per tick), "
+          f"view radius {VIEW:.0f} in a {WORLD:.0f}x{WORLD:.0f} world ===")
+    inc, inc_bytes, build, relevant, changes = incremental(TICKS)
+    scan, scan_bytes = rescan(TICKS)
+    # Broadcasting everything is slow enough that a few ticks tell the story
+    full, full_bytes = broadcast_all(2)
+    print(f"broadcast to all   {full * 1000:8.1f} ms/tick  {full_bytes / 1e6:8.2f} MB/tick queued")
+    print(f"rescan per tick    {scan * 1000:8.1f} ms/tick  {scan_bytes / 1e6:8.2f} MB/tick queued")
+    print(f"InterestGrid       {inc * 1000:8.1f} ms/tick  {inc_bytes / 1e6:8.2f} MB/tick queued  "
+          f"(built in {build * 1000:.0f} ms, {relevant:.0f} entities relevant per client, "
+          f"{changes:.0f} enter/leave per tick)")
+    print(f"-> {full_bytes / inc_bytes:.0f}x less outbound data and {full / inc:.0f}x less CPU than broadcast, "
+          f"{scan / inc:.1f}x less CPU than rescanning")
+
+if __name__ == "__main__":
+    main()
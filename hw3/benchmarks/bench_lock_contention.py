@@ -0,0 +1,77 @@
+import sys
+import os
+import time
+import random
+import shutil
+import tempfile
+import threading
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.db_manager import DBManager
+from server.game_manager import GameManager
+
+NUM_GAMES = 100
+DURATION = 2.0
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+def make_managers(data_dir):
+    db = DBManager(data_dir, kdf_iterations=1000, hash_workers=0)
+    for i in range(NUM_GAMES):
+        db.add_game_update("bench_dev", {"game_id": f"game_{i}", "name": f"Game {i}",
+                                         "version": "1.0.0", "description": "", "type": "CLI"})
+    return db, GameManager()
+
+def run(db, gm, num_threads, run_id):
+    stop = threading.Event()
+    ops = [0] * num_threads
+
+    def worker(idx):
+        rnd = random.Random(idx)
+        n = 0
+        while not stop.is_set():
+            roll = rnd.random()
+            game_id = f"game_{rnd.randrange(NUM_GAMES)}"
+            if roll < 0.3:
+                db.add_review(game_id, f"p{idx}", 5, "")
+            elif roll < 0.4:
+                db.register_user("players", f"u_{run_id}_{idx}_{n}", "pw")
+            elif roll < 0.7:
+                db.get_game(game_id)
+                db.get_all_games()
+            else:
+                room_id = gm.create_room(f"p{idx}", game_id, {})
+                gm.join_room(room_id, f"q{idx}")
+                gm.list_rooms()
+                gm.end_game(room_id)
+            n += 1
+        ops[idx] = n
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(ops) / DURATION
+
+def main():
+    print(f"=== Mixed-load contention benchmark ({NUM_GAMES} games, {DURATION}s per run, "
+          f"{os.cpu_count()} CPUs) ===")
+    print("30% reviews, 10% registrations, 30% catalog reads, 30% room create/join/list/end")
+    base = None
+    for n in THREAD_COUNTS:
+        # Fresh data per run so file sizes are comparable
+        data_dir = tempfile.mkdtemp(prefix="bench_locks_")
+        try:
+            db, gm = make_managers(data_dir)
+            rate = run(db, gm, n, n)
+        finally:
+            shutil.rmtree(data_dir)
+        base = base or rate
+        print(f"{n:3d} threads: {rate:10.0f} ops/s  (x{rate / base:.2f})")
+
+if __name__ == "__main__":
+    main()
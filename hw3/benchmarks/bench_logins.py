@@ -0,0 +1,91 @@
+import sys
+import os
+import time
+import random
+import shutil
+import tempfile
+import threading
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.db_manager import DBManager
+
+KDF_ITERATIONS = 200000
+NUM_USERS = 200
+LOGIN_THREADS = 16
+DURATION = 3.0
+TARGET = 1000 # logins/s
+OFFERED = 1500 # logins/s offered by the client threads (open loop)
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+def run(db, label):
+    stop = threading.Event()
+    logins = [0] * LOGIN_THREADS
+    other_latency = []
+
+    def login_worker(idx):
+        # Paced like real clients; a thread only falls behind when logins are slow
+        rnd = random.Random(idx)
+        interval = LOGIN_THREADS / OFFERED
+        next_at = time.perf_counter()
+        n = 0
+        while not stop.is_set():
+            user = f"user_{rnd.randrange(NUM_USERS)}"
+            assert db.validate_user("players", user, "pw-" + user)
+            n += 1
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        logins[idx] = n
+
+    def other_commands():
+        # Stands in for STORE_LIST / ROOM_LIST traffic sharing the server
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            db.get_all_games()
+            db.add_review("bench_game", "someone", 5, "")
+            other_latency.append(time.perf_counter() - t0)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(LOGIN_THREADS)]
+    threads.append(threading.Thread(target=other_commands))
+    for t in threads:
+        t.start()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    rate = sum(logins) / DURATION
+    verdict = "OK" if rate >= TARGET else "below target"
+    print(f"{label:32s} {rate:10.0f} logins/s ({verdict})  "
+          f"other cmds p50={percentile(other_latency, 0.5) * 1000:.1f}ms "
+          f"p99={percentile(other_latency, 0.99) * 1000:.1f}ms")
+
+def main():
+    data_dir = tempfile.mkdtemp(prefix="bench_logins_")
+    db = DBManager(data_dir, kdf_iterations=KDF_ITERATIONS, login_cache_ttl=0)
+    try:
+        print(f"=== Login benchmark ({NUM_USERS} users, {LOGIN_THREADS} threads, {OFFERED} offered/s, "
+              f"{KDF_ITERATIONS} PBKDF2 iterations, {db.verifier.max_workers} hash workers) ===")
+        for i in range(NUM_USERS):
+            db.register_user("players", f"user_{i}", f"pw-user_{i}")
+        db.add_game_update("bench_dev", {"game_id": "bench_game", "name": "Bench",
+                                         "version": "1.0.0", "description": "", "type": "CLI"})
+
+        run(db, "Cold (every login hashes):")
+        db.verifier.cache_ttl = 60
+        for i in range(NUM_USERS):
+            db.validate_user("players", f"user_{i}", f"pw-user_{i}")
+        run(db, "Warm (verification cache):")
+    finally:
+        db.verifier.shutdown()
+        shutil.rmtree(data_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+import random
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.matchmaker import Matchmaker
+
+NUM_PLAYERS = 10000
+NUM_GAMES = 20
+CANCEL_FRACTION = 0.2
+
+def make_games(rnd):
+    games = []
+    for i in range(NUM_GAMES):
+        min_players = rnd.randint(1, 4)
+        games.append({"game_id": f"game_{i}", "version": "1.0",
+                      "min_players": min_players, "max_players": min_players + rnd.randint(0, 4)})
+    return games
+
+def main():
+    rnd = random.Random(42)
+    games = make_games(rnd)
+    assignments = [(f"player_{i}", rnd.choice(games)) for i in range(NUM_PLAYERS)]
+    mm = Matchmaker(None, lambda username, message: None, fill_wait=0)
+    mm._thread = object() # never start the tick thread; form_matches is driven below
+
+    print(f"=== Matchmaker benchmark ({NUM_PLAYERS} players, {NUM_GAMES} game queues) ===")
+    t0 = time.perf_counter()
+    for username, game in assignments:
+        mm.enqueue(username, game)
+    elapsed = time.perf_counter() - t0
+    print(f"Enqueue: {elapsed * 1000:.1f}ms ({elapsed / NUM_PLAYERS * 1e6:.2f} us per player)")
+
+    cancelled = rnd.sample([u for u, _ in assignments], int(NUM_PLAYERS * CANCEL_FRACTION))
+    t0 = time.perf_counter()
+    for username in cancelled:
+        mm.cancel(username)
+    elapsed = time.perf_counter() - t0
+    print(f"Cancel:  {elapsed * 1000:.1f}ms ({elapsed / len(cancelled) * 1e6:.2f} us per player, "
+          f"{len(cancelled)} from the middle of queues)")
+
+    queued = mm.queued()
+    t0 = time.perf_counter()
+    batches = mm.form_matches()
+    elapsed = time.perf_counter() - t0
+    matched = sum(len(players) for _, players in batches)
+    print(f"Form matches: {elapsed * 1000:.1f}ms for {queued} queued -> {len(batches)} rooms, "
+          f"{matched} players ({elapsed / max(matched, 1) * 1e6:.2f} us per matched player)")
+
+    # Steady state: a tick with a trickle of new players in every queue
+    for i in range(NUM_GAMES * 4):
+        mm.enqueue(f"late_{i}", games[i % NUM_GAMES])
+    t0 = time.perf_counter()
+    mm.form_matches()
+    print(f"Tick with {NUM_GAMES * 4} new players: {(time.perf_counter() - t0) * 1000:.3f}ms")
+
+if __name__ == "__main__":
+    main()
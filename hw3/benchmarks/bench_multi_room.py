@@ -0,0 +1,57 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.game_manager import GameManager
+from server.resource_monitor import read_proc_usage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MATCHES = 20
+
+def run(config):
+    """Starts MATCHES template matches; returns (seconds, total RSS of the game processes)."""
+    gm = GameManager(port_ranges=[(9800, 9800 + MATCHES)], port_quarantine=0)
+    rooms = []
+    try:
+        t0 = time.perf_counter()
+        for i in range(MATCHES):
+            room_id = gm.create_room(f"host{i}", "template", dict(config))
+            ok, info = gm.start_game(room_id, f"host{i}")
+            if not ok:
+                raise RuntimeError(info)
+            rooms.append(room_id)
+        elapsed = time.perf_counter() - t0
+        pids = {gm.rooms[r].process.pid for r in rooms}
+        rss = sum((read_proc_usage(pid) or (0, 0))[1] for pid in pids)
+        return elapsed, rss, len(pids)
+    finally:
+        for room_id in rooms:
+            gm.end_game(room_id)
+        for runner in gm.runners.runners():
+            runner.retire()
+        gm.shutdown()
+
+def main():
+    workdir = tempfile.mkdtemp()
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(workdir, "server_data", "games", "template"))
+    os.chdir(workdir)
+    print(f"=== Hosting benchmark ({MATCHES} template matches) ===")
+    try:
+        for label, config in (("process per match", {"version": "1.0"}),
+                              ("multi-room runner", {"version": "1.0", "hosting": "multi_room"})):
+            elapsed, rss, processes = run(config)
+            print(f"{label:18s} start={elapsed / MATCHES * 1000:.1f}ms/match  processes={processes:2d}  "
+                  f"rss={rss / 2**20:.1f}MB ({rss / MATCHES / 2**20:.2f}MB per match)")
+            time.sleep(0.5) # terminated game servers release their ports
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
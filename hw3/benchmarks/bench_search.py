@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import random
+import string
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.search_index import SearchIndex
+
+NUM_GAMES = 100000
+VOCAB_SIZE = 20000
+QUERIES_PER_KIND = 200
+TYPES = ["CLI", "GUI", "Puzzle", "Strategy", "Arcade"]
+
+def make_vocab(rnd):
+    words = set()
+    while len(words) < VOCAB_SIZE:
+        words.add("".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(4, 9))))
+    return sorted(words)
+
+def make_game(rnd, vocab, i):
+    return {
+        "game_id": f"game_{i}",
+        "name": " ".join(rnd.choice(vocab) for _ in range(rnd.randint(1, 3))),
+        "description": " ".join(rnd.choice(vocab) for _ in range(12)),
+        "type": rnd.choice(TYPES),
+        "reviews": [{"comment": " ".join(rnd.choice(vocab) for _ in range(5))}]
+    }
+
+def measure(index, queries, **kwargs):
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q, **kwargs)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+def main():
+    rnd = random.Random(42)
+    vocab = make_vocab(rnd)
+    index = SearchIndex()
+
+    t0 = time.perf_counter()
+    for i in range(NUM_GAMES):
+        index.update_game(f"game_{i}", make_game(rnd, vocab, i))
+    build = time.perf_counter() - t0
+    print(f"=== Search benchmark ({NUM_GAMES} games, {VOCAB_SIZE} word vocabulary) ===")
+    print(f"Index build: {build:.1f}s ({build / NUM_GAMES * 1e6:.0f} us per game)")
+
+    t0 = time.perf_counter()
+    for i in range(1000):
+        index.update_game(f"game_{i}", make_game(rnd, vocab, i))
+    print(f"Incremental update: {(time.perf_counter() - t0) / 1000 * 1e6:.0f} us per game")
+
+    kinds = {
+        "one word": [rnd.choice(vocab) for _ in range(QUERIES_PER_KIND)],
+        "two words (AND)": [f"{rnd.choice(vocab)} {rnd.choice(vocab)}" for _ in range(QUERIES_PER_KIND)],
+        "4-letter prefix": [rnd.choice(vocab)[:4] for _ in range(QUERIES_PER_KIND)],
+        "word + type": [f"{rnd.choice(vocab)} {rnd.choice(TYPES)}" for _ in range(QUERIES_PER_KIND)],
+    }
+    for label, queries in kinds.items():
+        p50, p99 = measure(index, queries)
+        print(f"{label:22s} p50={p50:.3f}ms p99={p99:.3f}ms")
+    p50, p99 = measure(index, kinds["one word"], include_reviews=True)
+    print(f"{'one word + reviews':22s} p50={p50:.3f}ms p99={p99:.3f}ms")
+    p50, p99 = measure(index, [rnd.choice(TYPES) for _ in range(20)])
+    print(f"{'type only (~20k hits)':22s} p50={p50:.3f}ms p99={p99:.3f}ms  (broad query, not sub-ms)")
+
+if __name__ == "__main__":
+    main()
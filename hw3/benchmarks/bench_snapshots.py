@@ -0,0 +1,94 @@
+import sys
+import os
+import json
+import random
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.game_sdk import ClientBaseline, Schema, SnapshotDecoder, SnapshotHistory
+
+ENTITIES = 1000
+CLIENTS = 32
+TICKS = 200
+MOVING = 0.10     # share of entities that move each tick
+HURT = 0.02       # share whose hp changes
+ACK_LAG = (1, 4)  # ticks until a client's ack arrives
+ACK_LOSS = 0.05
+
+SCHEMA = Schema(x="f", y="f", vx="f", vy="f", hp="H", kind="B", team="B")
+
+def make_world(rng):
+    return {i: {"x": rng.uniform(0, 1000), "y": rng.uniform(0, 1000), "vx": 0.0, "vy": 0.0,
+                "hp": 100, "kind": rng.randrange(8), "team": rng.randrange(2)}
+            for i in range(ENTITIES)}
+
+def step(world, rng, tick):
+    ids = list(world)
+    for entity_id in rng.sample(ids, int(len(ids) * MOVING)):
+        entity = world[entity_id]
+        entity["vx"] = rng.uniform(-5, 5)
+        entity["vy"] = rng.uniform(-5, 5)
+        entity["x"] += entity["vx"]
+        entity["y"] += entity["vy"]
+    for entity_id in rng.sample(ids, int(len(ids) * HURT)):
+        world[entity_id]["hp"] = max(0, world[entity_id]["hp"] - rng.randrange(1, 10))
+    if tick % 5 == 0: # one entity despawns, another spawns
+        del world[rng.choice(ids)]
+        world[ENTITIES + tick] = {"x": 0.0, "y": 0.0, "vx": 0.0, "vy": 0.0, "hp": 100, "kind": 0, "team": 0}
+
+def main():
+    rng = random.Random(1)
+    world = make_world(rng)
+    history = SnapshotHistory(SCHEMA)
+    clients = [(ClientBaseline(), SnapshotDecoder(SCHEMA)) for _ in range(CLIENTS)]
+    in_flight = [] # (arrives at tick, client, seq)
+    full_json = delta_bytes = keyframe_bytes = 0
+    encode_time = naive_time = decode_time = 0.0
+    keyframes = 0
+
+    for tick in range(1, TICKS + 1):
+        step(world, rng, tick)
+        t0 = time.perf_counter()
+        full = json.dumps(world).encode() # what games send today, to every client
+        naive_time += time.perf_counter() - t0
+        full_json += len(full) * CLIENTS
+
+        t0 = time.perf_counter()
+        history.capture(world)
+        packets = [history.encode_for(baseline) for baseline, _ in clients]
+        encode_time += time.perf_counter() - t0
+
+        for (baseline, decoder), data in zip(clients, packets):
+            t0 = time.perf_counter()
+            seq, state = decoder.decode(data)
+            decode_time += time.perf_counter() - t0
+            delta_bytes += len(data)
+            if data[0] == 0:
+                keyframes += 1
+                keyframe_bytes += len(data)
+            if rng.random() >= ACK_LOSS:
+                in_flight.append((tick + rng.randint(*ACK_LAG), baseline, seq))
+        for item in [i for i in in_flight if i[0] <= tick]:
+            in_flight.remove(item)
+            item[1].ack(item[2])
+
+    # The last decoded state is the world, to float32 precision
+    _, state = clients[0][1].decode(history.encode(0))
+    assert state.keys() == world.keys()
+
+    sends = TICKS * CLIENTS
+    print(f"=== Snapshot sync: {ENTITIES} entities, {CLIENTS} clients, {TICKS} ticks, "
+          f"{MOVING:.0%} moving per tick ===")
+    print(f"full JSON state   {full_json / sends:9.0f} bytes/client/tick  "
+          f"serialize {naive_time / TICKS * 1000:6.2f} ms/tick")
+    print(f"binary keyframe   {keyframe_bytes / max(keyframes, 1):9.0f} bytes  ({keyframes} sent)")
+    print(f"delta snapshots   {delta_bytes / sends:9.0f} bytes/client/tick  "
+          f"encode {encode_time / TICKS * 1000:6.2f} ms/tick for all clients, "
+          f"decode {decode_time / sends * 1000:5.2f} ms/client")
+    print(f"-> {full_json / delta_bytes:.1f}x less bandwidth than full JSON state, "
+          f"{keyframe_bytes / max(keyframes, 1) * sends / delta_bytes:.1f}x less than a binary keyframe every tick")
+
+if __name__ == "__main__":
+    main()
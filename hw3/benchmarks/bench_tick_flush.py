@@ -0,0 +1,88 @@
+import sys
+import os
+import selectors
+import socket
+import threading
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.game_sdk import GameServer
+
+PLAYERS = (16, 64, 256)
+ROUNDS = 10        # every player sends one chat line per round
+ROUND_GAP = 0.05   # 20 lines per second per player
+TICK_RATE = 20
+LINE = b"x" * 30
+
+class ChatBench(GameServer):
+    host = "127.0.0.1"
+    max_queue_bytes = 4 * 1024 * 1024 # nothing may be dropped: both modes deliver everything
+
+    def on_start(self):
+        self.cpu_start = time.thread_time()
+
+    def on_message(self, conn, message):
+        self.broadcast(message)
+
+    def on_stop(self):
+        self.cpu = time.thread_time() - self.cpu_start
+
+def run(players, tick_rate):
+    """One chat room; returns (server CPU seconds, write syscalls, bytes delivered)."""
+    server = ChatBench(port=0)
+    server.tick_rate = tick_rate
+    server.listen()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    clients = [socket.create_connection(("127.0.0.1", server.port)) for _ in range(players)]
+    while len(server.connections) < players:
+        time.sleep(0.01)
+
+    expected = players * players * ROUNDS * (len(LINE) + 1)
+    received = [0]
+    sel = selectors.DefaultSelector()
+    for s in clients:
+        s.setblocking(False)
+        sel.register(s, selectors.EVENT_READ)
+
+    def drain():
+        while received[0] < expected:
+            for key, _ in sel.select(5):
+                try:
+                    received[0] += len(key.fileobj.recv(1 << 16))
+                except BlockingIOError:
+                    pass
+    reader = threading.Thread(target=drain)
+    reader.start()
+    for _ in range(ROUNDS):
+        for s in clients:
+            s.send(LINE + b"\n")
+        time.sleep(ROUND_GAP)
+    reader.join(timeout=120)
+
+    writes = server.metrics()["writes"]
+    server.call_threadsafe(server.stop)
+    thread.join()
+    for s in clients:
+        s.close()
+    sel.close()
+    return server.cpu, writes, received[0]
+
+def main():
+    print(f"=== Chat broadcast: immediate writes vs {TICK_RATE} Hz tick flush "
+          f"({ROUNDS} lines per player, {1 / ROUND_GAP:.0f}/s) ===")
+    for players in PLAYERS:
+        results = {}
+        for label, tick_rate in (("immediate", None), ("tick", TICK_RATE)):
+            cpu, writes, delivered = run(players, tick_rate)
+            results[label] = (cpu, writes)
+            print(f"{players:3d} players {label:9s} cpu={cpu:6.3f}s  writes={writes:7d}  "
+                  f"bytes/write={delivered / max(writes, 1):8.0f}")
+        (cpu_i, writes_i), (cpu_t, writes_t) = results["immediate"], results["tick"]
+        print(f"{players:3d} players  -> {writes_i / max(writes_t, 1):.0f}x fewer writes, "
+              f"{cpu_i / max(cpu_t, 1e-9):.1f}x less server CPU")
+
+if __name__ == "__main__":
+    main()
@@ -40,43 +40,25 @@ def create_game_template(base_dir="games"):
         json.dump(config, f, indent=4)
 
     # 2. server.py template
-    server_code = """import sys
-import socket
-import threading
+    server_code = """# Usage: python server.py <port>
+# The lobby puts the repository root on PYTHONPATH, so the SDK is importable.
+from shared.game_sdk import GameServer
 
-# Argument 1: Port
-if len(sys.argv) < 2:
-    print("Usage: python server.py <port>")
-    sys.exit(1)
+class Game(GameServer):
+    def on_connect(self, conn):
+        print(f"Game: New connection from {conn.addr}")
+        conn.send(%r)
 
-PORT = int(sys.argv[1])
-HOST = '0.0.0.0'
-
-def handle_client(conn, addr):
-    print(f"Game: New connection from {addr}")
-    conn.sendall(b"Welcome to " + b"%s" + b"!\\n")
-    while True:
-        data = conn.recv(1024)
-        if not data:
-            break
+    def on_message(self, conn, message):
         # Echo
-        conn.sendall(b"Echo: " + data)
-    conn.close()
+        conn.send(b"Echo: " + message)
 
-def main():
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.bind((HOST, PORT))
-    s.listen()
-    print(f"Game Server listening on {PORT}")
-    
-    while True:
-        conn, addr = s.accept()
-        t = threading.Thread(target=handle_client, args=(conn, addr))
-        t.start()
+    def on_disconnect(self, conn):
+        print(f"Game: {conn.addr} left")
 
 if __name__ == "__main__":
-    main()
-""" % game_name.encode()
+    Game.main()
+""" % f"Welcome to {game_name}!"
 
     with open(os.path.join(target_dir, "server.py"), 'w') as f:
         f.write(server_code)
@@ -139,7 +121,7 @@ if __name__ == "__main__":
     print("NEXT STEPS:")
     print(f"1. Open the folder '{target_dir}' to see the files.")
     print("2. 'config.json' : Game settings (name, version, etc.)")
-    print("3. 'server.py'   : The logic that runs on the Game Server.")
+    print("3. 'server.py'   : The logic that runs on the Game Server (a shared.game_sdk.GameServer).")
     print("4. 'client.py'   : The logic that runs on the Player's terminal.")
     print("-------------------------------------------------------")
     
@@ -0,0 +1,15 @@
+# Multi-room version of server.py: the lobby hosts every match of this game
+# in one process (config.json "hosting": "multi_room"). server.py is still
+# used where multi-room hosting is unavailable.
+
+class GameRoom:
+    def __init__(self, room):
+        self.room = room
+
+    def on_connect(self, client):
+        print(f"Game: New connection from {client.addr} in room {self.room.room_id}")
+        client.send(b"Welcome to the Dummy Game Server!\n")
+
+    def on_data(self, client, data):
+        # Echo
+        client.send(b"Echo: " + data)
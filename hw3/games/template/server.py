@@ -1,36 +1,15 @@
-import sys
-import socket
-import threading
+# Usage: python server.py <port>
+# The lobby puts the repository root on PYTHONPATH, so the SDK is importable.
+from shared.game_sdk import GameServer
 
-# Argument 1: Port
-if len(sys.argv) < 2:
-    print("Usage: python server.py <port>")
-    sys.exit(1)
+class EchoServer(GameServer):
+    def on_connect(self, conn):
+        print(f"Game: New connection from {conn.addr}")
+        conn.send(b"Welcome to the Dummy Game Server!")
 
-PORT = int(sys.argv[1])
-HOST = '0.0.0.0'
-
-def handle_client(conn, addr):
-    print(f"Game: New connection from {addr}")
-    conn.sendall(b"Welcome to the Dummy Game Server!\n")
-    while True:
-        data = conn.recv(1024)
-        if not data:
-            break
+    def on_message(self, conn, message):
         # Echo
-        conn.sendall(b"Echo: " + data)
-    conn.close()
-
-def main():
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.bind((HOST, PORT))
-    s.listen()
-    print(f"Game Server listening on {PORT}")
-    
-    while True:
-        conn, addr = s.accept()
-        t = threading.Thread(target=handle_client, args=(conn, addr))
-        t.start()
+        conn.send(b"Echo: " + message)
 
 if __name__ == "__main__":
-    main()
+    EchoServer.main()
@@ -3,14 +3,19 @@ import os
 import json
 import sys
 
+# Game clients may use shared/ (e.g. shared.game_sdk framing), like their servers
+SDK_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class GameLauncher:
     def __init__(self, downloads_dir="downloads"):
         self.downloads_dir = downloads_dir
 
-    def launch(self, user_downloads_dir, game_id, ip, port, username):
+    def launch(self, user_downloads_dir, game_id, ip, port, username, transports=None):
         """
         Launches the game client.
         user_downloads_dir: path like "player/downloads/Player1"
+        transports: what the game server offers (GAME_START "transports"),
+        passed to the client as GAME_TRANSPORTS, e.g. "tcp,udp"
         """
         game_path = os.path.join(user_downloads_dir, game_id)
         if not os.path.exists(game_path):
@@ -44,7 +49,9 @@ class GameLauncher:
         try:
             # Creation flags for separate window on Windows
             creationflags = subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0
-            subprocess.Popen(cmd, cwd=game_path, creationflags=creationflags)
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SDK_ROOT, os.environ.get("PYTHONPATH")])),
+                       GAME_TRANSPORTS=",".join(transports or ["tcp"]))
+            subprocess.Popen(cmd, cwd=game_path, creationflags=creationflags, env=env)
             return True
         except Exception as e:
             print(f"Failed to launch: {e}")
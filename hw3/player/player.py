@@ -33,6 +33,8 @@ class PlayerClient:
         self.username = None
         self.downloads_root = os.path.join(os.path.dirname(__file__), "downloads")
         self.launcher = GameLauncher(self.downloads_root)
+        # Store responses keyed by (command, game_id) -> (revision, response)
+        self.catalog_cache = {}
 
     def connect(self):
         try:
@@ -53,6 +55,24 @@ class PlayerClient:
     def recv_response(self):
         return utils.recv_json(self.sock)
 
+    def catalog_request(self, command, payload):
+        """
+        STORE_LIST / GAME_DETAIL with revision revalidation.
+        Sends the last seen catalog revision; on NOT_MODIFIED the cached
+        response is returned instead of downloading the catalog again.
+        """
+        key = (command, payload.get("game_id"))
+        cached = self.catalog_cache.get(key)
+        if cached:
+            payload = dict(payload, **{FIELD_REVISION: cached[0]})
+        self.send_request(command, payload)
+        resp = self.recv_response()
+        if resp.get(FIELD_STATUS) == STATUS_NOT_MODIFIED and cached:
+            return cached[1]
+        if resp.get(FIELD_STATUS) == STATUS_OK and FIELD_REVISION in resp:
+            self.catalog_cache[key] = (resp[FIELD_REVISION], resp)
+        return resp
+
     def main_loop(self):
         if not self.connect():
             return
@@ -118,17 +138,44 @@ class PlayerClient:
             self.username = None
 
     def menu_store(self):
-        self.send_request(CMD_STORE_LIST, {})
-        resp = self.recv_response()
+        resp = self.catalog_request(CMD_STORE_LIST, {})
         games = resp.get(FIELD_PAYLOAD, [])
         print("\n--- Game Store ---")
         for g in games:
             print(f"ID: {g.get('game_id')} | Name: {g.get('name')} | v{g.get('version')}")
         
-        choice = input("\nEnter Game ID to download or 'b' to back: ")
-        if choice and choice != 'b':
+        choice = input("\nEnter Game ID to download, 's' to search or 'b' to back: ")
+        if choice == 's':
+            self.search_store()
+        elif choice and choice != 'b':
             self.download_game(choice)
 
+    def search_store(self):
+        query = input("Search: ").strip()
+        if not query:
+            return
+        offset = 0
+        while offset is not None:
+            self.send_request(CMD_STORE_SEARCH, {"query": query, "offset": offset, "limit": 10})
+            resp = self.recv_response()
+            if resp.get(FIELD_STATUS) != STATUS_OK:
+                print(f"Search failed: {resp.get(FIELD_MESSAGE)}")
+                return
+            page = resp.get(FIELD_PAYLOAD, {})
+            print(f"\n--- Search results for '{query}' ({page.get('total', 0)} found) ---")
+            for g in page.get("results", []):
+                print(f"ID: {g.get('game_id')} | Name: {g.get('name')} | v{g.get('version')}")
+
+            offset = page.get("next_offset")
+            prompt = "\nEnter Game ID to download, 'n' for next page or 'b' to back: " if offset is not None \
+                else "\nEnter Game ID to download or 'b' to back: "
+            choice = input(prompt)
+            if choice == 'n' and offset is not None:
+                continue
+            if choice and choice not in ('b', 'n'):
+                self.download_game(choice)
+            return
+
     def game_detail(self, game):
         print(f"\nTitle: {game['name']}")
         print(f"Desc: {game['description']}")
@@ -204,18 +251,31 @@ class PlayerClient:
         print("\n--- Room Menu ---")
         print("1. List/Join Rooms")
         print("2. Create Room")
-        print("3. Back")
+        print("3. Quick Match")
+        print("4. Back")
         choice = input("Choice: ")
         
         if choice == '1':
             self.list_rooms()
         elif choice == '2':
             self.create_room()
+        elif choice == '3':
+            self.quick_match()
+
+    def fetch_rooms(self, **filters):
+        """All rooms matching the ROOM_LIST filters (game_id, status), page by page."""
+        rooms = []
+        cursor = None
+        while True:
+            self.send_request(CMD_ROOM_LIST, dict(filters, cursor=cursor))
+            resp = self.recv_response()
+            rooms.extend(resp.get(FIELD_PAYLOAD) or [])
+            cursor = resp.get("next_cursor")
+            if cursor is None:
+                return rooms
 
     def list_join_rooms(self):
-        self.send_request(CMD_ROOM_LIST, {})
-        resp = self.recv_response()
-        rooms = resp.get(FIELD_PAYLOAD, [])
+        rooms = self.fetch_rooms()
         
         print("\n--- Rooms ---")
         for i, r in enumerate(rooms):
@@ -232,9 +292,7 @@ class PlayerClient:
             pass
 
     def list_rooms(self):
-        self.send_request(CMD_ROOM_LIST, {})
-        resp = self.recv_response()
-        rooms = resp.get(FIELD_PAYLOAD, [])
+        rooms = self.fetch_rooms()
         print("\n--- Rooms ---")
         for r in rooms:
             print(f"{r['id']}. {r['game_id']} ({r['status']}) - {r['players']} players (Host: {r['host']})")
@@ -273,8 +331,7 @@ class PlayerClient:
             local_version = "0.0.0"
 
         # Get Server Version
-        self.send_request(CMD_GAME_DETAIL, {"game_id": game_id})
-        resp = self.recv_response()
+        resp = self.catalog_request(CMD_GAME_DETAIL, {"game_id": game_id})
         
         if resp.get(FIELD_STATUS) == STATUS_OK:
             server_game = resp.get(FIELD_PAYLOAD)
@@ -370,6 +427,62 @@ class PlayerClient:
         else:
             print(f"Error: {resp.get(FIELD_MESSAGE)}")
 
+    def quick_match(self):
+        user_dir = os.path.join(self.downloads_root, self.username)
+        games = [d for d in os.listdir(user_dir) if os.path.isdir(os.path.join(user_dir, d))] \
+            if os.path.exists(user_dir) else []
+        if not games:
+            print("You have no installed games. Please download some first.")
+            return
+        print("\n--- Quick Match: Installed Games ---")
+        for i, g in enumerate(games):
+            print(f"{i+1}. {g} (v{self.get_local_version(g)})")
+        choice = input("\nEnter Game ID or Number: ").strip()
+        gid = games[int(choice) - 1] if choice.isdigit() and 0 < int(choice) <= len(games) else choice
+        if gid not in games:
+            print(f"Game '{gid}' not found in installed games.")
+            return
+
+        # Matched players all run the lobby's current version
+        self.check_game_update(gid)
+
+        self.send_request(CMD_MATCH_QUEUE, {"game_id": gid})
+        resp = self.recv_response()
+        if resp.get(FIELD_STATUS) != STATUS_OK:
+            print(f"Error: {resp.get(FIELD_MESSAGE)}")
+            return
+        info = resp.get(FIELD_PAYLOAD)
+        print(f"Searching for a match ({info['min_players']}-{info['max_players']} players)... Press 'q' to cancel.")
+        self.wait_match(gid)
+
+    def wait_match(self, game_id):
+        import select
+        cancelling = False
+        while True:
+            if not cancelling and msvcrt.kbhit() and msvcrt.getch().decode().lower() == 'q':
+                self.send_request(CMD_MATCH_CANCEL, {})
+                cancelling = True
+            readable, _, _ = select.select([self.sock], [], [], 0.1)
+            if not readable:
+                continue
+            msg = utils.recv_json(self.sock)
+            if not msg:
+                return
+            command = msg.get(FIELD_COMMAND)
+            if command == "GAME_START":
+                info = msg.get(FIELD_PAYLOAD)
+                print(f"Match found! Room {info['room_id']}")
+                self.launch_game(game_id, info['ip'], info['port'], info.get('transports'))
+                if cancelling:
+                    self.recv_response() # the cancel came too late; drop its reply
+                return
+            if command == "MATCH_FAILED":
+                print(f"Match failed: {msg.get(FIELD_MESSAGE)}")
+                return
+            if cancelling and FIELD_STATUS in msg:
+                print("Left the match queue.")
+                return
+
     def wait_room(self, room_id, game_id, is_host):
         print(f"\nIn Room {room_id}. Waiting for game start...")
         print("Host: Press 's' to start. Client: Wait.")
@@ -385,7 +498,7 @@ class PlayerClient:
                     if resp.get(FIELD_STATUS) == STATUS_OK:
                         info = resp.get(FIELD_PAYLOAD)
                         # Launch Game Client
-                        self.launch_game(game_id, info['ip'], info['port'])
+                        self.launch_game(game_id, info['ip'], info['port'], info.get('transports'))
                         # Room status will change to PLAYING
                         # Should we exit loop? Or keep listening?
                         # Probably exit wait_room after launch? 
@@ -434,12 +547,12 @@ class PlayerClient:
                 print(f"DEBUG: Received message in wait_room: {msg.get(FIELD_COMMAND)}")
                 if msg.get(FIELD_COMMAND) == "GAME_START":
                     info = msg.get(FIELD_PAYLOAD)
-                    self.launch_game(game_id, info['ip'], info['port'])
+                    self.launch_game(game_id, info['ip'], info['port'], info.get('transports'))
                     break
 
-    def launch_game(self, game_id, ip, port):
+    def launch_game(self, game_id, ip, port, transports=None):
         user_dir = os.path.join(self.downloads_root, self.username)
-        self.launcher.launch(user_dir, game_id, ip, port, self.username)
+        self.launcher.launch(user_dir, game_id, ip, port, self.username, transports)
 
 if __name__ == "__main__":
     host_ip = "linux2.cs.nycu.edu.tw"
@@ -0,0 +1,187 @@
+import hmac
+import socket
+import threading
+import time
+
+from shared.protocol import *
+import shared.utils as utils
+
+# Agents that miss heartbeats for this long get no new matches
+AGENT_STALE_AFTER = 10.0
+
+def authorize_peer(expected_key, key, peer_ip):
+    """Shared-secret check for agents and admin commands; loopback only without a secret."""
+    if expected_key:
+        return isinstance(key, str) and hmac.compare_digest(key.encode('utf-8'), expected_key.encode('utf-8'))
+    return peer_ip in ("127.0.0.1", "::1")
+
+class RemoteProcess:
+    """
+    Stands in for a Popen of a game server running on a host agent, so
+    rooms, end_game and match_history treat local and remote matches alike.
+    """
+    def __init__(self, agent, room_id, pid):
+        self.agent = agent
+        self.room_id = room_id
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+    def terminate(self):
+        if self.returncode is None:
+            self.agent.kill(self.room_id)
+
+    kill = terminate
+
+class Agent:
+    """Lobby-side record of one registered game host agent."""
+    def __init__(self, agent_id, host, control_port, capacity, sock, key):
+        self.agent_id = agent_id
+        self.host = host
+        self.control_port = control_port
+        self.capacity = capacity
+        self.sock = sock   # the agent's registration connection to the lobby
+        self.key = key
+        self.last_seen = time.monotonic()
+        self.rooms = set() # lobby room ids placed here (maintained by AgentRegistry)
+
+    def load(self):
+        """
+        Lower is better: CPU load per core + fraction of memory in use +
+        fraction of match slots (ports) taken by matches placed here.
+        """
+        cap = self.capacity
+        cpu = cap.get("load", 0.0) / max(1, cap.get("cpus", 1))
+        mem_total = cap.get("mem_total") or 0
+        mem = 1.0 - cap.get("mem_available", 0) / mem_total if mem_total else 0.0
+        slots = max(1, cap.get("ports_total", 1))
+        return cpu + mem + len(self.rooms) / slots
+
+    def has_room_for_match(self):
+        return len(self.rooms) < self.capacity.get("ports_total", 0)
+
+    def _call(self, command, payload, timeout):
+        with socket.create_connection((self.host, self.control_port), timeout=timeout) as s:
+            utils.send_json(s, {FIELD_COMMAND: command, FIELD_TOKEN: self.key, FIELD_PAYLOAD: payload})
+            response = utils.recv_json(s)
+        if response is None:
+            raise ConnectionError(f"Agent {self.agent_id} closed the connection")
+        if response.get(FIELD_STATUS) != STATUS_OK:
+            raise RuntimeError(f"Agent {self.agent_id}: {response.get(FIELD_MESSAGE)}")
+        return response.get(FIELD_PAYLOAD, {})
+
+    def spawn(self, room_id, game_id, game_config, players, timeout):
+        """
+        Starts a match on the agent with the room's game config and players.
+        Returns (RemoteProcess, port, transports) once it listens.
+        """
+        result = self._call(CMD_AGENT_SPAWN,
+                            {"room_id": room_id, "game_id": game_id, "version": game_config.get("version"),
+                             "game_config": game_config, "players": players}, timeout)
+        return RemoteProcess(self, room_id, result.get("pid")), result["port"], result.get("transports")
+
+    def kill(self, room_id):
+        try:
+            self._call(CMD_AGENT_KILL, {"room_id": room_id}, 5.0)
+        except (OSError, RuntimeError) as e:
+            print(f"Agent {self.agent_id}: kill of room {room_id} failed: {e}")
+
+class AgentRegistry:
+    """
+    Game host agents known to the lobby (see server/host_agent.py).
+
+    Agents register over an ordinary lobby connection and heartbeat on it
+    with their capacity; the lobby calls back on each agent's control port
+    to spawn and kill matches. Placement picks the live agent with the
+    lowest Agent.load().
+
+    key: shared secret agents must present. Without one, only agents
+    connecting from loopback are accepted.
+    """
+    def __init__(self, key=None, stale_after=AGENT_STALE_AFTER):
+        self.key = key
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._agents = {}  # agent_id -> Agent
+        self._by_sock = {} # registration socket -> Agent
+        self.on_match_end = None # (agent, room_id, exit_code); set by GameManager
+        self.on_agent_lost = None # (agent, room_ids); set by GameManager
+
+    def authorize(self, key, peer_ip):
+        return authorize_peer(self.key, key, peer_ip)
+
+    def register(self, agent_id, host, control_port, capacity, sock):
+        agent = Agent(agent_id, host, control_port, capacity, sock, self.key)
+        with self._lock:
+            previous = self._agents.get(agent_id)
+            self._agents[agent_id] = agent
+            self._by_sock[sock] = agent
+            if previous is not None:
+                self._by_sock.pop(previous.sock, None)
+        if previous is not None:
+            self._lost(previous) # agent restarted; its old matches are gone
+        return agent
+
+    def heartbeat(self, sock, capacity, ended):
+        """Returns False if `sock` is not a registered agent."""
+        with self._lock:
+            agent = self._by_sock.get(sock)
+            if agent is None:
+                return False
+            agent.capacity = capacity
+            agent.last_seen = time.monotonic()
+        for record in ended:
+            self.release(agent, record.get("room_id"))
+            if self.on_match_end:
+                self.on_match_end(agent, record.get("room_id"), record.get("exit_code"))
+        return True
+
+    def remove_by_sock(self, sock):
+        with self._lock:
+            agent = self._by_sock.pop(sock, None)
+            if agent is not None and self._agents.get(agent.agent_id) is agent:
+                del self._agents[agent.agent_id]
+        if agent is not None:
+            self._lost(agent)
+        return agent
+
+    def _lost(self, agent):
+        with self._lock:
+            room_ids = list(agent.rooms)
+            agent.rooms.clear()
+        print(f"Agent {agent.agent_id} gone; closing {len(room_ids)} room(s)")
+        if self.on_agent_lost and room_ids:
+            self.on_agent_lost(agent, room_ids)
+
+    def place(self, room_id):
+        """Reserves a slot on the least-loaded live agent. Returns the Agent or None."""
+        now = time.monotonic()
+        with self._lock:
+            live = [a for a in self._agents.values()
+                    if now - a.last_seen <= self.stale_after and a.has_room_for_match()]
+            if not live:
+                return None
+            agent = min(live, key=lambda a: (a.load(), a.agent_id))
+            agent.rooms.add(room_id)
+            return agent
+
+    def claim(self, agent, room_id):
+        """Counts a room that is already running on `agent` (lobby restart)."""
+        with self._lock:
+            agent.rooms.add(room_id)
+
+    def release(self, agent, room_id):
+        with self._lock:
+            agent.rooms.discard(room_id)
+
+    def agents(self):
+        with self._lock:
+            return list(self._agents.values())
+
+    def __len__(self):
+        return len(self._agents)
@@ -0,0 +1,132 @@
+import os
+import threading
+
+def read_cpu_times():
+    """{cpu_index: (busy_ticks, total_ticks)} from /proc/stat, or {} if unavailable."""
+    times = {}
+    try:
+        with open("/proc/stat") as f:
+            for line in f:
+                if not line.startswith("cpu") or line.startswith("cpu "):
+                    continue
+                name, *values = line.split()
+                values = [int(v) for v in values]
+                idle = values[3] + (values[4] if len(values) > 4 else 0) # idle + iowait
+                times[int(name[3:])] = (sum(values) - idle, sum(values))
+    except (OSError, ValueError):
+        return {}
+    return times
+
+def set_process_affinity(pid, cores):
+    """
+    Pins every thread of `pid` to `cores`. sched_setaffinity(pid) alone
+    only moves the main thread; threads created later inherit from theirs.
+    """
+    try:
+        tids = [int(t) for t in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        tids = [pid]
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cores)
+        except OSError:
+            pass # thread (or process) already gone
+
+class CpuScheduler:
+    """
+    Gives each game server its own core(s) with sched_setaffinity.
+
+    The first `lobby_cores` allowed cores are kept for the lobby (and the
+    lobby is pinned to them when pin_lobby is set); games are placed on the
+    rest. A match goes to the core(s) with the fewest matches, ties broken
+    by how busy each core was since the last placement (/proc/stat). When a
+    match ends and the spread between the busiest and idlest core exceeds
+    one match, matches are moved over until it is even again.
+
+    Disabled (every call is a no-op) where sched_setaffinity is missing.
+    """
+    def __init__(self, lobby_cores=1, cores_per_match=1, pin_lobby=False, cores=None):
+        self.enabled = hasattr(os, "sched_setaffinity")
+        allowed = sorted(cores if cores is not None else
+                         (os.sched_getaffinity(0) if self.enabled else range(os.cpu_count() or 1)))
+        # Always leave at least one core for games
+        lobby_cores = max(0, min(lobby_cores, len(allowed) - 1))
+        self.lobby_cores = set(allowed[:lobby_cores])
+        self.game_cores = allowed[lobby_cores:]
+        self.cores_per_match = max(1, min(cores_per_match, len(self.game_cores)))
+        self._lock = threading.Lock()
+        self._matches = {} # room_id -> (pid, [cores])
+        self._counts = {core: 0 for core in self.game_cores}
+        self._last_times = read_cpu_times()
+        if self.enabled and pin_lobby and self.lobby_cores:
+            set_process_affinity(os.getpid(), self.lobby_cores)
+
+    def _busy_fractions(self):
+        """Caller holds self._lock. Per-core busy fraction since the previous call."""
+        now = read_cpu_times()
+        busy = {}
+        for core in self.game_cores:
+            if core in now and core in self._last_times:
+                d_busy = now[core][0] - self._last_times[core][0]
+                d_total = now[core][1] - self._last_times[core][1]
+                busy[core] = d_busy / d_total if d_total > 0 else 0.0
+        self._last_times = now
+        return busy
+
+    def assign(self, room_id, pid):
+        """Pins a new game server. Returns the cores it got (empty if disabled)."""
+        if not self.enabled:
+            return []
+        with self._lock:
+            busy = self._busy_fractions()
+            ranked = sorted(self.game_cores, key=lambda c: (self._counts[c], busy.get(c, 0.0), c))
+            cores = ranked[:self.cores_per_match]
+            for core in cores:
+                self._counts[core] += 1
+            self._matches[room_id] = (pid, cores)
+        set_process_affinity(pid, cores)
+        return cores
+
+    def release(self, room_id):
+        """Forgets a finished match and evens out the remaining ones."""
+        if not self.enabled:
+            return
+        moves = []
+        with self._lock:
+            entry = self._matches.pop(room_id, None)
+            if entry is None:
+                return
+            for core in entry[1]:
+                self._counts[core] -= 1
+            moves = self._rebalance()
+        for pid, cores in moves:
+            set_process_affinity(pid, cores)
+
+    def _rebalance(self):
+        """Caller holds self._lock. Returns [(pid, new_cores)] to apply."""
+        moves = []
+        while True:
+            busiest = max(self.game_cores, key=lambda c: (self._counts[c], c))
+            idlest = min(self.game_cores, key=lambda c: (self._counts[c], c))
+            if self._counts[busiest] - self._counts[idlest] <= 1:
+                return moves
+            # Move the most recently placed match off the busiest core
+            room_id = next((r for r in reversed(list(self._matches))
+                            if busiest in self._matches[r][1] and idlest not in self._matches[r][1]), None)
+            if room_id is None:
+                return moves
+            pid, cores = self._matches[room_id]
+            cores = [idlest if c == busiest else c for c in cores]
+            self._counts[busiest] -= 1
+            self._counts[idlest] += 1
+            self._matches[room_id] = (pid, cores)
+            moves.append((pid, cores))
+
+    def placement(self):
+        """{room_id: [cores]} plus per-core match counts, for reports."""
+        with self._lock:
+            return {
+                "lobby_cores": sorted(self.lobby_cores),
+                "core_matches": dict(self._counts),
+                "rooms": {room_id: list(cores) for room_id, (_, cores) in self._matches.items()}
+            }
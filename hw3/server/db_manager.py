@@ -1,17 +1,76 @@
 import json
 import os
+import hmac
 import threading
+import time
+import zlib
+from types import MappingProxyType
+
+from server.password_hasher import CredentialVerifier, DEFAULT_ITERATIONS
+from server.search_index import SearchIndex
+
+# Number of per-game lock stripes for catalog mutations
+GAME_LOCK_STRIPES = 64
 
 class DBManager:
-    def __init__(self, data_dir="server_data"):
+    """
+    Lock layout (see architecture.md, "Concurrency & Lock Ordering"):
+      users_lock          users dict (registration, password migration)
+      game stripe         one of GAME_LOCK_STRIPES locks, chosen by game_id;
+                          serializes mutations of the same game
+      catalog_lock        short critical section that splices a changed game
+                          into a new catalog snapshot and publishes it
+      search index lock   inside SearchIndex; updated under the game stripe
+      *_save_lock         one per JSON file, held for the file write
+
+    Nesting order: game stripe -> catalog_lock, game stripe -> search
+    index lock (never both at once), and _users_save_lock ->
+    users_lock (only to copy the dict). _games_save_lock is a leaf. No
+    users lock is ever held together with a catalog lock, and readers of
+    the catalog take no lock at all.
+    """
+    def __init__(self, data_dir="server_data", kdf_iterations=DEFAULT_ITERATIONS,
+                 hash_workers=None, login_cache_ttl=60):
         self.data_dir = data_dir
         self.users_file = os.path.join(data_dir, "users.json")
         self.games_file = os.path.join(data_dir, "games.json")
-        self.lock = threading.RLock()
-        
+        self.users_lock = threading.RLock()
+        self.catalog_lock = threading.Lock()
+        self._game_stripes = [threading.Lock() for _ in range(GAME_LOCK_STRIPES)]
+        self._users_save_lock = threading.Lock()
+        self._games_save_lock = threading.Lock()
+
         self._ensure_dir()
         self.users = self._load_json(self.users_file, {"developers": {}, "players": {}})
-        self.games = self._load_json(self.games_file, {})
+        self._users_version = 0
+        self._users_saved_version = 0
+        # Password hashing runs in a process pool, never under users_lock
+        self.verifier = CredentialVerifier(kdf_iterations, hash_workers,
+                                           cache_ttl=login_cache_ttl)
+        # Catalog is published as an immutable snapshot (copy-on-write).
+        # Writers build a new dict under catalog_lock and swap the reference;
+        # readers just grab the current reference and never take a lock.
+        # The revision is published together with the catalog (one tuple) and
+        # starts from the wall clock so it keeps increasing across restarts.
+        catalog = MappingProxyType(self._load_json(self.games_file, {}))
+        self._snapshot = (int(time.time() * 1000), catalog)
+        self._games_saved_revision = self._snapshot[0]
+        self.search_index = SearchIndex()
+        for game_id, game in catalog.items():
+            self.search_index.update_game(game_id, game)
+
+    @property
+    def games(self):
+        """Current catalog snapshot (read-only mapping of game_id -> game dict)."""
+        return self._snapshot[1]
+
+    @property
+    def catalog_revision(self):
+        return self._snapshot[0]
+
+    def get_catalog_snapshot(self):
+        """Returns (revision, catalog) from the same committed state."""
+        return self._snapshot
 
     def _ensure_dir(self):
         if not os.path.exists(self.data_dir):
@@ -27,78 +86,198 @@ class DBManager:
             return default
 
     def _save_json(self, filepath, data):
-        with open(filepath, 'w', encoding='utf-8') as f:
+        # Write to a temp file and rename, so a crash never leaves half a file
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=4)
+        os.replace(tmp_path, filepath)
 
     def save_all(self):
-        with self.lock:
-            self._save_json(self.users_file, self.users)
-            self._save_json(self.games_file, self.games)
+        with self.users_lock:
+            self._users_version += 1
+        self._persist_users()
+        with self._games_save_lock:
+            self._save_json(self.games_file, dict(self.games))
+
+    def _game_lock(self, game_id):
+        return self._game_stripes[zlib.crc32(str(game_id).encode('utf-8')) % GAME_LOCK_STRIPES]
+
+    def _persist_users(self):
+        """
+        Writes users.json if it is older than the in-memory state.
+        The copy is taken under users_lock, the file write happens outside it.
+        """
+        with self._users_save_lock:
+            with self.users_lock:
+                version = self._users_version
+                if version <= self._users_saved_version:
+                    return
+                data = {t: {name: dict(rec) for name, rec in recs.items()}
+                        for t, recs in self.users.items()}
+            self._save_json(self.users_file, data)
+            self._users_saved_version = version
+
+    def _persist_catalog(self):
+        """
+        Writes games.json if it is older than the published snapshot.
+        Concurrent writers coalesce: whoever gets the save lock writes the
+        latest snapshot, which already contains the others' changes.
+        """
+        with self._games_save_lock:
+            revision, games = self._snapshot
+            if revision <= self._games_saved_revision:
+                return
+            self._save_json(self.games_file, dict(games))
+            self._games_saved_revision = revision
+
+    def _mutate_game(self, game_id, mutate):
+        """
+        Applies mutate(current_game_or_None) to one catalog entry.
+        mutate returns the new game dict, _DELETE to remove it, or None to
+        abort (returns False). The new snapshot is published, then persisted
+        before this returns, so a successful call is durable.
+        """
+        with self._game_lock(game_id):
+            new_game = mutate(self.games.get(game_id))
+            if new_game is None:
+                return False
+            with self.catalog_lock:
+                revision, games = self._snapshot
+                new_games = dict(games)
+                if new_game is _DELETE:
+                    new_games.pop(game_id, None)
+                else:
+                    new_games[game_id] = new_game
+                self._snapshot = (revision + 1, MappingProxyType(new_games))
+            # Still under the stripe, so index updates for one game stay in order
+            if new_game is _DELETE:
+                self.search_index.remove_game(game_id)
+            else:
+                self.search_index.update_game(game_id, new_game)
+        self._persist_catalog()
+        return True
 
     # --- User Management ---
+    # Records store "password_hash" (see server/password_hasher.py).
+    # Records from older users.json files still hold a plaintext "password";
+    # they are rehashed on the next successful login.
     def register_user(self, user_type, username, password):
         """user_type: 'developers' or 'players'"""
-        with self.lock:
+        if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+            return False # from the wire: may be null, a number or a list
+        if username in self.users[user_type]:
+            return False # cheap pre-check before paying for the hash
+        password_hash = self.verifier.hash(password)
+        with self.users_lock:
             if username in self.users[user_type]:
                 return False
-            self.users[user_type][username] = {"password": password, "games": []} # games owned or library
-            self.save_all()
-            return True
+            self.users[user_type][username] = {"password_hash": password_hash, "games": []} # games owned or library
+            self._users_version += 1
+        self._persist_users()
+        return True
 
     def validate_user(self, user_type, username, password):
-        with self.lock:
-            if username not in self.users[user_type]:
+        with self.users_lock:
+            record = self.users[user_type].get(username)
+            if record is None:
+                return False
+            stored_hash = record.get("password_hash")
+            plaintext = record.get("password")
+
+        if not isinstance(password, str):
+            return False
+        if stored_hash is not None:
+            if not self.verifier.verify((user_type, username), password, stored_hash):
                 return False
-            return self.users[user_type][username]["password"] == password
+            if self.verifier.needs_rehash(stored_hash):
+                self._store_password_hash(user_type, username, stored_hash, password)
+            return True
+
+        # Legacy plaintext record: compare, then migrate transparently
+        if plaintext is None or not hmac.compare_digest(plaintext.encode('utf-8'), password.encode('utf-8')):
+            return False
+        self._store_password_hash(user_type, username, plaintext, password)
+        return True
+
+    def _store_password_hash(self, user_type, username, old_secret, password):
+        """
+        Replaces a plaintext password or an outdated hash with a fresh hash.
+        Skipped if the record changed while hashing.
+        """
+        password_hash = self.verifier.hash(password)
+        with self.users_lock:
+            record = self.users[user_type].get(username)
+            if record is None or old_secret not in (record.get("password_hash"), record.get("password")):
+                return
+            record.pop("password", None)
+            record["password_hash"] = password_hash
+            self._users_version += 1
+        self._persist_users()
+        self.verifier.forget((user_type, username))
 
     # --- Game Management ---
+    # Game dicts inside a published snapshot are never mutated again:
+    # writers copy the entry (and any list) they change. Callers of the getters
+    # must treat the returned dicts as read-only.
     def add_game_update(self, dev_username, game_meta):
         """
         game_meta: {game_id, name, version, description, type, ...}
         """
-        with self.lock:
-            game_id = game_meta["game_id"]
-            
+        game_id = game_meta["game_id"]
+
+        def mutate(current):
             # If new game, developer owns it
-            if game_id not in self.games:
-                 # Check if dev already owns it or it's new
-                 self.games[game_id] = game_meta
-                 self.games[game_id]["owner"] = dev_username
-                 self.games[game_id]["reviews"] = []
-                 self.games[game_id]["versions"] = [game_meta["version"]]
-            else:
-                # Update existing
-                if self.games[game_id]["owner"] != dev_username:
-                    return False # Not owner
-                # Update fields
-                self.games[game_id].update(game_meta)
-                if game_meta["version"] not in self.games[game_id]["versions"]:
-                    self.games[game_id]["versions"].append(game_meta["version"])
-            
-            self.save_all()
-            return True
+            if current is None:
+                game = dict(game_meta)
+                game["owner"] = dev_username
+                game["reviews"] = []
+                game["versions"] = [game_meta["version"]]
+                return game
+            # Update existing
+            if current["owner"] != dev_username:
+                return None # Not owner
+            # Update fields
+            game = dict(current)
+            game.update(game_meta)
+            game["versions"] = list(current["versions"])
+            if game_meta["version"] not in game["versions"]:
+                game["versions"].append(game_meta["version"])
+            return game
+
+        return self._mutate_game(game_id, mutate)
 
     def get_all_games(self):
-        with self.lock:
-            return list(self.games.values())
+        return list(self.games.values())
 
     def get_game(self, game_id):
-        with self.lock:
-            return self.games.get(game_id)
-            
+        return self.games.get(game_id)
+
+    def search_games(self, query, offset=0, limit=20, include_reviews=False):
+        """
+        Ranked full-text search. Returns (total_matches, [game dict, ...]).
+        """
+        total, game_ids = self.search_index.search(query, offset, limit, include_reviews)
+        games = self.games
+        return total, [games[gid] for gid in game_ids if gid in games]
+
     def delete_game(self, dev_username, game_id):
-        with self.lock:
-            if game_id in self.games and self.games[game_id]["owner"] == dev_username:
-                del self.games[game_id]
-                self.save_all()
-                return True
-            return False
+        def mutate(current):
+            if current is not None and current["owner"] == dev_username:
+                return _DELETE
+            return None
+
+        return self._mutate_game(game_id, mutate)
 
     def add_review(self, game_id, username, rating, comment):
-        with self.lock:
-            if game_id in self.games:
-                review = {"user": username, "rating": rating, "comment": comment}
-                self.games[game_id].setdefault("reviews", []).append(review)
-                self.save_all()
-                return True
-            return False
+        def mutate(current):
+            if current is None:
+                return None
+            review = {"user": username, "rating": rating, "comment": comment}
+            game = dict(current)
+            game["reviews"] = list(current.get("reviews", [])) + [review]
+            return game
+
+        return self._mutate_game(game_id, mutate)
+
+# Sentinel returned by a _mutate_game callback to remove the entry
+_DELETE = object()
@@ -0,0 +1,141 @@
+"""
+Launches an uploaded game server and reports its listening port to the lobby.
+
+Usage: python game_bootstrap.py <report_fd> <script_path> [script args...]
+       python game_bootstrap.py --pooled <report_fd> <script_path> [module ...]
+
+The lobby passes the write end of a pipe as <report_fd>. The first TCP
+socket the game puts into listen() is reported as "PORT <n>\\n" ("PORT <n> udp\\n"
+when the game bound UDP on the same number first), so games
+that bind the port given on their command line work unchanged, including
+when that port is 0 (the OS picks one). The game script then runs as
+__main__ exactly as if it had been started directly.
+
+--pooled starts a warm-pool worker. It imports the listed modules and
+compiles the script, then blocks until the lobby writes one JSON
+assignment line to stdin: {"args": ["<port>", ...], "env": {...}}. It
+then runs the game with those arguments. Interpreter startup and imports
+are paid before the match is requested.
+
+Resource limits come in the GAME_LIMITS environment variable (JSON, see
+apply_limits) and are applied just before the game code runs; pooled
+workers get it with their assignment.
+"""
+import importlib
+import json
+import os
+import runpy
+import socket
+import sys
+
+# Imported by every pooled worker (what the game templates use)
+POOL_PRELOAD = ["socket", "threading", "selectors", "json", "struct", "random", "time", "shared.game_sdk"]
+
+def apply_limits(limits):
+    """
+    limits: {"memory_mb": int, "cpu_seconds": int, "open_files": int, "nice": int}
+    Missing or null entries are left alone. Limits are both soft and hard,
+    so the game cannot raise them again.
+    """
+    try:
+        import resource
+    except ImportError:
+        return # not POSIX
+    rlimits = {
+        "memory_mb": (resource.RLIMIT_AS, 1024 * 1024),
+        "cpu_seconds": (resource.RLIMIT_CPU, 1),
+        "open_files": (resource.RLIMIT_NOFILE, 1),
+    }
+    for name, (which, scale) in rlimits.items():
+        value = limits.get(name)
+        if value is None:
+            continue
+        try:
+            resource.setrlimit(which, (int(value) * scale, int(value) * scale))
+        except (ValueError, OSError) as e:
+            print(f"Bootstrap: could not set {name}={value}: {e}")
+    if limits.get("nice"):
+        try:
+            os.nice(int(limits["nice"]))
+        except OSError as e:
+            print(f"Bootstrap: could not set nice={limits['nice']}: {e}")
+
+def apply_env_limits():
+    raw = os.environ.get("GAME_LIMITS")
+    if raw:
+        apply_limits(json.loads(raw))
+
+def install_listen_hook(report_fd):
+    original_listen = socket.socket.listen
+    original_bind = socket.socket.bind
+    state = {"reported": False}
+    udp_ports = set() # UDP port numbers the game bound
+
+    def bind(self, *args):
+        original_bind(self, *args)
+        if self.type == socket.SOCK_DGRAM and self.family in (socket.AF_INET, socket.AF_INET6):
+            udp_ports.add(self.getsockname()[1])
+
+    def listen(self, *args):
+        original_listen(self, *args)
+        if not state["reported"] and self.type == socket.SOCK_STREAM and \
+                self.family in (socket.AF_INET, socket.AF_INET6):
+            state["reported"] = True
+            port = self.getsockname()[1]
+            # "udp": the same port number is bound for UDP too (GameServer.udp)
+            line = f"PORT {port} udp\n" if port in udp_ports else f"PORT {port}\n"
+            try:
+                os.write(report_fd, line.encode())
+                os.close(report_fd)
+            except OSError:
+                pass # lobby went away; the game keeps running
+
+    socket.socket.bind = bind
+    socket.socket.listen = listen
+
+def run_pooled(report_fd, script_path, modules):
+    # The lobby's limits (the loosest any match gets) go on before the
+    # preloads, which may be the game's own code; the match's tighter
+    # ones follow with the assignment.
+    base = json.loads(os.environ.get("GAME_LIMITS") or "{}")
+    apply_limits(base)
+    for name in POOL_PRELOAD + modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Warm worker: could not preload {name}: {e}")
+    with open(script_path, 'rb') as f:
+        code = compile(f.read(), script_path, 'exec')
+
+    line = sys.stdin.readline()
+    if not line:
+        return # lobby discarded this worker
+    assignment = json.loads(line)
+    os.environ.update(assignment.get("env", {}))
+    sys.argv = [script_path] + [str(a) for a in assignment.get("args", [])]
+    limits = json.loads(os.environ.get("GAME_LIMITS") or "{}")
+    # os.nice() adds up: only the part the match asks for on top of the base
+    limits["nice"] = (limits.get("nice") or 0) - (base.get("nice") or 0)
+    apply_limits(limits)
+    install_listen_hook(report_fd)
+    exec(code, {"__name__": "__main__", "__file__": script_path, "__builtins__": __builtins__})
+
+def main():
+    if len(sys.argv) >= 4 and sys.argv[1] == "--pooled":
+        script_path = os.path.abspath(sys.argv[3])
+        sys.path[0] = os.path.dirname(script_path)
+        run_pooled(int(sys.argv[2]), script_path, sys.argv[4:])
+        return
+    if len(sys.argv) < 3:
+        print("Usage: python game_bootstrap.py <report_fd> <script_path> [args...]")
+        sys.exit(1)
+    report_fd = int(sys.argv[1])
+    script_path = os.path.abspath(sys.argv[2])
+    sys.argv = [script_path] + sys.argv[3:]
+    sys.path[0] = os.path.dirname(script_path)
+    apply_env_limits()
+    install_listen_hook(report_fd)
+    runpy.run_path(script_path, run_name="__main__")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,42 @@
+import base64
 import subprocess
 import threading
 import sys
 import socket
 import time
 import os
+import select
+import json
+from bisect import bisect_right, insort
+from collections import deque
+
+from server.agent_registry import RemoteProcess
+from server.cpu_scheduler import CpuScheduler
+from server.handoff import AdoptedProcess, add_fd
+from server.output_capture import OutputCapture
+from server.port_allocator import PortAllocator
+from server.process_reaper import ProcessReaper
+from server.resource_monitor import ResourceMonitor
+from server.runner_manager import RunnerManager, RunnerRoom
+from server.warm_pool import PooledWorker, WarmPool
+
+# Per-match limits applied by the bootstrap (see game_bootstrap.apply_limits).
+# A game's config may tighten them under "limits", never loosen them.
+DEFAULT_GAME_LIMITS = {"memory_mb": 1024, "cpu_seconds": None, "open_files": 256, "nice": 5}
+
+# Wraps game server scripts to report their listening port (see game_bootstrap.py)
+BOOTSTRAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_bootstrap.py")
+# Hosts every match of a "multi_room" game in one process (see room_runner.py)
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "room_runner.py")
+# Put on every game process's PYTHONPATH so games can import shared.game_sdk
+SDK_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Config "preload_modules" a warm worker may import before its match: these,
+# or modules inside the game's own directory. Workers import them under the
+# lobby's limits, which a match can only tighten.
+POOL_PRELOAD_ALLOWED = frozenset([
+    "asyncio", "collections", "dataclasses", "enum", "functools", "heapq", "itertools",
+    "math", "numpy", "re", "shared.game_sdk.entities", "typing",
+])
 
 class Room:
     def __init__(self, room_id, host, game_id, game_config):
@@ -11,145 +44,916 @@ class Room:
         self.host = host
         self.game_id = game_id
         self.players = [host]
-        self.status = "WAITING" # WAITING, PLAYING
+        self.status = "WAITING" # WAITING, STARTING, PLAYING
         self.port = None
         self.process = None
+        self.started_at = None # time.time() when the game server was spawned
+        self.agent = None # host agent running the match (None = this machine)
+        self.ip = None    # address players connect to
         self.game_config = game_config
+        # Guards this room's players/status/port/process
+        self.lock = threading.RLock()
 
 class GameManager:
-    def __init__(self, port_start=9000, port_end=9100):
+    """
+    Lock layout (see architecture.md, "Concurrency & Lock Ordering"):
+      room.lock    per-room state; never held while a game server starts
+      rooms_lock   the rooms dict, the room indexes and the room id counter;
+                   short sections only. A room's status and players are
+                   changed under both locks, so listings need only this one
+      ports        PortAllocator's internal lock (leaf)
+
+    Nesting order: room.lock -> rooms_lock -> ports. Code that walks
+    several rooms copies the room list under rooms_lock, releases it, and
+    then locks one room at a time.
+
+    Indexes: rooms by game_id and by status (sorted room numbers, so
+    listings page by cursor without scanning every room) and by player
+    (a set of room ids, so disconnect cleanup only visits that player's
+    rooms).
+
+    Ports: game servers get a port from `port_ranges` (list of
+    (start, end_exclusive)). With bind_zero=True the game server is told to
+    bind port 0 instead and reports the port the OS picked over a pipe, so
+    no port bookkeeping or probing is needed at all (POSIX only).
+
+    Game servers are started through server/game_bootstrap.py, which
+    reports "PORT <n>" once the game listens ("PORT <n> udp" when it also
+    bound UDP on that number). start_game only succeeds
+    (and GAME_START only goes out) after that line arrives, so clients
+    can connect right away.
+
+    Every spawned game server is watched by a ProcessReaper. When it exits
+    (finished match or crash) the exit is recorded in match_history and the
+    room is cleaned up through end_game, which frees its port.
+
+    Warm pool: with warm_pool_max > 0, games that are being played get up
+    to that many idle game servers pre-spawned through the bootstrap's
+    --pooled mode (interpreter started, modules imported, script
+    compiled). start_game hands the match to one of them and only falls
+    back to a cold spawn when none is ready. See server/warm_pool.py.
+
+    Host agents: with an AgentRegistry (`agents`), matches are placed on
+    the least-loaded registered agent (server/host_agent.py) and only run
+    on this machine while no agent is available. A remote match's
+    `process` is a RemoteProcess; its exit arrives in an agent heartbeat
+    instead of through the reaper.
+
+    Resources: local game servers run under `limits` (rlimits and nice,
+    tightened per game by its config's "limits") and are sampled by a
+    ResourceMonitor; resource_report() has per-room and per-game usage.
+
+    CPU affinity: with cpu_affinity=True each local game server is pinned
+    to the least-loaded game core by a CpuScheduler, the first
+    `lobby_cores` cores stay free for the lobby, and matches are
+    rebalanced when one ends.
+
+    Multi-room hosting: a game whose config has "hosting": "multi_room"
+    provides a room module instead of a per-match server. All its local
+    matches of one version share a single runner process
+    (server/room_runner.py, managed by a RunnerManager); a match's
+    `process` is then a RunnerRoom. Runners get the game's limits but are
+    neither pinned nor sampled per room; resource_report() lists them
+    under "runners". Needs the report pipe, so POSIX only.
+
+    Output: with capture_output (POSIX), game server stdout/stderr goes
+    through a pipe into an OutputCapture ring buffer per room (per runner
+    for multi-room games) instead of the lobby's terminal; see
+    game_output(). Streams can also spill to rotated files in
+    `output_spill_dir`.
+
+    Lobby restart: export_state() freezes the manager and describes every
+    room, runner, agent and output pipe; adopt_state() in the next lobby
+    process takes them over, so running matches survive a deploy (see
+    server/handoff.py). Linux only (pidfds).
+    """
+    def __init__(self, port_start=9000, port_end=9100, port_ranges=None,
+                 port_quarantine=30.0, bind_zero=False, ready_timeout=10.0,
+                 warm_pool_max=0, warm_pool_window=300.0, advertise_ip=None,
+                 games_dir=os.path.join("server_data", "games"), agents=None, on_match_end=None,
+                 limits=DEFAULT_GAME_LIMITS, resource_interval=5.0,
+                 cpu_affinity=False, lobby_cores=1, runner_idle_timeout=30.0,
+                 capture_output=True, output_buffer_bytes=64 * 1024, output_spill_dir=None,
+                 output_spill_bytes=1024 * 1024):
         self.rooms = {}
-        self.lock = threading.Lock()
-        self.port_start = port_start
-        self.port_end = port_end
-        self.used_ports = set()
+        self.rooms_lock = threading.Lock()
+        self._numbers = []   # sorted [room number] of every room
+        self._by_game = {}   # game_id -> sorted [room number]
+        self._by_status = {} # status -> sorted [room number]
+        self._by_player = {} # username -> {room_id}
+        self.ports = PortAllocator(port_ranges or [(port_start, port_end)], port_quarantine)
+        # Readiness pipe and bind-zero both need pass_fds
+        self.readiness = os.name != 'nt'
+        self.bind_zero = bind_zero and self.readiness
+        self.ready_timeout = ready_timeout
+        # Address sent to players in GAME_START; resolved once
+        self.advertise_ip = advertise_ip or self._detect_advertise_ip()
         self.next_room_id = 1
+        self.games_dir = games_dir
+        self.limits = dict(limits or {})
+        self.monitor = ResourceMonitor(resource_interval)
+        # The lobby itself is not pinned: its hashing pool should keep every core
+        self.cpu = CpuScheduler(lobby_cores) if cpu_affinity else None
+        # Called with each match_history record (used by host agents)
+        self.on_match_end = on_match_end
+        self.agents = agents
+        if agents is not None:
+            agents.on_match_end = self._on_remote_exit
+            agents.on_agent_lost = self._on_agent_lost
+        self.reaper = ProcessReaper(self._on_game_exit)
+        self.output = None
+        if capture_output and self.readiness:
+            self.output = OutputCapture(output_buffer_bytes, output_spill_dir, output_spill_bytes)
+        self.runners = RunnerManager(self._spawn_runner, self._on_runner_room_closed,
+                                     runner_idle_timeout)
+        # Most recent finished matches: room, game, pid, exit code, duration
+        self.match_history = deque(maxlen=200)
+        self.warm_pool = None
+        self._pool_lock = threading.Lock()
+        self._pool_preload = {} # (game_id, version) -> extra modules to import (under _pool_lock)
+        if warm_pool_max > 0 and os.name != 'nt':
+            self.warm_pool = WarmPool(self._spawn_pooled, self._close_pooled,
+                                      max_size=warm_pool_max, window=warm_pool_window)
 
     def create_room(self, host, game_id, game_config):
-        with self.lock:
+        with self.rooms_lock:
             room_id = str(self.next_room_id)
             self.next_room_id += 1
             room = Room(room_id, host, game_id, game_config)
             self.rooms[room_id] = room
+            self._numbers.append(int(room_id)) # ids only grow
+            self._index_add(self._by_game, game_id, room_id)
+            self._index_add(self._by_status, room.status, room_id)
+            self._by_player.setdefault(host, set()).add(room_id)
             return room_id
 
-    def list_rooms(self):
-        with self.lock:
-            return [
-                {
-                    "id": r.room_id, 
-                    "game_id": r.game_id, 
-                    "host": r.host, 
+    def _get_room(self, room_id):
+        with self.rooms_lock:
+            return self.rooms.get(room_id)
+
+    @staticmethod
+    def _index_add(index, key, room_id):
+        """Caller holds rooms_lock."""
+        insort(index.setdefault(key, []), int(room_id))
+
+    @staticmethod
+    def _index_remove(index, key, room_id):
+        """Caller holds rooms_lock."""
+        numbers = index.get(key)
+        if numbers and GameManager._discard_number(numbers, room_id) and not numbers:
+            del index[key]
+
+    @staticmethod
+    def _discard_number(numbers, room_id):
+        i = bisect_right(numbers, int(room_id)) - 1
+        if i >= 0 and numbers[i] == int(room_id):
+            del numbers[i]
+            return True
+        return False
+
+    def _set_status(self, room, status):
+        """Caller holds room.lock."""
+        with self.rooms_lock:
+            if room.room_id in self.rooms:
+                self._index_remove(self._by_status, room.status, room.room_id)
+                self._index_add(self._by_status, status, room.room_id)
+            room.status = status
+
+    def _unindex(self, room):
+        """Caller holds rooms_lock; `room` was just removed from self.rooms."""
+        self._discard_number(self._numbers, room.room_id)
+        self._index_remove(self._by_game, room.game_id, room.room_id)
+        self._index_remove(self._by_status, room.status, room.room_id)
+        for player in room.players:
+            self._remove_player_index(player, room.room_id)
+
+    def _remove_player_index(self, player, room_id):
+        """Caller holds rooms_lock."""
+        room_ids = self._by_player.get(player)
+        if room_ids is not None:
+            room_ids.discard(room_id)
+            if not room_ids:
+                del self._by_player[player]
+
+    def list_rooms(self, game_id=None, status=None):
+        """Every room matching the filters, oldest first."""
+        return self.page_rooms(game_id, status)[0]
+
+    def page_rooms(self, game_id=None, status=None, cursor=None, limit=None):
+        """
+        Rooms matching game_id/status (None = any) with a room number above
+        `cursor`, oldest first, at most `limit` of them (None = all).
+        Returns (rooms, next_cursor); next_cursor is None on the last page.
+        """
+        with self.rooms_lock:
+            if game_id is not None and status is not None:
+                by_game = self._by_game.get(game_id, ())
+                by_status = self._by_status.get(status, ())
+                numbers = by_game if len(by_game) <= len(by_status) else by_status
+            elif game_id is not None:
+                numbers = self._by_game.get(game_id, ())
+            elif status is not None:
+                numbers = self._by_status.get(status, ())
+            else:
+                numbers = self._numbers
+            start = bisect_right(numbers, cursor) if cursor is not None else 0
+            page = []
+            next_cursor = None
+            for i in range(start, len(numbers)):
+                r = self.rooms[str(numbers[i])]
+                if (game_id is not None and r.game_id != game_id) or \
+                        (status is not None and r.status != status):
+                    continue
+                if limit is not None and len(page) == limit:
+                    next_cursor = int(page[-1]["id"])
+                    break
+                page.append({
+                    "id": r.room_id,
+                    "game_id": r.game_id,
+                    "host": r.host,
                     "players": len(r.players),
                     "status": r.status
-                }
-                for r in self.rooms.values()
-            ]
+                })
+        return page, next_cursor
 
     def join_room(self, room_id, player):
-        with self.lock:
-            if room_id not in self.rooms:
-                return False, "Room not found"
-            room = self.rooms[room_id]
+        room = self._get_room(room_id)
+        if room is None:
+            return False, "Room not found"
+        with room.lock:
+            if room.room_id not in self.rooms:
+                return False, "Room not found" # closed while we waited
             if room.status != "WAITING":
                 return False, "Game already started"
-            # Limit players check? (Optional, based on game_config)
-            room.players.append(player)
+            if player in room.players:
+                return False, "Already in room"
+            max_players = (room.game_config or {}).get("max_players")
+            if max_players and len(room.players) >= max_players:
+                return False, "Room is full"
+            with self.rooms_lock:
+                room.players.append(player)
+                self._by_player.setdefault(player, set()).add(room.room_id)
             return True, "Joined"
 
     def start_game(self, room_id, user):
         """
         Only host can start.
-        Allocates a port, starts the subprocess.
+        Allocates a port, starts the subprocess and waits until it listens.
+
+        Two phases so room.lock is never held while a process starts:
+          1. under room.lock: checks, port allocation, status STARTING
+          2. unlocked: spawn, then wait for the readiness line on the pipe
+        The result is committed under room.lock again. If the room was
+        closed in between, the new game server is killed.
         """
-        with self.lock:
-            if room_id not in self.rooms:
+        room = self._get_room(room_id)
+        if room is None:
+            return False, "Room not found"
+        with room.lock:
+            if room.room_id not in self.rooms:
                 return False, "Room not found"
-            room = self.rooms[room_id]
+            if room.status != "WAITING":
+                return False, "Game already started"
             if room.host != user:
                 return False, "Only host can start"
+            min_players = (room.game_config or {}).get("min_players")
+            if min_players and len(room.players) < min_players:
+                return False, f"Need at least {min_players} players"
             
-            # Allocate port
-            port = self._get_free_port()
-            if not port:
-                return False, "No server ports available"
+            agent = self.agents.place(room.room_id) if self.agents is not None else None
+            multi_room = agent is None and self._is_multi_room(room)
+            worker = None
+            # Allocate port (bind-zero mode and agents pick it themselves)
+            port = 0
+            if agent is None and not self.bind_zero:
+                port = self.ports.allocate()
+                if not port:
+                    return False, "No server ports available"
             
             room.port = port
-            room.status = "PLAYING"
-            
-            # Launch Subprocess
-            # Command should be: python server_data/games/<game_id>/server.py <port> <num_players> ...
-            # We need to trust the setup. For now, assume consistent structure.
-            # However, looking at requirements, Developer uploads a zip. Server extracts it.
-            # We assume a standard entry point, e.g., 'server.py' or specified in config.
-            
-            game_dir = os.path.abspath(os.path.join("server_data", "games", room.game_id))
-            # Find entry point from config or default
-            # For simplicity, we assume 'server.py' exists in the game root.
-            
-            script_path = os.path.join(game_dir, "server.py")
-            if not os.path.exists(script_path):
-                return False, f"Game server script not found: {script_path}"
+            room.agent = agent
+            self._set_status(room, "STARTING")
+            if agent is None and not multi_room:
+                worker = self._take_pooled(room)
 
-            # Run in new process
-            # Pass arguments: port
-            cmd = [sys.executable, script_path, str(port)]
-            
+        # We assume a standard entry point: 'server.py' in the game root.
+        game_dir = os.path.abspath(os.path.join(self.games_dir, room.game_id))
+        script_path = os.path.join(game_dir, "server.py")
+        process = None
+        transports = None # what the agent's own start reported
+        udp_bound = False # multi-room runners serve TCP only
+        try:
+            if agent is not None:
+                process, port, transports = agent.spawn(room.room_id, room.game_id, room.game_config or {},
+                                                        list(room.players), self.ready_timeout + 30)
+            elif multi_room:
+                process, port = self.runners.open_room(
+                    self._pool_key(room), room.room_id, port, list(room.players),
+                    self._match_limits(room), self.ready_timeout)
+            elif worker is not None:
+                process, port, udp_bound = self._assign_pooled(worker, room, port, self._match_limits(room))
+            elif not os.path.exists(script_path):
+                raise RuntimeError(f"Game server script not found: {script_path}")
+            else:
+                process, port, udp_bound = self._spawn_game(room, script_path, game_dir, port,
+                                                            self._match_limits(room))
+        except Exception as e:
+            with room.lock:
+                if room.status == "STARTING" and room.room_id in self.rooms:
+                    self._release_start(room)
+            return False, str(e)
+
+        with room.lock:
+            if room.status != "STARTING" or room.room_id not in self.rooms:
+                # Closed while starting; end_game already freed the port
+                self._stop_process(process)
+                return False, "Room closed while the game was starting"
+            room.process = process
+            room.port = port
+            room.ip = agent.host if agent is not None else self.advertise_ip
+            self._set_status(room, "PLAYING")
+            room.started_at = time.time()
+            if multi_room:
+                # The runner reports the exit, like the reaper would
+                room.process.match_key = (room.room_id, room.game_id, room.started_at)
+            elif agent is None:
+                # Monitor first: the reaper's exit callback finishes the sample
+                self.monitor.watch(room.room_id, room.game_id, room.process.pid)
+                if self.cpu is not None:
+                    self.cpu.assign(room.room_id, room.process.pid)
+                self.reaper.watch((room.room_id, room.game_id, room.started_at), room.process)
+            # Return IP/Port to clients
+            return True, {"port": room.port, "ip": room.ip,
+                          "transports": transports or self._transports(room, udp_bound)}
+
+    @staticmethod
+    def _transports(room, udp_bound):
+        """
+        What the game server offers on its port, for GAME_START: TCP always,
+        UDP (same port number) when config.json "transports" lists it and the
+        server bound it. udp_bound is what the bootstrap reported, None when
+        unknown (no readiness); a server whose UDP port was taken serves TCP only.
+        """
+        declared = (room.game_config or {}).get("transports") or []
+        if "udp" in declared and udp_bound is not False:
+            return ["tcp", "udp"]
+        return ["tcp"]
+
+    def _release_start(self, room):
+        """Undo a failed start_game. Caller holds room.lock."""
+        self._release_placement(room)
+        room.port = None
+        room.agent = None
+        self._set_status(room, "WAITING")
+
+    @staticmethod
+    def _stop_process(process):
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    @staticmethod
+    def _detect_advertise_ip():
+        """LAN address clients should use for game servers (no packet is sent)."""
+        try:
+            # Trick to get IP that's connected to internet/network
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.connect(("8.8.8.8", 80))
+            host_ip = s.getsockname()[0]
+            s.close()
+            return host_ip
+        except OSError:
+            return "127.0.0.1"
+
+    def _match_limits(self, room):
+        """Lobby limits, tightened by the game's own config["limits"]."""
+        limits = dict(self.limits)
+        requested = (room.game_config or {}).get("limits") or {}
+        for name, value in requested.items():
+            if name not in DEFAULT_GAME_LIMITS or not isinstance(value, int) or isinstance(value, bool):
+                continue
+            current = limits.get(name)
+            if name == "nice":
+                limits[name] = max(current or 0, value)
+            elif value > 0:
+                limits[name] = value if current is None else min(current, value)
+        return limits
+
+    def _spawn_game(self, room, script_path, game_dir, port, limits):
+        """
+        Starts the game server through the bootstrap and waits until it
+        listens, which the bootstrap reports as "PORT <n>". Returns
+        (process, port, udp_bound); port is the real one, also when it asked
+        for 0, and udp_bound tells whether UDP got the same port number.
+        """
+        if not self.readiness:
+            # No pass_fds (Windows): start directly, readiness unknown
+            return subprocess.Popen([sys.executable, script_path, str(port)], cwd=game_dir,
+                                    env=self._game_env()), port, None
+        read_fd, write_fd = os.pipe()
+        out_r, out_w = self._output_pipe()
+        try:
+            cmd = [sys.executable, BOOTSTRAP_PATH, str(write_fd), script_path, str(port)]
+            env = self._game_env(limits)
+            process = subprocess.Popen(cmd, cwd=game_dir, pass_fds=(write_fd,), env=env,
+                                       **self._output_args(out_w))
+        except Exception:
+            os.close(read_fd)
+            self._close_fds(out_r)
+            raise
+        finally:
+            os.close(write_fd) # child holds its own copy
+            self._close_fds(out_w)
+        self._capture(room.room_id, room.game_id, out_r)
+        try:
+            return (process,) + self._wait_ready(process, read_fd)
+        finally:
+            os.close(read_fd)
+
+    @staticmethod
+    def _game_env(limits=None):
+        """Environment of a game process: SDK importable, limits for the bootstrap/runner to apply."""
+        path = os.pathsep.join(filter(None, [SDK_ROOT, os.environ.get("PYTHONPATH")]))
+        env = dict(os.environ, PYTHONPATH=path)
+        if limits is not None:
+            env["GAME_LIMITS"] = json.dumps(limits)
+        return env
+
+    # --- Output capture ---
+    def _output_pipe(self):
+        """(read_fd, write_fd) for a child's stdout/stderr, or (None, None) when not capturing."""
+        if self.output is None:
+            return None, None
+        return os.pipe()
+
+    @staticmethod
+    def _output_args(write_fd):
+        if write_fd is None:
+            return {}
+        return {"stdout": write_fd, "stderr": subprocess.STDOUT}
+
+    @staticmethod
+    def _close_fds(*fds):
+        for fd in fds:
+            if fd is not None:
+                os.close(fd)
+
+    def _capture(self, stream_id, game_id, read_fd):
+        if read_fd is not None:
+            self.output.attach(stream_id, game_id, read_fd)
+
+    @staticmethod
+    def _runner_stream_id(key):
+        game_id, version = key
+        return f"runner:{game_id}@{version}"
+
+    def game_output(self, stream_id=None, tail=None):
+        """
+        Captured output of a room (a multi-room game's room shows its
+        runner's output), or of a stream id such as "runner:<game>@<version>".
+        Without an id, a summary of every stream. None if not captured.
+        """
+        if self.output is None:
+            return None
+        if stream_id is None:
+            return self.output.streams()
+        room = self._get_room(stream_id)
+        if room is not None and isinstance(room.process, RunnerRoom):
+            stream_id = self._runner_stream_id(room.process.runner.key)
+        return self.output.read(stream_id, tail)
+
+    def _wait_ready(self, process, read_fd):
+        """(port, udp_bound) of a just-started game server; kills it on timeout/exit."""
+        reported = self._read_reported_port(read_fd, self.ready_timeout)
+        if reported is None:
+            self._stop_process(process)
+            raise RuntimeError("Game server did not start listening in time")
+        return reported
+
+    # --- Multi-room runners ---
+    def _is_multi_room(self, room):
+        return self.readiness and (room.game_config or {}).get("hosting") == "multi_room"
+
+    def _spawn_runner(self, key, limits):
+        """RunnerManager spawn callback: starts room_runner.py for a game. Returns (process, report_fd)."""
+        game_id, _ = key
+        game_dir = os.path.abspath(os.path.join(self.games_dir, game_id))
+        config = {}
+        try:
+            with open(os.path.join(game_dir, "config.json")) as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            pass
+        module_path = os.path.join(game_dir, config.get("room_module", "rooms.py"))
+        if not os.path.exists(module_path):
+            raise RuntimeError(f"Game room module not found: {module_path}")
+        read_fd, write_fd = os.pipe()
+        out_r, out_w = self._output_pipe()
+        try:
+            cmd = [sys.executable, RUNNER_PATH, str(write_fd), module_path]
+            env = self._game_env(limits)
+            process = subprocess.Popen(cmd, cwd=game_dir, stdin=subprocess.PIPE,
+                                       pass_fds=(write_fd,), env=env, **self._output_args(out_w))
+        except Exception:
+            os.close(read_fd)
+            self._close_fds(out_r)
+            raise
+        finally:
+            os.close(write_fd)
+            self._close_fds(out_w)
+        self._capture(self._runner_stream_id(key), game_id, out_r)
+        return process, read_fd
+
+    def _on_runner_room_closed(self, handle, returncode):
+        """RunnerManager callback: a match hosted by a runner ended."""
+        if handle.match_key is not None: # None: closed before start_game committed it
+            self._on_game_exit(handle.match_key, handle, returncode)
+
+    # --- Warm pool ---
+    @staticmethod
+    def _pool_key(room):
+        return (room.game_id, (room.game_config or {}).get("version"))
+
+    def _take_pooled(self, room):
+        """An idle pooled worker for the room's game, or None. Caller holds room.lock."""
+        if self.warm_pool is None:
+            return None
+        key = self._pool_key(room)
+        modules = self._allowed_preloads(room.game_id, (room.game_config or {}).get("preload_modules"))
+        with self._pool_lock:
+            self._pool_preload[key] = modules
+        self.warm_pool.record_start(key)
+        return self.warm_pool.take(key)
+
+    def _allowed_preloads(self, game_id, modules):
+        """The config's preload_modules that are in POOL_PRELOAD_ALLOWED or part of the game itself."""
+        if not isinstance(modules, list):
+            return []
+        game_dir = os.path.abspath(os.path.join(self.games_dir, game_id))
+        allowed = []
+        for name in modules:
+            if not isinstance(name, str) or not all(part.isidentifier() for part in name.split(".")):
+                continue
+            top = name.split(".")[0]
+            if name in POOL_PRELOAD_ALLOWED or os.path.isfile(os.path.join(game_dir, top + ".py")) or \
+                    os.path.isfile(os.path.join(game_dir, top, "__init__.py")):
+                allowed.append(name)
+            else:
+                print(f"Warm pool: not preloading {name!r} for {game_id}: not allowed")
+        return allowed
+
+    def _spawn_pooled(self, key):
+        """WarmPool spawn callback: one idle worker waiting for its assignment."""
+        game_id, _ = key
+        game_dir = os.path.abspath(os.path.join(self.games_dir, game_id))
+        script_path = os.path.join(game_dir, "server.py")
+        if not os.path.exists(script_path):
+            raise FileNotFoundError(script_path)
+        read_fd, write_fd = os.pipe()
+        out_r, out_w = self._output_pipe()
+        try:
+            cmd = [sys.executable, BOOTSTRAP_PATH, "--pooled", str(write_fd), script_path]
+            with self._pool_lock:
+                cmd += self._pool_preload.get(key, [])
+            process = subprocess.Popen(cmd, cwd=game_dir, stdin=subprocess.PIPE, pass_fds=(write_fd,),
+                                       env=self._game_env(self.limits), **self._output_args(out_w))
+        except Exception:
+            os.close(read_fd)
+            self._close_fds(out_r)
+            raise
+        finally:
+            os.close(write_fd)
+            self._close_fds(out_w)
+        # Output is captured once the worker gets its room; until then it waits in the pipe
+        return PooledWorker(process, read_fd, out_r)
+
+    def _close_pooled(self, worker):
+        """WarmPool close callback: EOF on stdin makes an idle worker exit."""
+        try:
+            worker.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            worker.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            worker.process.kill()
+            worker.process.wait()
+        os.close(worker.report_fd)
+        self._close_fds(worker.output_fd)
+
+    def _assign_pooled(self, worker, room, port, limits):
+        """Starts the match on a pooled worker and waits until it listens. Returns (process, port, udp_bound)."""
+        assignment = {"args": [str(port)], "env": {"GAME_LIMITS": json.dumps(limits)}}
+        self._capture(room.room_id, room.game_id, worker.output_fd)
+        try:
             try:
-                # We use creationflags=subprocess.CREATE_NEW_CONSOLE to let it pop up separately (easy for demo)
-                # Or just running in background.
-                # For demo visualization, separate console is nice, but headless is safer if linux.
-                # Prompt says: "Server... deployed on Linux". HW2 environment.
-                # So we can't use CREATE_NEW_CONSOLE.
-                
-                # room.process = subprocess.Popen(cmd, cwd=game_dir)
-                room.process = subprocess.Popen(cmd, cwd=game_dir)
-                
-                # Get actual LAN IP to return to clients
-                try:
-                    # Trick to get IP that's connected to internet/network
-                    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                    s.connect(("8.8.8.8", 80))
-                    host_ip = s.getsockname()[0]
-                    s.close()
-                except:
-                    host_ip = "127.0.0.1"
-                
-                return True, {"port": port, "ip": host_ip} # Return IP/Port to clients
-            except Exception as e:
-                return False, str(e)
-
-    def _get_free_port(self):
-        for p in range(self.port_start, self.port_end):
-            if p not in self.used_ports:
-                # Double check if actually free
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    if s.connect_ex(('localhost', p)) != 0:
-                        self.used_ports.add(p)
-                        return p
+                worker.process.stdin.write((json.dumps(assignment) + "\n").encode())
+                worker.process.stdin.close()
+            except OSError:
+                self._stop_process(worker.process)
+                raise
+            return (worker.process,) + self._wait_ready(worker.process, worker.report_fd)
+        finally:
+            os.close(worker.report_fd)
+
+    def invalidate_game(self, game_id):
+        """Drops pooled workers of a game whose files changed or were removed; its runners drain."""
+        if self.warm_pool is not None:
+            self.warm_pool.invalidate(game_id)
+        self.runners.invalidate(game_id)
+
+    @staticmethod
+    def _read_reported_port(fd, timeout):
+        """Reads a "PORT <n> [udp]" line from the bootstrap pipe as (port, udp_bound), or None on timeout/EOF."""
+        deadline = time.monotonic() + timeout
+        data = b''
+        while b'\n' not in data:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if not readable:
+                return None
+            chunk = os.read(fd, 64)
+            if not chunk:
+                return None # child exited before listening
+            data += chunk
+        line = data.split(b'\n', 1)[0].decode(errors='replace').split()
+        if len(line) in (2, 3) and line[0] == "PORT" and line[1].isdigit() and line[2:] in ([], ["udp"]):
+            return int(line[1]), len(line) == 3
         return None
         
-    def end_game(self, room_id):
-        with self.lock:
-            if room_id in self.rooms:
-                room = self.rooms[room_id]
-                if room.process:
-                    room.process.terminate()
-                if room.port:
-                    self.used_ports.discard(room.port)
-                del self.rooms[room_id]
+    def _on_game_exit(self, key, process, returncode):
+        """Reaper callback: a game server exited (already reaped)."""
+        room_id, game_id, started_at = key
+        now = time.time()
+        record = {
+            "room_id": room_id,
+            "game_id": game_id,
+            "pid": process.pid,
+            "exit_code": returncode,
+            "duration": round(now - started_at, 3),
+            "ended_at": now
+        }
+        if self.cpu is not None:
+            self.cpu.release(room_id) # may move other matches to even out cores
+        usage = self.monitor.finish(room_id)
+        if usage is not None:
+            record["cpu_seconds"] = usage["cpu_seconds"]
+            record["peak_rss_bytes"] = usage["peak_rss_bytes"]
+        self.match_history.append(record)
+        print(f"Game server for room {room_id} exited with code {returncode}")
+        # No-op if the room was already closed (e.g. host disconnected)
+        self.end_game(room_id, process)
+        if self.on_match_end:
+            self.on_match_end(record)
+
+    def _on_remote_exit(self, agent, room_id, returncode):
+        """AgentRegistry callback: a match on `agent` exited."""
+        room = self._get_room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            process = room.process
+            if room.agent is not agent or process is None:
+                return
+            process.returncode = returncode
+            key = (room.room_id, room.game_id, room.started_at)
+        self._on_game_exit(key, process, returncode)
+
+    def _on_agent_lost(self, agent, room_ids):
+        """AgentRegistry callback: an agent disconnected; its matches are gone."""
+        for room_id in room_ids:
+            room = self._get_room(room_id)
+            if room is None:
+                continue
+            with room.lock:
+                if room.agent is not agent:
+                    continue
+                if room.process is not None:
+                    room.process.returncode = -1 # nothing left to kill
+            self.end_game(room_id)
+
+    def _release_placement(self, room):
+        """Frees a room's local port or agent slot. Caller holds room.lock."""
+        if room.agent is not None:
+            self.agents.release(room.agent, room.room_id)
+        elif room.port:
+            self.ports.release(room.port)
+
+    def end_game(self, room_id, process=None):
+        """
+        Stops the room's game server (if any), removes the room and frees its port.
+        With `process` given, only acts if that is still the room's process.
+        """
+        room = self._get_room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            if process is not None and room.process is not process:
+                return
+            if room.process:
+                room.process.terminate()
+            with self.rooms_lock:
+                if self.rooms.pop(room_id, None) is not None:
+                    self._unindex(room)
+            self._release_placement(room)
+
+    def resource_report(self):
+        """Per-room and per-game CPU/memory usage of local game servers."""
+        self.monitor.sample_all()
+        report = self.monitor.report()
+        with self.rooms_lock:
+            rooms = dict(self.rooms)
+        for usage in report["rooms"]:
+            room = rooms.get(usage["room_id"])
+            if room is not None:
+                usage["players"] = len(room.players)
+                usage["limits"] = self._match_limits(room)
+        if self.cpu is not None:
+            report["cpu"] = self.cpu.placement()
+        runners = self.runners.report()
+        if runners:
+            report["runners"] = runners
+        return report
+
+    def shutdown(self):
+        """Stops the reaper, the warm pool, idle runners and resource sampling. Running game servers are left alone."""
+        self.reaper.stop()
+        self.monitor.stop()
+        self.runners.shutdown()
+        if self.output is not None and not any(s["running"] for s in self.output.streams()):
+            self.output.stop() # running game servers keep writing into their pipes
+        if self.warm_pool is not None:
+            self.warm_pool.shutdown()
+
+    # --- Lobby restart ---
+    def export_state(self, fds, sock_index):
+        """
+        Freezes the manager for a lobby restart and returns its room table.
+        Game servers keep running; this side stops watching them, and idle
+        warm-pool workers and runners exit. Descriptors the next lobby needs
+        are appended to `fds` and referred to by index; `sock_index` maps the
+        handed-over lobby connections (agents) to theirs. The manager cannot
+        be used afterwards.
+        """
+        self.reaper.stop()
+        self.monitor.stop()
+        if self.warm_pool is not None:
+            self.warm_pool.shutdown()
+        self.runners.shutdown()
+        with self.rooms_lock:
+            rooms = [self.rooms[str(n)] for n in self._numbers]
+            next_room_id = self.next_room_id
+            # A start still in flight now finds its room gone and stops its game server
+            self.rooms.clear()
+
+        room_states = []
+        runners = {}
+        for room in rooms:
+            with room.lock:
+                entry = {
+                    "room_id": room.room_id, "host": room.host, "game_id": room.game_id,
+                    "players": list(room.players), "game_config": room.game_config,
+                    "status": room.status, "port": room.port, "ip": room.ip,
+                    "started_at": room.started_at, "hosting": None
+                }
+                process = room.process
+                if room.status != "PLAYING" or process is None:
+                    entry.update(status="WAITING", port=None, ip=None, started_at=None)
+                elif isinstance(process, RunnerRoom):
+                    entry.update(hosting="runner", pid=process.pid)
+                    runners[process.runner.key, process.runner.process.pid] = process.runner
+                elif room.agent is not None:
+                    entry.update(hosting="agent", pid=process.pid, agent_id=room.agent.agent_id)
+                else:
+                    entry.update(hosting="local", pid=process.pid)
+            room_states.append(entry)
+
+        runner_states = []
+        for runner in runners.values():
+            detached = runner.detach()
+            if detached is None:
+                continue # exited meanwhile; the next lobby closes its rooms
+            stdin_fd, report_fd, pending = detached
+            runner_states.append({
+                "game_id": runner.key[0], "version": runner.key[1], "pid": runner.process.pid,
+                "stdin": add_fd(fds, stdin_fd), "report": add_fd(fds, report_fd),
+                "pending": base64.b64encode(pending).decode('ascii'),
+                "rooms": runner.room_ids(), "draining": runner.draining
+            })
+
+        streams = []
+        if self.output is not None:
+            for stream_id, game_id, fd, backlog in self.output.detach():
+                streams.append({"stream_id": stream_id, "game_id": game_id, "fd": add_fd(fds, fd),
+                                "backlog": base64.b64encode(backlog).decode('ascii')})
+
+        agents = []
+        if self.agents is not None:
+            for agent in self.agents.agents():
+                if agent.sock in sock_index:
+                    agents.append({"agent_id": agent.agent_id, "host": agent.host,
+                                   "control_port": agent.control_port, "capacity": agent.capacity,
+                                   "sock": sock_index[agent.sock]})
+
+        return {"next_room_id": next_room_id, "rooms": room_states, "runners": runner_states,
+                "agents": agents, "output": streams, "match_history": list(self.match_history)}
+
+    def adopt_state(self, state, fds, socks):
+        """
+        Takes over the room table exported by a previous lobby process.
+        Rooms keep their ids, players and ports, and their game servers are
+        watched from here on. `fds` are the handed-over descriptors, `socks`
+        maps connection indexes to the adopted lobby sockets.
+        """
+        self.match_history.extend(state["match_history"])
+        agents = {}
+        for entry in state["agents"]:
+            if self.agents is not None and entry["sock"] in socks:
+                agents[entry["agent_id"]] = self.agents.register(
+                    entry["agent_id"], entry["host"], entry["control_port"], entry["capacity"],
+                    socks[entry["sock"]])
+
+        if state["output"] and self.output is None:
+            self.output = OutputCapture() # the pipes must keep being read
+        for stream in state["output"]:
+            self.output.attach(stream["stream_id"], stream["game_id"], fds[stream["fd"]],
+                               base64.b64decode(stream["backlog"]))
+
+        local = []
+        runner_rooms = {} # room_id -> match key, for rooms hosted by a runner
+        with self.rooms_lock:
+            self.next_room_id = max(self.next_room_id, state["next_room_id"])
+        for entry in state["rooms"]:
+            room = Room(entry["room_id"], entry["host"], entry["game_id"], entry["game_config"])
+            room.players = entry["players"]
+            room.status = entry["status"]
+            room.port = entry["port"]
+            room.ip = entry["ip"]
+            room.started_at = entry["started_at"]
+            hosting = entry["hosting"]
+            if hosting == "agent":
+                room.agent = agents.get(entry["agent_id"])
+                if room.agent is None:
+                    print(f"Room {room.room_id}: host agent {entry['agent_id']} was not handed over, dropped")
+                    continue
+                self.agents.claim(room.agent, room.room_id)
+                room.process = RemoteProcess(room.agent, room.room_id, entry["pid"])
+            elif hosting == "local":
+                self.ports.reserve(room.port)
+                room.process = AdoptedProcess(entry["pid"])
+                local.append(room)
+            elif hosting == "runner":
+                self.ports.reserve(room.port)
+                runner_rooms[room.room_id] = (room.room_id, room.game_id, room.started_at)
+            with self.rooms_lock:
+                self.rooms[room.room_id] = room
+                insort(self._numbers, int(room.room_id))
+                self._index_add(self._by_game, room.game_id, room.room_id)
+                self._index_add(self._by_status, room.status, room.room_id)
+                for player in room.players:
+                    self._by_player.setdefault(player, set()).add(room.room_id)
+
+        for entry in state["runners"]:
+            rooms = {r: runner_rooms.pop(r) for r in entry["rooms"] if r in runner_rooms}
+            runner = self.runners.adopt(
+                (entry["game_id"], entry["version"]), AdoptedProcess(entry["pid"]),
+                fds[entry["report"]], os.fdopen(fds[entry["stdin"]], "wb"), rooms,
+                base64.b64decode(entry["pending"]), entry["draining"])
+            for room_id in rooms:
+                self.rooms[room_id].process = runner.room(room_id)
+            runner.start()
+            for room_id in entry["rooms"]:
+                if room_id not in rooms:
+                    runner.close_room(room_id) # closed on the other side meanwhile
+        for room_id in runner_rooms:
+            self.end_game(room_id) # its runner exited during the handoff
+
+        for room in local:
+            self.monitor.watch(room.room_id, room.game_id, room.process.pid)
+            if self.cpu is not None:
+                self.cpu.assign(room.room_id, room.process.pid)
+            self.reaper.watch((room.room_id, room.game_id, room.started_at), room.process)
 
     def handle_player_disconnect(self, username):
-        with self.lock:
-            # Find rooms where user is host or player
-            rooms_to_destroy = []
-            
-            for room_id, room in self.rooms.items():
+        # Only the rooms this user is in (as host or player)
+        with self.rooms_lock:
+            rooms = [self.rooms[r] for r in self._by_player.get(username, ()) if r in self.rooms]
+
+        rooms_to_destroy = []
+        for room in rooms:
+            with room.lock:
                 if room.host == username:
-                    rooms_to_destroy.append(room_id)
+                    rooms_to_destroy.append(room.room_id)
                 elif username in room.players:
-                    room.players.remove(username)
-            
-            for rid in rooms_to_destroy:
-                self.end_game(rid)
+                    with self.rooms_lock:
+                        room.players.remove(username)
+                        self._remove_player_index(username, room.room_id)
+        
+        for rid in rooms_to_destroy:
+            self.end_game(rid)
 
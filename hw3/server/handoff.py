@@ -0,0 +1,126 @@
+import os
+import select
+import signal
+import socket
+import subprocess
+
+import shared.utils as utils
+
+# SCM_RIGHTS takes at most 253 descriptors per message on Linux
+FD_BATCH = 250
+
+def add_fd(fds, fd):
+    """Appends a descriptor to the handoff list; state refers to it by the returned index."""
+    fds.append(fd)
+    return len(fds) - 1
+
+class AdoptedProcess:
+    """
+    Stands in for the Popen of a game server started by a previous lobby
+    process, so the reaper, end_game and match_history keep working after
+    a restart.
+
+    The process is tracked through a pidfd. Its exit status is only
+    known while it is still our child (a rolled-back handoff); otherwise
+    it is reported as -1.
+    """
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+        try:
+            self.pidfd = os.pidfd_open(pid)
+        except OSError:
+            self.pidfd = None
+            self.returncode = -1 # gone before we could adopt it
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                pid, status = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                if self._exited(0):
+                    self._finish(-1)
+            else:
+                if pid:
+                    self._finish(os.waitstatus_to_exitcode(status))
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None and not self._exited(timeout):
+            raise subprocess.TimeoutExpired(f"pid {self.pid}", timeout)
+        return self.poll()
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
+
+    def _exited(self, timeout):
+        poller = select.poll()
+        poller.register(self.pidfd, select.POLLIN)
+        return bool(poller.poll(None if timeout is None else timeout * 1000))
+
+    def _signal(self, signum):
+        if self.returncode is None:
+            try:
+                signal.pidfd_send_signal(self.pidfd, signum)
+            except ProcessLookupError:
+                pass
+
+    def _finish(self, returncode):
+        self.returncode = returncode
+        os.close(self.pidfd)
+        self.pidfd = None
+
+def send_handoff(sock, state, fds):
+    """
+    Sends the lobby state and the descriptors it refers to (by index)
+    over a Unix socket: one JSON frame, then the fds in batches.
+    """
+    utils.send_json(sock, {"state": state, "fds": len(fds)})
+    for i in range(0, len(fds), FD_BATCH):
+        socket.send_fds(sock, [b"F"], fds[i:i + FD_BATCH])
+
+def recv_handoff(sock):
+    """Counterpart of send_handoff. Returns (state, fds)."""
+    header = utils.recv_json(sock)
+    if header is None:
+        raise ConnectionError("Handoff socket closed before the state arrived")
+    fds = []
+    while len(fds) < header["fds"]:
+        msg, batch, _, _ = socket.recv_fds(sock, 1, min(FD_BATCH, header["fds"] - len(fds)))
+        if not msg:
+            raise ConnectionError("Handoff socket closed before every descriptor arrived")
+        fds.extend(batch)
+    return header["state"], fds
+
+def start_successor(argv, state, fds, timeout, env=None):
+    """
+    Starts `argv` with "--handoff <fd>" and hands it the state. Returns the
+    successor's Popen once it reported that it serves; raises (with the
+    successor stopped) otherwise.
+    """
+    ours, theirs = socket.socketpair()
+    try:
+        process = subprocess.Popen(argv + ["--handoff", str(theirs.fileno())],
+                                   pass_fds=(theirs.fileno(),), env=env)
+    finally:
+        theirs.close()
+    try:
+        with ours:
+            send_handoff(ours, state, fds)
+            ours.settimeout(timeout)
+            reply = utils.recv_json(ours)
+        if not reply or reply.get("status") != "ready":
+            raise RuntimeError(f"Successor did not take over: {reply}")
+        return process
+    except Exception:
+        process.kill()
+        process.wait()
+        raise
+
+def confirm_handoff(sock):
+    """Successor side: tells the old lobby it serves now."""
+    with sock:
+        utils.send_json(sock, {"status": "ready", "pid": os.getpid()})
@@ -0,0 +1,379 @@
+"""
+Game host agent: runs matches for the lobby on another machine (or
+another set of ports on the same one).
+
+    python -m server.host_agent --id box1 --lobby 10.0.0.5:8888 --ports 9100-9200
+
+The agent registers with the lobby (CMD_AGENT_REGISTER) over an ordinary
+lobby connection and sends a heartbeat with its capacity every few
+seconds. The lobby connects to the agent's control port to spawn and kill
+matches. Game files are fetched from the lobby with CMD_GAME_DOWNLOAD the
+first time a game (or a new version of it) is played here. Each version
+is installed into its own games/<game_id>@<version> directory, which the
+local room uses as its game id, so a new version never replaces the files
+of matches, pooled workers or runners still using the old one. Old
+versions are deleted once no match uses them. Matches run through a local
+GameManager, so readiness, reaping and the warm pool work exactly as on
+the lobby.
+
+Set GAME_AGENT_KEY to the same secret on the lobby and the agents. Without
+it both sides only talk over loopback.
+"""
+import argparse
+import io
+import os
+import re
+import shutil
+import socket
+import socketserver
+import sys
+import threading
+import time
+import zipfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.agent_registry import authorize_peer
+from server.game_manager import GameManager
+from shared.protocol import *
+import shared.utils as utils
+
+HEARTBEAT_INTERVAL = 2.0
+RECONNECT_DELAY = 3.0
+UNSAFE_VERSION_CHARS = re.compile(r"[^\w.-]") # versions become directory names
+
+def read_meminfo():
+    """(MemTotal, MemAvailable) in bytes from /proc/meminfo, or (0, 0)."""
+    values = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                name, rest = line.split(":", 1)
+                values[name] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError):
+        return 0, 0
+    return values.get("MemTotal", 0), values.get("MemAvailable", 0)
+
+class AgentControlHandler(socketserver.BaseRequestHandler):
+    """Lobby -> agent commands; one JSON request, one JSON response."""
+    def handle(self):
+        agent = self.server.agent
+        while True:
+            request = utils.recv_json(self.request)
+            if not request:
+                break
+            if not authorize_peer(agent.key, request.get(FIELD_TOKEN), self.client_address[0]):
+                utils.send_json(self.request, {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Not authorized"})
+                break
+            utils.send_json(self.request, agent.handle_command(request))
+
+class AgentControlServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class HostAgent:
+    def __init__(self, agent_id, lobby_addr, listen_addr=("0.0.0.0", 0), advertise_host=None,
+                 data_dir="agent_data", port_ranges=((9100, 9200),), key=None,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, **game_manager_options):
+        self.agent_id = agent_id
+        self.lobby_addr = lobby_addr
+        self.key = key
+        self.heartbeat_interval = heartbeat_interval
+        self.ports_total = sum(end - start for start, end in port_ranges)
+        self.games_dir = os.path.join(data_dir, agent_id, "games")
+        os.makedirs(self.games_dir, exist_ok=True)
+        self.gm = GameManager(port_ranges=list(port_ranges), games_dir=self.games_dir,
+                              on_match_end=self._on_match_end, advertise_ip=advertise_host,
+                              **game_manager_options)
+        self.advertise_host = self.gm.advertise_ip
+        self.control = AgentControlServer(listen_addr, AgentControlHandler)
+        self.control.agent = self
+        self._lock = threading.Lock()
+        self._rooms = {}        # lobby room id -> local room id
+        self._lobby_rooms = {}  # local room id -> lobby room id
+        self._ended = []        # finished matches not yet reported
+        self._latest = {}       # game_id -> install name of the newest version fetched
+        self._pinned = {}       # install name -> spawns between install and start_game
+        self._install_lock = threading.Lock()
+        self._lobby_lock = threading.Lock() # one request/response at a time on the lobby link
+        self._lobby = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._threads = []
+
+    @property
+    def control_port(self):
+        return self.control.server_address[1]
+
+    def start(self):
+        """Registers with the lobby and starts serving; returns immediately."""
+        self._connect()
+        for target, name in ((self.control.serve_forever, "agent-control"),
+                             (self._heartbeat_loop, "agent-heartbeat")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stops all matches, leaves the lobby and shuts the control server down."""
+        self._stopping = True
+        self._wake.set()
+        self.control.shutdown()
+        self.control.server_close()
+        for local_id in list(self.gm.rooms):
+            self.gm.end_game(local_id)
+        self.gm.shutdown()
+        with self._lobby_lock:
+            if self._lobby is not None:
+                self._lobby.close()
+                self._lobby = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    # --- Lobby link ---
+    def capacity(self):
+        try:
+            load = os.getloadavg()[0]
+        except (OSError, AttributeError):
+            load = 0.0
+        mem_total, mem_available = read_meminfo()
+        return {
+            "cpus": os.cpu_count() or 1,
+            "load": load,
+            "mem_total": mem_total,
+            "mem_available": mem_available,
+            "free_ports": self.gm.ports.available(),
+            "ports_total": self.ports_total,
+            "matches": len(self._rooms)
+        }
+
+    def _request(self, command, payload):
+        """Sends one request on the lobby link. Caller holds self._lobby_lock."""
+        utils.send_json(self._lobby, {FIELD_COMMAND: command, FIELD_TOKEN: self.key, FIELD_PAYLOAD: payload})
+        response = utils.recv_json(self._lobby)
+        if response is None:
+            raise ConnectionError("Lobby closed the connection")
+        return response
+
+    def _connect(self):
+        with self._lobby_lock:
+            self._lobby = socket.create_connection(self.lobby_addr, timeout=30)
+            response = self._request(CMD_AGENT_REGISTER, {
+                "agent_id": self.agent_id,
+                "host": self.advertise_host,
+                "control_port": self.control_port,
+                "capacity": self.capacity()
+            })
+            if response.get(FIELD_STATUS) != STATUS_OK:
+                self._lobby.close()
+                self._lobby = None
+                raise RuntimeError(f"Registration refused: {response.get(FIELD_MESSAGE)}")
+        print(f"Agent {self.agent_id} registered with lobby {self.lobby_addr}, control port {self.control_port}")
+
+    def _heartbeat_loop(self):
+        while not self._stopping:
+            self._wake.wait(self.heartbeat_interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            with self._lock:
+                ended, self._ended = self._ended, []
+            try:
+                with self._lobby_lock:
+                    response = self._request(CMD_AGENT_HEARTBEAT, {
+                        "capacity": self.capacity(),
+                        "ended": ended
+                    })
+                if response.get(FIELD_STATUS) != STATUS_OK:
+                    raise ConnectionError(response.get(FIELD_MESSAGE))
+            except (OSError, ConnectionError) as e:
+                if self._stopping:
+                    break
+                self._lobby_lost(e)
+
+    def _lobby_lost(self, error):
+        """The lobby closed our rooms when we disconnected; stop them and re-register."""
+        print(f"Agent {self.agent_id}: lost lobby connection ({error}), reconnecting")
+        with self._lock:
+            local_ids = list(self._lobby_rooms)
+            self._rooms.clear()
+            self._lobby_rooms.clear()
+            self._ended.clear()
+        for local_id in local_ids:
+            self.gm.end_game(local_id)
+        while not self._stopping:
+            try:
+                self._connect()
+                return
+            except (OSError, RuntimeError) as e:
+                print(f"Agent {self.agent_id}: reconnect failed: {e}")
+                time.sleep(RECONNECT_DELAY)
+
+    # --- Commands from the lobby ---
+    def handle_command(self, request):
+        command = request.get(FIELD_COMMAND)
+        payload = request.get(FIELD_PAYLOAD, {})
+        try:
+            if command == CMD_AGENT_SPAWN:
+                game_config = payload.get("game_config") or {"version": payload.get("version")}
+                return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: self.spawn(
+                    payload["room_id"], payload["game_id"], game_config, payload.get("players") or [])}
+            if command == CMD_AGENT_KILL:
+                self.kill(payload.get("room_id"))
+                return {FIELD_STATUS: STATUS_OK}
+        except Exception as e:
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: str(e)}
+        return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: f"Unknown command: {command}"}
+
+    def spawn(self, room_id, game_id, game_config, players):
+        """
+        Starts a lobby room here. The local room gets the game config the
+        lobby resolved and the same players, so hosting mode, limits and
+        transports are what a local start would use.
+        """
+        name = self._ensure_game(game_id, game_config.get("version"))
+        try:
+            host = players[0] if players else "lobby"
+            local_id = self.gm.create_room(host, name, dict(game_config))
+            for player in players[1:]:
+                self.gm.join_room(local_id, player)
+            with self._lock:
+                self._rooms[room_id] = local_id
+                self._lobby_rooms[local_id] = room_id
+            ok, info = self.gm.start_game(local_id, host)
+        finally:
+            with self._install_lock:
+                self._unpin(name)
+                self._prune(game_id)
+        if not ok:
+            with self._lock:
+                self._rooms.pop(room_id, None)
+                self._lobby_rooms.pop(local_id, None)
+            self.gm.end_game(local_id)
+            raise RuntimeError(info)
+        room = self.gm.rooms.get(local_id)
+        return {"port": info["port"], "pid": room.process.pid if room else None,
+                "transports": info.get("transports")}
+
+    def kill(self, room_id):
+        with self._lock:
+            local_id = self._rooms.pop(room_id, None)
+        if local_id is not None:
+            self.gm.end_game(local_id)
+
+    def _on_match_end(self, record):
+        """Local GameManager callback; reported to the lobby right away."""
+        with self._lock:
+            room_id = self._lobby_rooms.pop(record["room_id"], None)
+            if room_id is None:
+                return
+            self._rooms.pop(room_id, None)
+            self._ended.append({"room_id": room_id, "exit_code": record["exit_code"]})
+        self._wake.set()
+        # An install in progress prunes when it is done; never stall the reaper on a download
+        if self._install_lock.acquire(blocking=False):
+            try:
+                self._prune(record["game_id"].rpartition("@")[0])
+            finally:
+                self._install_lock.release()
+
+    @staticmethod
+    def _install_name(game_id, version):
+        """Directory (and local game id) of one version of a game: <game_id>@<version>."""
+        return f"{game_id}@{UNSAFE_VERSION_CHARS.sub('_', str(version))}"
+
+    def _ensure_game(self, game_id, version):
+        """
+        Downloads the game from the lobby unless this version is already
+        here. Returns its install name, pinned until the caller's
+        start_game is over (see _unpin).
+        """
+        with self._install_lock:
+            name = self._install_name(game_id, version)
+            if version is None or not os.path.isdir(os.path.join(self.games_dir, name)):
+                name = self._download(game_id, version)
+            self._latest[game_id] = name
+            self._pinned[name] = self._pinned.get(name, 0) + 1
+            self._prune(game_id)
+            return name
+
+    def _download(self, game_id, version):
+        """Fetches and unpacks the game into its version's directory. Caller holds self._install_lock."""
+        with self._lobby_lock:
+            response = self._request(CMD_GAME_DOWNLOAD, {"game_id": game_id})
+            if response.get(FIELD_STATUS) != STATUS_OK:
+                raise RuntimeError(f"Download failed: {response.get(FIELD_MESSAGE)}")
+            zip_data = utils.recv_all(self._lobby, response["file_size"])
+        if zip_data is None:
+            raise ConnectionError("Lobby closed the connection during download")
+        name = self._install_name(game_id, response.get("version") or version)
+        game_dir = os.path.join(self.games_dir, name)
+        if os.path.isdir(game_dir) and name in self._in_use():
+            return name # same version, already running here
+        staging = game_dir + ".part"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        with zipfile.ZipFile(io.BytesIO(zip_data)) as zf:
+            zf.extractall(staging)
+        if os.path.exists(game_dir):
+            shutil.rmtree(game_dir) # unversioned game, not in use
+            self.gm.invalidate_game(name)
+        os.rename(staging, game_dir)
+        return name
+
+    def _unpin(self, name):
+        """Caller holds self._install_lock."""
+        if self._pinned.get(name, 0) > 1:
+            self._pinned[name] -= 1
+        else:
+            self._pinned.pop(name, None)
+
+    def _in_use(self):
+        """Install names of local rooms and of spawns still starting."""
+        with self.gm.rooms_lock:
+            names = {room.game_id for room in self.gm.rooms.values()}
+        return names | set(self._pinned)
+
+    def _prune(self, game_id):
+        """
+        Deletes the versions of a game other than the newest one that no
+        match uses any more. Caller holds self._install_lock.
+        """
+        in_use = self._in_use()
+        prefix = game_id + "@"
+        for name in os.listdir(self.games_dir):
+            if not name.startswith(prefix) or name.endswith(".part") or \
+                    name == self._latest.get(game_id) or name in in_use:
+                continue
+            self.gm.invalidate_game(name) # idle pooled workers and runners of it go away
+            shutil.rmtree(os.path.join(self.games_dir, name), ignore_errors=True)
+
+def parse_address(text, default_host):
+    host, _, port = text.rpartition(":")
+    return (host or default_host, int(port))
+
+def main():
+    parser = argparse.ArgumentParser(description="Game host agent")
+    parser.add_argument("--id", required=True, help="unique agent name")
+    parser.add_argument("--lobby", default="127.0.0.1:8888", help="lobby host:port")
+    parser.add_argument("--listen", default="0.0.0.0:0", help="control address (port 0 = any)")
+    parser.add_argument("--advertise", help="address players use to reach this host")
+    parser.add_argument("--ports", default="9100-9200", help="game port range start-end (end exclusive)")
+    parser.add_argument("--data-dir", default="agent_data")
+    args = parser.parse_args()
+
+    start, end = (int(p) for p in args.ports.split("-"))
+    agent = HostAgent(args.id, parse_address(args.lobby, "127.0.0.1"),
+                      listen_addr=parse_address(args.listen, "0.0.0.0"),
+                      advertise_host=args.advertise, data_dir=args.data_dir,
+                      port_ranges=[(start, end)], key=os.environ.get("GAME_AGENT_KEY"))
+    agent.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Agent shutting down...")
+        agent.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.protocol import *
+
+class Matchmaker:
+    """
+    Automatic matchmaking: players queue for a game and are grouped into
+    rooms that GameManager starts right away.
+
+    One queue per (game_id, version), an OrderedDict username -> enqueue
+    time, so enqueue, dequeue of the oldest player and cancel are all
+    O(1). A username index finds a player's queue for cancel/disconnect.
+
+    Every `tick_interval` seconds each queue is drained into rooms:
+      - full rooms of max_players as long as that many are waiting;
+      - then, if at least min_players are left and the oldest of them has
+        waited `fill_wait` seconds, one smaller room with all of them.
+
+    Formed rooms are started on a small thread pool, since each start
+    waits for its game server to listen.
+
+    notify(username, message) pushes a message to a player (GAME_START or
+    MATCH_FAILED); it is called without the matchmaker lock.
+    """
+    def __init__(self, game_manager, notify, tick_interval=0.5, fill_wait=5.0, start_workers=4):
+        self.gm = game_manager
+        self.notify = notify
+        self.tick_interval = tick_interval
+        self.fill_wait = fill_wait
+        self._lock = threading.Lock()
+        self._queues = {}   # (game_id, version) -> OrderedDict username -> enqueued_at
+        self._games = {}    # (game_id, version) -> game dict (latest seen)
+        self._by_user = {}  # username -> (game_id, version)
+        self._thread = None
+        self._stop = threading.Event()
+        self._starter = ThreadPoolExecutor(max_workers=start_workers, thread_name_prefix="match-start")
+        self.matches_formed = 0
+
+    @staticmethod
+    def player_limits(game):
+        """
+        (min_players, max_players) from a game config, both at least 1.
+        Values that are not whole numbers (developer typos) count as unset.
+        """
+        def count(value):
+            try:
+                return int(value) if not isinstance(value, bool) else None
+            except (TypeError, ValueError):
+                return None
+        min_players = max(1, count(game.get("min_players")) or 1)
+        max_players = max(min_players, count(game.get("max_players")) or min_players)
+        return min_players, max_players
+
+    def enqueue(self, username, game):
+        """Queues a player. Returns (ok, queue_length or error message)."""
+        key = (game["game_id"], game.get("version"))
+        with self._lock:
+            if username in self._by_user:
+                return False, "Already in the match queue"
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = OrderedDict()
+            queue[username] = time.monotonic()
+            self._games[key] = game
+            self._by_user[username] = key
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="matchmaker", daemon=True)
+                self._thread.start()
+            return True, len(queue)
+
+    def cancel(self, username):
+        """Removes a player from whatever queue they are in. Returns True if they were queued."""
+        with self._lock:
+            key = self._by_user.pop(username, None)
+            if key is None:
+                return False
+            queue = self._queues[key]
+            del queue[username]
+            if not queue:
+                del self._queues[key]
+            return True
+
+    def queued(self, key=None):
+        with self._lock:
+            if key is not None:
+                return len(self._queues.get(key, ()))
+            return len(self._by_user)
+
+    def form_matches(self, now=None):
+        """
+        Dequeues every group that can be matched right now.
+        Returns [(game, [username, ...]), ...]; the players are no longer queued.
+        """
+        now = time.monotonic() if now is None else now
+        batches = []
+        with self._lock:
+            for key in list(self._queues):
+                try:
+                    self._form_queue(key, now, batches)
+                except Exception as e: # one broken game must not stop matchmaking for the rest
+                    print(f"Matchmaker: could not match queue {key}: {e}")
+        return batches
+
+    def _form_queue(self, key, now, batches):
+        """Caller holds self._lock."""
+        queue = self._queues[key]
+        game = self._games[key]
+        min_players, max_players = self.player_limits(game)
+        while len(queue) >= max_players:
+            batches.append((game, self._pop(queue, max_players)))
+        if len(queue) >= min_players and now - next(iter(queue.values())) >= self.fill_wait:
+            batches.append((game, self._pop(queue, len(queue))))
+        if not queue:
+            del self._queues[key]
+
+    def _pop(self, queue, count):
+        """Caller holds self._lock. The `count` longest-waiting players."""
+        players = []
+        for _ in range(count):
+            username, _ = queue.popitem(last=False)
+            del self._by_user[username]
+            players.append(username)
+        return players
+
+    def start_match(self, game, players):
+        """
+        Creates a room for `players` (first one hosts) and starts it.
+        Players the room refuses (gone, already in a room) get MATCH_FAILED;
+        if that leaves fewer than min_players, the room is closed and the
+        others go back to the front of the queue.
+        """
+        host = players[0]
+        room_id = self.gm.create_room(host, game["game_id"], game)
+        joined = [host]
+        for player in players[1:]:
+            ok, reason = self.gm.join_room(room_id, player)
+            if ok:
+                joined.append(player)
+            else:
+                self.notify(player, {FIELD_COMMAND: "MATCH_FAILED", FIELD_MESSAGE: reason})
+        if len(joined) < self.player_limits(game)[0]:
+            self.gm.end_game(room_id)
+            self._requeue(game, joined)
+            return False
+        ok, info = self.gm.start_game(room_id, host)
+        if not ok:
+            self.gm.end_game(room_id)
+            for player in joined:
+                self.notify(player, {FIELD_COMMAND: "MATCH_FAILED", FIELD_MESSAGE: info})
+            return False
+        start = dict(info, room_id=room_id, game_id=game["game_id"])
+        for player in joined:
+            self.notify(player, {FIELD_COMMAND: "GAME_START", FIELD_PAYLOAD: start})
+        with self._lock:
+            self.matches_formed += 1
+        return True
+
+    def _requeue(self, game, players):
+        """Puts matched players back at the front of their queue, ahead of everyone waiting."""
+        key = (game["game_id"], game.get("version"))
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = OrderedDict()
+            self._games.setdefault(key, game)
+            enqueued_at = min([time.monotonic()] + list(queue.values())[:1])
+            for username in reversed(players):
+                if username in self._by_user:
+                    continue # queued again on their own meanwhile
+                queue[username] = enqueued_at
+                queue.move_to_end(username, last=False)
+                self._by_user[username] = key
+            if not queue:
+                del self._queues[key]
+
+    def export_state(self):
+        """Queued players with their game and seconds waited, oldest first per game."""
+        now = time.monotonic()
+        with self._lock:
+            return [{"username": username, "game": self._games[key], "waited": now - enqueued_at}
+                    for key, queue in self._queues.items() for username, enqueued_at in queue.items()]
+
+    def adopt_state(self, queued):
+        """Re-queues exported players, keeping how long they have waited."""
+        for entry in queued:
+            if self.enqueue(entry["username"], entry["game"])[0]:
+                with self._lock:
+                    key = self._by_user[entry["username"]]
+                    self._queues[key][entry["username"]] = time.monotonic() - entry["waited"]
+
+    def _start_logged(self, game, players):
+        try:
+            self.start_match(game, players)
+        except Exception as e:
+            print(f"Matchmaker: could not start {game.get('game_id')} for {players}: {e}")
+
+    def tick(self):
+        for game, players in self.form_matches():
+            self._starter.submit(self._start_logged, game, players)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._starter.shutdown(wait=True)
+
+    def _run(self):
+        while not self._stop.wait(self.tick_interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Matchmaker: tick failed: {e}")
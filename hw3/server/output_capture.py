@@ -0,0 +1,254 @@
+import os
+import selectors
+import threading
+import time
+from collections import OrderedDict
+
+class RingBuffer:
+    """The last `max_bytes` bytes written; counts what was pushed out."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.dropped = 0
+        self.total = 0
+
+    def write(self, chunk):
+        self.total += len(chunk)
+        if len(chunk) >= self.max_bytes:
+            self.dropped += len(self.data) + len(chunk) - self.max_bytes
+            self.data = bytearray(chunk[-self.max_bytes:])
+            return
+        self.data += chunk
+        excess = len(self.data) - self.max_bytes
+        if excess > 0:
+            del self.data[:excess] # cheap: bytearray trims its head in place
+            self.dropped += excess
+
+    def tail(self, max_bytes=None):
+        if max_bytes is None or max_bytes >= len(self.data):
+            return bytes(self.data)
+        return bytes(self.data[-max_bytes:])
+
+class SpillFile:
+    """Appends to <path>, rotating to <path>.1 .. <path>.<backups> past max_bytes."""
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+
+    def write(self, chunk):
+        if self.size and self.size + len(chunk) > self.max_bytes:
+            self._rotate()
+        self.file.write(chunk)
+        self.file.flush()
+        self.size += len(chunk)
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, "wb")
+        self.size = 0
+
+    def close(self):
+        self.file.close()
+
+class CapturedStream:
+    def __init__(self, stream_id, game_id, fd, buffer_bytes, spill):
+        self.stream_id = stream_id
+        self.game_id = game_id
+        self.fd = fd
+        self.buffer = RingBuffer(buffer_bytes)
+        self.spill = spill
+        self.started_at = time.time()
+        self.ended_at = None
+
+class OutputCapture:
+    """
+    Collects game server stdout/stderr so it stays out of the lobby's
+    own output.
+
+    Each child writes into a pipe whose read end is attached here under a
+    stream id (the room id, or "runner:<game>@<version>" for a multi-room
+    runner). One selector thread reads every pipe without blocking. Each
+    read takes at most `chunk_bytes`, so a noisy game cannot starve the
+    others. Output goes into a ring buffer of `buffer_bytes` per stream.
+    With `spill_dir` it is also appended to a per-stream file there,
+    rotated at `spill_bytes` with `spill_backups` old files kept.
+    Nothing polls: the thread sleeps in select() until a child writes or
+    a stream is attached.
+
+    Streams whose process exited stay readable; the newest `keep_finished`
+    of them are kept. detach() hands the running streams' pipes over to a
+    lobby restart (server/handoff.py) without closing them.
+    """
+    def __init__(self, buffer_bytes=64 * 1024, spill_dir=None, spill_bytes=1024 * 1024,
+                 spill_backups=3, keep_finished=50, chunk_bytes=64 * 1024):
+        self.buffer_bytes = buffer_bytes
+        self.spill_dir = spill_dir
+        self.spill_bytes = spill_bytes
+        self.spill_backups = spill_backups
+        self.keep_finished = keep_finished
+        self.chunk_bytes = chunk_bytes
+        self._lock = threading.Lock()
+        self._streams = {}               # stream_id -> CapturedStream (running)
+        self._finished = OrderedDict()   # stream_id -> CapturedStream (oldest first)
+        self._pending = []               # (fd, stream) waiting to be registered
+        self._sel = None
+        self._wake_r = self._wake_w = None
+        self._thread = None
+        self._stopping = False
+        self._detaching = False
+
+    def attach(self, stream_id, game_id, fd, backlog=b''):
+        """
+        Starts capturing the read end `fd` (owned from now on) as `stream_id`.
+        `backlog` is output already captured elsewhere, put in the buffer first.
+        """
+        os.set_blocking(fd, False)
+        spill = None
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            name = f"{game_id}-{stream_id}".replace(os.sep, "_").replace(":", "_") + ".log"
+            spill = SpillFile(os.path.join(self.spill_dir, name), self.spill_bytes, self.spill_backups)
+        stream = CapturedStream(stream_id, game_id, fd, self.buffer_bytes, spill)
+        stream.buffer.write(backlog)
+        with self._lock:
+            if self._stopping:
+                os.close(fd)
+                return
+            self._finished.pop(stream_id, None)
+            self._streams[stream_id] = stream
+            self._pending.append((fd, stream))
+            if self._thread is None:
+                self._sel = selectors.DefaultSelector()
+                self._wake_r, self._wake_w = os.pipe()
+                os.set_blocking(self._wake_r, False)
+                self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+                self._thread = threading.Thread(target=self._run, name="output-capture", daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def read(self, stream_id, tail=None):
+        """{stream_id, game_id, running, total_bytes, dropped_bytes, output} or None."""
+        with self._lock:
+            stream = self._streams.get(stream_id) or self._finished.get(stream_id)
+            if stream is None:
+                return None
+            return {
+                "stream_id": stream.stream_id,
+                "game_id": stream.game_id,
+                "running": stream.ended_at is None,
+                "total_bytes": stream.buffer.total,
+                "dropped_bytes": stream.buffer.dropped,
+                "output": stream.buffer.tail(tail).decode(errors="replace")
+            }
+
+    def streams(self):
+        """Summaries of every running and kept finished stream."""
+        with self._lock:
+            streams = list(self._streams.values()) + list(self._finished.values())
+            return [{
+                "stream_id": s.stream_id,
+                "game_id": s.game_id,
+                "running": s.ended_at is None,
+                "buffered_bytes": len(s.buffer.data),
+                "total_bytes": s.buffer.total
+            } for s in streams]
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+        if thread is not None:
+            self._wake()
+            thread.join(timeout=5)
+
+    def detach(self):
+        """
+        Stops capturing but leaves the pipes open. Returns [(stream_id,
+        game_id, fd, buffered bytes)] for every running stream; the caller
+        owns those fds. The capture cannot be used afterwards.
+        """
+        with self._lock:
+            self._stopping = True
+            self._detaching = True
+            thread = self._thread
+        if thread is not None:
+            self._wake()
+            thread.join(timeout=5)
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+        for stream in streams:
+            if stream.spill is not None:
+                stream.spill.close()
+        return [(s.stream_id, s.game_id, s.fd, s.buffer.tail()) for s in streams]
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"x")
+        except (BlockingIOError, OSError, TypeError):
+            pass # a wakeup is already pending (or no thread yet)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                stopping = self._stopping
+            for fd, stream in pending:
+                self._sel.register(fd, selectors.EVENT_READ, stream)
+            if stopping:
+                break
+            for key, _ in self._sel.select():
+                if key.data is None:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._drain(key.fd, key.data)
+        for key in list(self._sel.get_map().values()):
+            if key.data is not None and not self._detaching:
+                self._finish(key.fd, key.data)
+        self._sel.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _drain(self, fd, stream):
+        try:
+            chunk = os.read(fd, self.chunk_bytes)
+        except BlockingIOError:
+            return
+        except OSError:
+            chunk = b""
+        if not chunk:
+            self._finish(fd, stream) # every writer (the child and its children) is gone
+            return
+        with self._lock:
+            stream.buffer.write(chunk)
+        if stream.spill is not None:
+            try:
+                stream.spill.write(chunk)
+            except OSError as e:
+                print(f"Output capture: spill for {stream.stream_id} failed, disabled: {e}")
+                stream.spill = None
+
+    def _finish(self, fd, stream):
+        self._sel.unregister(fd)
+        os.close(fd)
+        if stream.spill is not None:
+            stream.spill.close()
+            stream.spill = None
+        with self._lock:
+            stream.ended_at = time.time()
+            if self._streams.get(stream.stream_id) is stream:
+                del self._streams[stream.stream_id]
+                self._finished[stream.stream_id] = stream
+            while len(self._finished) > self.keep_finished:
+                self._finished.popitem(last=False)
@@ -0,0 +1,105 @@
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ALGORITHM = "pbkdf2_sha256"
+DEFAULT_ITERATIONS = 200000
+
+# --- KDF (module level so the process pool can pickle them) ---
+def hash_password(password, iterations=DEFAULT_ITERATIONS, salt=None):
+    """
+    Returns an encoded salted hash: pbkdf2_sha256$<iterations>$<salt>$<digest>
+    """
+    if salt is None:
+        salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode('utf-8'), salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, encoded):
+    try:
+        algorithm, iterations, salt, expected = encoded.split("$")
+        if algorithm != ALGORITHM:
+            return False
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode('utf-8'),
+                                     bytes.fromhex(salt), int(iterations))
+    except (ValueError, AttributeError):
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+def hash_iterations(encoded):
+    try:
+        return int(encoded.split("$")[1])
+    except (IndexError, ValueError):
+        return None
+
+class CredentialVerifier:
+    """
+    Runs password hashing/verification in a bounded process pool so the
+    KDF never runs on a request thread or under a DB lock.
+
+    iterations:  KDF cost for new hashes.
+    max_workers: pool size (0 = hash inline on the calling thread, for tests).
+    max_pending: cap on submitted-but-unfinished jobs; callers block beyond it.
+    cache_ttl:   seconds a successful verification is remembered.
+    """
+    def __init__(self, iterations=DEFAULT_ITERATIONS, max_workers=None,
+                 max_pending=None, cache_ttl=60):
+        self.iterations = iterations
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.cache_ttl = cache_ttl
+        self._pending = threading.BoundedSemaphore(max_pending or max(1, self.max_workers) * 8)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # (user_type, username) -> (fingerprint, expires_at)
+        self._cache = {}
+        self._cache_key = os.urandom(32)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a process that is running handler threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _run(self, fn, *args):
+        if self.max_workers == 0:
+            return fn(*args)
+        with self._pending:
+            return self._get_pool().submit(fn, *args).result()
+
+    def _fingerprint(self, encoded, password):
+        # Keyed so the cache never holds anything usable as a password hash
+        return hmac.new(self._cache_key, f"{encoded}\0{password}".encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.iterations)
+
+    def verify(self, cache_key, password, encoded):
+        now = time.monotonic()
+        fingerprint = self._fingerprint(encoded, password)
+        cached = self._cache.get(cache_key)
+        if cached and cached[1] > now and hmac.compare_digest(cached[0], fingerprint):
+            return True
+        if not self._run(verify_password, password, encoded):
+            return False
+        self._cache[cache_key] = (fingerprint, now + self.cache_ttl)
+        return True
+
+    def needs_rehash(self, encoded):
+        return hash_iterations(encoded) != self.iterations
+
+    def forget(self, cache_key):
+        self._cache.pop(cache_key, None)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
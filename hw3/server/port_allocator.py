@@ -0,0 +1,104 @@
+import socket
+import threading
+import time
+from collections import deque
+
+# Per-port states in the bitmap
+_UNMANAGED = 0
+_FREE = 1
+_USED = 2
+_QUARANTINED = 3
+
+class PortAllocator:
+    """
+    O(1) game-server port allocation over one or more port ranges.
+
+    Free ports sit in a FIFO free list, and a 64K-entry state bitmap answers
+    "is this port ours / in use" without scanning. Released ports are held
+    in quarantine for `quarantine` seconds before reuse, so late packets or
+    reconnecting clients of a finished match never reach the next one.
+
+    ranges: [(start, end_exclusive), ...]
+    probe:  if True, test-bind a port before handing it out and skip ports
+            some other program holds (one local syscall, no connect).
+    """
+    def __init__(self, ranges=((9000, 9100),), quarantine=30.0, probe=False):
+        self.quarantine = quarantine
+        self.probe = probe
+        self._lock = threading.Lock()
+        self._state = bytearray(65536)
+        self._free = deque()
+        self._quarantined = deque() # (release_time, port), oldest first
+        self._released_at = {}      # port -> release_time of its live quarantine entry
+        for start, end in ranges:
+            for port in range(start, end):
+                if self._state[port] == _UNMANAGED:
+                    self._state[port] = _FREE
+                    self._free.append(port)
+
+    def _drain_quarantine(self, now):
+        """Caller holds self._lock."""
+        while self._quarantined and now - self._quarantined[0][0] >= self.quarantine:
+            released_at, port = self._quarantined.popleft()
+            # Skip stale entries (port was reserved and released again since)
+            if self._state[port] == _QUARANTINED and self._released_at.get(port) == released_at:
+                del self._released_at[port]
+                self._state[port] = _FREE
+                self._free.append(port)
+
+    def allocate(self):
+        """Returns a free port, or None if every managed port is busy."""
+        with self._lock:
+            self._drain_quarantine(time.monotonic())
+            for _ in range(len(self._free)):
+                port = self._free.popleft()
+                if self.probe and not self._bindable(port):
+                    # Held by someone else: retry it after a quarantine period
+                    self._quarantine(port)
+                    continue
+                self._state[port] = _USED
+                return port
+            return None
+
+    def reserve(self, port):
+        """Marks a specific managed port as used (e.g. adopting a running server)."""
+        with self._lock:
+            if self._state[port] in (_FREE, _QUARANTINED):
+                if self._state[port] == _FREE:
+                    self._free.remove(port)
+                self._released_at.pop(port, None)
+                self._state[port] = _USED
+                return True
+            return False
+
+    def release(self, port):
+        if not port or not 0 < port < 65536:
+            return
+        with self._lock:
+            if self._state[port] != _USED:
+                return # not ours, or released twice
+            self._quarantine(port)
+
+    def _quarantine(self, port):
+        """Caller holds self._lock."""
+        now = time.monotonic()
+        self._state[port] = _QUARANTINED
+        self._released_at[port] = now
+        self._quarantined.append((now, port))
+
+    def is_used(self, port):
+        return self._state[port] == _USED
+
+    def available(self):
+        with self._lock:
+            self._drain_quarantine(time.monotonic())
+            return len(self._free)
+
+    @staticmethod
+    def _bindable(port):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            try:
+                s.bind(('0.0.0.0', port))
+                return True
+            except OSError:
+                return False
@@ -0,0 +1,121 @@
+import os
+import selectors
+import threading
+
+class ProcessReaper:
+    """
+    Dedicated thread that notices when watched child processes exit,
+    reaps them (no zombies) and reports the exit.
+
+    On Linux 5.3+ each process gets a pidfd registered in a selector, so
+    the thread sleeps until something actually exits. Elsewhere it falls
+    back to calling Popen.poll() every `poll_interval` seconds.
+
+    on_exit(key, process, returncode) runs on the reaper thread, with no
+    reaper lock held.
+    """
+    def __init__(self, on_exit, poll_interval=1.0):
+        self.on_exit = on_exit
+        self.poll_interval = poll_interval
+        self.use_pidfd = hasattr(os, "pidfd_open")
+        self._lock = threading.Lock()
+        self._watched = {} # key -> process
+        self._thread = None
+        self._stopping = False
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def watch(self, key, process):
+        with self._lock:
+            self._watched[key] = process
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="process-reaper", daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def watched(self):
+        with self._lock:
+            return dict(self._watched)
+
+    def stop(self):
+        self._stopping = True
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b'x')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        pidfds = {} # key -> (pidfd, process)
+        while not self._stopping:
+            if self.use_pidfd:
+                self._sync_pidfds(pidfds)
+                # Block until an exit, unless some process has no pidfd
+                timeout = None if all(fd is not None for fd, _ in pidfds.values()) else self.poll_interval
+            else:
+                timeout = self.poll_interval
+            fired = set()
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    fired.add(key.data)
+            if self.use_pidfd:
+                # Only exited processes (and any we could not open a pidfd for)
+                fired.update(k for k, (fd, _) in pidfds.items() if fd is None)
+                self._collect(pidfds, fired)
+            else:
+                self._collect(pidfds, None)
+
+    def _sync_pidfds(self, pidfds):
+        """Opens pidfds for newly watched processes."""
+        with self._lock:
+            new = [(k, p) for k, p in self._watched.items() if k not in pidfds or pidfds[k][1] is not p]
+        for key, process in new:
+            if key in pidfds:
+                self._close_pidfd(pidfds.pop(key)[0])
+            try:
+                # An adopted process brings its own pidfd, opened before its pid could be reused
+                pidfd = getattr(process, "pidfd", None)
+                fd = os.dup(pidfd) if pidfd is not None else os.pidfd_open(process.pid)
+            except OSError:
+                fd = None # already reaped; _collect picks it up via poll()
+            else:
+                self._selector.register(fd, selectors.EVENT_READ, key)
+            pidfds[key] = (fd, process)
+
+    def _close_pidfd(self, fd):
+        if fd is not None:
+            self._selector.unregister(fd)
+            os.close(fd)
+
+    def _collect(self, pidfds, keys):
+        """Polls the processes for `keys` (all watched ones if None)."""
+        with self._lock:
+            if keys is None:
+                candidates = list(self._watched.items())
+            else:
+                candidates = [(k, self._watched[k]) for k in keys if k in self._watched]
+        for key, process in candidates:
+            returncode = process.poll()
+            if returncode is None:
+                continue
+            with self._lock:
+                if self._watched.get(key) is process:
+                    del self._watched[key]
+            if key in pidfds and pidfds[key][1] is process:
+                self._close_pidfd(pidfds.pop(key)[0])
+            try:
+                self.on_exit(key, process, returncode)
+            except Exception as e:
+                print(f"Reaper: exit handler failed for {key}: {e}")
@@ -1,14 +1,39 @@
 from shared.protocol import *
 from server.db_manager import DBManager
 from server.game_manager import GameManager
+from server.matchmaker import Matchmaker
+from server.agent_registry import authorize_peer
+from server.response_cache import ResponseCache
+from server.session_manager import SessionRegistry
 import os
 import shutil
 
+# Payload key the dispatcher fills with the verified username
+AUTH_USER = "_user"
+
+# Commands that need a valid token, and the role that token must carry
+AUTH_REQUIRED = {
+    CMD_GAME_UPLOAD: "developers",
+    CMD_GAME_LIST_MY: "developers",
+    CMD_GAME_UPDATE: "developers",
+    CMD_GAME_DELETE: "developers",
+    CMD_ROOM_CREATE: "players",
+    CMD_ROOM_JOIN: "players",
+    CMD_GAME_START_NOTIFY: "players",
+    CMD_GAME_RATING: "players",
+    CMD_MATCH_QUEUE: "players",
+    CMD_MATCH_CANCEL: "players",
+}
+
 class RequestHandler:
-    def __init__(self, db_manager: DBManager, game_manager: GameManager):
+    def __init__(self, db_manager: DBManager, game_manager: GameManager, sessions: SessionRegistry = None,
+                 admin_key=None):
         self.db = db_manager
         self.gm = game_manager
-        self.sessions = {} # username -> socket
+        self.admin_key = admin_key # None: admin commands only from loopback
+        self.matchmaker = Matchmaker(game_manager, self._push)
+        self.sessions = sessions if sessions is not None else SessionRegistry()
+        self.response_cache = ResponseCache()
 
     def handle_request(self, request, client_socket):
         """
@@ -16,6 +41,7 @@ class RequestHandler:
         request: dict
         client_socket: used for receiving files if needed (e.g. UPLOAD)
         Returns: response dict
+        (a dict holding only "_frame" carries an already encoded response)
         """
         cmd = request.get(FIELD_COMMAND)
         payload = request.get(FIELD_PAYLOAD, {})
@@ -35,6 +61,7 @@ class RequestHandler:
             CMD_PLAYER_REGISTER: self.handle_player_register,
             CMD_PLAYER_LOGIN: self.handle_player_login,
             CMD_STORE_LIST: self.handle_store_list,
+            CMD_STORE_SEARCH: self.handle_store_search,
             CMD_GAME_DETAIL: self.handle_game_detail,
             CMD_GAME_DOWNLOAD: self.handle_game_download,
             CMD_PLAYER_LIST: self.handle_player_list,
@@ -42,31 +69,83 @@ class RequestHandler:
             CMD_ROOM_LIST: self.handle_room_list,
             CMD_ROOM_JOIN: self.handle_room_join,
             CMD_GAME_START_NOTIFY: self.handle_game_start, # Host triggers start
-            CMD_GAME_RATING: self.handle_game_rating
+            CMD_GAME_RATING: self.handle_game_rating,
+            CMD_MATCH_QUEUE: self.handle_match_queue,
+            CMD_MATCH_CANCEL: self.handle_match_cancel,
+
+            CMD_AGENT_REGISTER: self.handle_agent_register,
+            CMD_AGENT_HEARTBEAT: self.handle_agent_heartbeat,
+
+            CMD_ADMIN_RESOURCES: self.handle_admin_resources,
+            CMD_ADMIN_GAME_OUTPUT: self.handle_admin_game_output
         }
         
         handler = handler_map.get(cmd)
-        if handler:
-            return handler(payload, client_socket)
-        else:
+        if not handler:
             return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: f"Unknown command: {cmd}"}
 
+        # Never trust a username from the payload: it comes from the signed token
+        payload.pop(AUTH_USER, None)
+        role = AUTH_REQUIRED.get(cmd)
+        if role:
+            identity = self.sessions.verify_token(payload.get(FIELD_TOKEN))
+            if not identity or identity[1] != role:
+                return self._reject_unauthenticated(cmd, payload, client_socket)
+            payload[AUTH_USER] = identity[0]
+        return handler(payload, client_socket)
+
+    def _reject_unauthenticated(self, cmd, payload, sock):
+        if cmd == CMD_GAME_UPLOAD and isinstance(payload.get("file_size"), int) and payload["file_size"] > 0:
+            # The client streams the zip right after the header; consume it to stay in sync
+            import shared.utils as utils
+            utils.recv_all(sock, payload["file_size"])
+        return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Not authenticated"}
+
     def handle_disconnect(self, sock):
         """
         Called when a socket disconnects.
         Finds the associated user and cleans up.
         """
-        disconnected_user = None
-        # Find user by socket
-        for user, s in list(self.sessions.items()):
-            if s == sock:
-                disconnected_user = user
-                break
+        if self.gm.agents is not None:
+            self.gm.agents.remove_by_sock(sock) # closes the rooms it was hosting
+        session = self.sessions.remove_by_sock(sock)
+        if session:
+            print(f"User {session.username} disconnected. Cleaning up...")
+            self.matchmaker.cancel(session.username)
+            self.gm.handle_player_disconnect(session.username)
+
+    # --- Lobby restart (see server/handoff.py) ---
+    def export_state(self, fds, sock_index):
+        """Freezes the lobby and returns what the next lobby process needs to take over."""
+        self.matchmaker.stop()
+        return {
+            "token_secret": self.sessions.signer.secret.hex(),
+            "sessions": self.sessions.export_state(sock_index),
+            "match_queue": self.matchmaker.export_state(),
+            "games": self.gm.export_state(fds, sock_index)
+        }
+
+    def adopt_state(self, state, fds, socks):
+        """Takes over an exported lobby. Build the SessionRegistry with its token secret."""
+        self.gm.adopt_state(state["games"], fds, socks)
+        self.sessions.adopt_state(state["sessions"], socks)
+        self.matchmaker.adopt_state(state["match_queue"])
+
+    def _login(self, role, payload, sock):
+        username = payload.get("username")
+        password = payload.get("password")
         
-        if disconnected_user:
-            del self.sessions[disconnected_user]
-            print(f"User {disconnected_user} disconnected. Cleaning up...")
-            self.gm.handle_player_disconnect(disconnected_user)
+        # Check double login (before paying for the password hash)
+        existing = self.sessions.get_by_user(username)
+        if existing and existing.sock is not sock:
+             return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "User already logged in"}
+             
+        if not self.db.validate_user(role, username, password):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Invalid credentials"}
+        session = self.sessions.create(username, role, sock)
+        if session is None:
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "User already logged in"}
+        return {FIELD_STATUS: STATUS_OK, FIELD_TOKEN: session.token}
 
     # --- Developer Handlers ---
     def handle_dev_register(self, payload, sock):
@@ -77,23 +156,8 @@ class RequestHandler:
         return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Username already exists"}
 
     def handle_dev_login(self, payload, sock):
-        username = payload.get("username")
-        password = payload.get("password")
-        
-        # Check double login
-        if username in self.sessions:
-             return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "User already logged in"}
-             
-        if self.db.validate_user("developers", username, password):
-            # Devs don't strictly need persistent session unless we want to track them for notifications?
-            # But assignment implies "online status" usually for Players.
-            # However, for consistency and preventing weird state, let's track dev sessions too if needed?
-            # Actually, `sessions` is used for `handle_disconnect` cleanup.
-            # If we don't add Dev to sessions, we can't detect their disconnect easily (though request_handler manages sock).
-            # Let's add them to be safe, though they don't play games.
-            self.sessions[username] = sock
-            return {FIELD_STATUS: STATUS_OK, FIELD_TOKEN: username} 
-        return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Invalid credentials"}
+        # Devs are tracked in sessions too, so their disconnect is cleaned up
+        return self._login("developers", payload, sock)
 
     def handle_game_upload(self, payload, sock):
         # Multipart-like handling. Payload has metadata, socket stream has file.
@@ -106,7 +170,7 @@ class RequestHandler:
         # We need to read the file content from 'sock' NOW.
         # Payload should contain 'file_size' and 'game_id' etc.
         
-        username = payload.get("token") # check auth later properly
+        username = payload.get(AUTH_USER)
         game_meta = payload.get("game_meta")
         file_size = payload.get("file_size")
         
@@ -150,11 +214,12 @@ class RequestHandler:
             
         # Update DB
         if self.db.add_game_update(username, game_meta):
+            self.gm.invalidate_game(game_id) # pooled servers run the old files
             return {FIELD_STATUS: STATUS_OK, FIELD_MESSAGE: "Game uploaded"}
         return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "DB Update failed"}
 
     def handle_game_list_my(self, payload, sock):
-        username = payload.get("token")
+        username = payload.get(AUTH_USER)
         all_games = self.db.get_all_games()
         my_games = [g for g in all_games if g.get("owner") == username]
         return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: my_games}
@@ -167,9 +232,10 @@ class RequestHandler:
         return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Use Upload to update version"}
 
     def handle_game_delete(self, payload, sock):
-        username = payload.get("token")
+        username = payload.get(AUTH_USER)
         game_id = payload.get("game_id")
         if self.db.delete_game(username, game_id):
+            self.gm.invalidate_game(game_id)
             # Remove files
             path = os.path.join("server_data", "games", game_id)
             if os.path.exists(path):
@@ -186,32 +252,63 @@ class RequestHandler:
         return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Username already exists"}
         
     def handle_player_login(self, payload, sock):
-        username = payload.get("username")
-        password = payload.get("password")
-        
-        if username in self.sessions:
-             return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "User already logged in"}
-             
-        if self.db.validate_user("players", username, password):
-            self.sessions[username] = sock # Track session
-            return {FIELD_STATUS: STATUS_OK, FIELD_TOKEN: username}
-        return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Invalid credentials"}
+        return self._login("players", payload, sock)
+
+    def _cached_catalog_response(self, payload, key, build, snapshot=None):
+        """
+        Serves a catalog read from pre-encoded frames.
+        If the client already has the current revision, replies NOT_MODIFIED.
+        build(games) returns the full response dict for a cache miss.
+        `key` must come from a bounded set (cache entries are kept per revision).
+        """
+        revision, games = snapshot or self.db.get_catalog_snapshot()
+        if payload.get(FIELD_REVISION) == revision:
+            key = ("not_modified",)
+            build_response = lambda: {FIELD_STATUS: STATUS_NOT_MODIFIED, FIELD_REVISION: revision}
+        else:
+            build_response = lambda: dict(build(games), **{FIELD_REVISION: revision})
+        return {"_frame": self.response_cache.get(key, revision, build_response)}
 
     def handle_store_list(self, payload, sock):
-        games = self.db.get_all_games()
-        return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: games}
+        return self._cached_catalog_response(
+            payload, ("store_list",),
+            lambda games: {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: list(games.values())})
+
+    def handle_store_search(self, payload, sock):
+        query = payload.get("query", "")
+        try:
+            offset = max(0, int(payload.get("offset", 0)))
+            limit = min(100, max(1, int(payload.get("limit", 20))))
+        except (TypeError, ValueError):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Invalid offset/limit"}
+        total, games = self.db.search_games(query, offset, limit,
+                                            bool(payload.get("include_reviews")))
+        next_offset = offset + limit if offset + limit < total else None
+        return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: {
+            "results": games,
+            "total": total,
+            "next_offset": next_offset
+        }}
 
     def handle_player_list(self, payload, sock):
-        # Return list of currently connected users (keys of self.sessions)
-        online_users = list(self.sessions.keys())
+        # Return list of currently logged in users
+        online_users = self.sessions.online_users()
         return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: online_users}
 
     def handle_game_detail(self, payload, sock):
         game_id = payload.get("game_id")
-        game = self.db.get_game(game_id)
-        if game:
-            return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: game}
-        return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Game not found"}
+        snapshot = self.db.get_catalog_snapshot()
+        # Only ids of existing games become cache keys, so made-up ids
+        # cannot grow the cache
+        if not isinstance(game_id, str) or game_id not in snapshot[1]:
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Game not found"}
+
+        def build(games):
+            return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: games[game_id]}
+
+        # Revision is catalog-wide: a detail comes back NOT_MODIFIED only
+        # when nothing in the catalog changed since the client fetched it.
+        return self._cached_catalog_response(payload, ("game_detail", game_id), build, snapshot)
         
     def handle_game_download(self, payload, sock):
         # Return file stream
@@ -243,15 +340,17 @@ class RequestHandler:
         # We need to embed the file content? No, too big for JSON.
         # We can use a special status "FILE_STREAM_FOLLOWS".
         
+        game = self.db.get_game(game_id)
         return {
             FIELD_STATUS: STATUS_OK, 
             "file_size": len(zip_data),
+            "version": game.get("version") if game else None,
             "file_content_placeholder": "STREAM", # marker
             "_raw_data": zip_data # Hack: pass to server loop to send
         }
 
     def handle_room_create(self, payload, sock):
-        host = payload.get("token")
+        host = payload.get(AUTH_USER)
         game_id = payload.get("game_id")
         # fetch game config from DB?
         game = self.db.get_game(game_id)
@@ -262,11 +361,19 @@ class RequestHandler:
         return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: {"room_id": room_id}}
 
     def handle_room_list(self, payload, sock):
-        rooms = self.gm.list_rooms()
-        return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: rooms}
+        # Payload stays a plain list of rooms; the next page starts after "next_cursor"
+        try:
+            cursor = payload.get("cursor")
+            cursor = int(cursor) if cursor is not None else None
+            limit = min(200, max(1, int(payload.get("limit", 50))))
+        except (TypeError, ValueError):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Invalid cursor/limit"}
+        rooms, next_cursor = self.gm.page_rooms(payload.get("game_id"), payload.get("status"),
+                                                cursor, limit)
+        return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: rooms, "next_cursor": next_cursor}
 
     def handle_room_join(self, payload, sock):
-        player = payload.get("token")
+        player = payload.get(AUTH_USER)
         room_id = payload.get("room_id")
         success, msg = self.gm.join_room(room_id, player)
         if success:
@@ -274,7 +381,7 @@ class RequestHandler:
         return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: msg}
 
     def handle_game_start(self, payload, sock):
-        host = payload.get("token")
+        host = payload.get(AUTH_USER)
         room_id = payload.get("room_id")
         success, res = self.gm.start_game(room_id, host)
         if success:
@@ -282,16 +389,15 @@ class RequestHandler:
             if room:
                 for p in room.players:
                     if p != host: # Host gets return value
-                        p_sock = self.sessions.get(p)
-                        if p_sock:
+                        p_session = self.sessions.get_by_user(p)
+                        if p_session:
                             try:
                                 notify = {
                                     FIELD_COMMAND: "GAME_START",
                                     FIELD_PAYLOAD: res
                                 }
-                                import shared.utils as utils
-                                print(f"DEBUG: Sending GAME_START to {p} via {p_sock}")
-                                utils.send_json(p_sock, notify)
+                                print(f"DEBUG: Sending GAME_START to {p} via {p_session.sock}")
+                                p_session.send(notify)
                             except Exception as e:
                                 print(f"DEBUG: Failed to send to {p}: {e}")
                                 pass # socket dead?
@@ -299,8 +405,37 @@ class RequestHandler:
             return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: res}
         return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: res}
 
+    def _push(self, username, message):
+        """Sends an unsolicited message to a logged-in player, if still connected."""
+        session = self.sessions.get_by_user(username)
+        if session is None:
+            return False
+        try:
+            session.send(message)
+            return True
+        except OSError as e:
+            print(f"Failed to push {message.get(FIELD_COMMAND)} to {username}: {e}")
+            return False
+
+    def handle_match_queue(self, payload, sock):
+        username = payload.get(AUTH_USER)
+        game = self.db.get_game(payload.get("game_id"))
+        if not game:
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Game not found"}
+        ok, result = self.matchmaker.enqueue(username, game)
+        if not ok:
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: result}
+        min_players, max_players = Matchmaker.player_limits(game)
+        return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: {
+            "queued": result, "min_players": min_players, "max_players": max_players}}
+
+    def handle_match_cancel(self, payload, sock):
+        if self.matchmaker.cancel(payload.get(AUTH_USER)):
+            return {FIELD_STATUS: STATUS_OK, FIELD_MESSAGE: "Left the match queue"}
+        return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Not in the match queue"}
+
     def handle_game_rating(self, payload, sock):
-        username = payload.get("token")
+        username = payload.get(AUTH_USER)
         game_id = payload.get("game_id")
         rating = payload.get("rating")
         comment = payload.get("comment")
@@ -308,3 +443,51 @@ class RequestHandler:
         if self.db.add_review(game_id, username, rating, comment):
             return {FIELD_STATUS: STATUS_OK, FIELD_MESSAGE: "Rated"}
         return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Failed"}
+
+    # --- Game Host Agents ---
+    def handle_agent_register(self, payload, sock):
+        agents = self.gm.agents
+        if agents is None:
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Host agents are not enabled"}
+        peer_ip = sock.getpeername()[0]
+        if not agents.authorize(payload.get(FIELD_TOKEN), peer_ip):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Not authorized"}
+        agent_id = payload.get("agent_id")
+        control_port = payload.get("control_port")
+        if not agent_id or not isinstance(control_port, int):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Missing data"}
+        host = payload.get("host")
+        if not host or host == "0.0.0.0":
+            host = peer_ip
+        agents.register(agent_id, host, control_port, payload.get("capacity") or {}, sock)
+        print(f"Host agent {agent_id} registered at {host}:{control_port}")
+        return {FIELD_STATUS: STATUS_OK}
+
+    def handle_agent_heartbeat(self, payload, sock):
+        agents = self.gm.agents
+        if agents is None or not agents.heartbeat(sock, payload.get("capacity") or {}, payload.get("ended") or []):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Agent not registered"}
+        return {FIELD_STATUS: STATUS_OK}
+
+    # --- Admin ---
+    def _is_admin(self, payload, sock):
+        return authorize_peer(self.admin_key, payload.get(FIELD_TOKEN), sock.getpeername()[0])
+
+    def handle_admin_resources(self, payload, sock):
+        if not self._is_admin(payload, sock):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Not authorized"}
+        return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: self.gm.resource_report()}
+
+    def handle_admin_game_output(self, payload, sock):
+        """Output of one room ("room_id", optional "tail" bytes), or the list of captured streams."""
+        if not self._is_admin(payload, sock):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Not authorized"}
+        try:
+            tail = int(payload["tail"]) if payload.get("tail") is not None else None
+        except (TypeError, ValueError):
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "Invalid tail"}
+        room_id = payload.get("room_id")
+        output = self.gm.game_output(str(room_id) if room_id is not None else None, tail)
+        if output is None:
+            return {FIELD_STATUS: STATUS_ERROR, FIELD_MESSAGE: "No captured output"}
+        return {FIELD_STATUS: STATUS_OK, FIELD_PAYLOAD: output}
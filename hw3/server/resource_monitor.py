@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+def read_proc_usage(pid):
+    """
+    (cpu_seconds, rss_bytes) of a live process from /proc/<pid>/stat,
+    or None if it is gone or /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # comm (field 2) may contain spaces; the remaining fields follow the last ')'
+    fields = stat[stat.rfind(b')') + 2:].split()
+    try:
+        utime, stime = int(fields[11]), int(fields[12])
+        rss_pages = int(fields[21])
+    except (IndexError, ValueError):
+        return None
+    return (utime + stime) / _CLOCK_TICKS, rss_pages * _PAGE_SIZE
+
+try:
+    _CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _CLOCK_TICKS, _PAGE_SIZE = 100, 4096
+
+class ResourceMonitor:
+    """
+    Samples CPU time and RSS of running game servers every `interval`
+    seconds from /proc (Linux; elsewhere nothing is recorded).
+
+    Per room: cpu_seconds, cpu_percent over the last interval, rss_bytes
+    and peak_rss_bytes. When a match finishes its last sample is folded
+    into per-game totals. A process's usage is only known up to its last
+    sample, since /proc is gone once it has been reaped.
+    """
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._rooms = {} # room_id -> usage dict
+        self._games = {} # game_id -> totals dict
+        self._thread = None
+        self._stop = threading.Event()
+
+    def watch(self, room_id, game_id, pid):
+        usage = {
+            "room_id": room_id,
+            "game_id": game_id,
+            "pid": pid,
+            "started_at": time.time(),
+            "cpu_seconds": 0.0,
+            "cpu_percent": 0.0,
+            "rss_bytes": 0,
+            "peak_rss_bytes": 0,
+            "sampled_at": None
+        }
+        self._sample(usage)
+        with self._lock:
+            self._rooms[room_id] = usage
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+                self._thread.start()
+
+    def finish(self, room_id):
+        """Stops sampling a room and adds its usage to its game's totals. Returns the usage."""
+        with self._lock:
+            usage = self._rooms.pop(room_id, None)
+            if usage is None:
+                return None
+            totals = self._games.setdefault(usage["game_id"], {
+                "matches": 0,
+                "cpu_seconds": 0.0,
+                "match_seconds": 0.0,
+                "peak_rss_bytes": 0
+            })
+            totals["matches"] += 1
+            totals["cpu_seconds"] += usage["cpu_seconds"]
+            totals["match_seconds"] += time.time() - usage["started_at"]
+            totals["peak_rss_bytes"] = max(totals["peak_rss_bytes"], usage["peak_rss_bytes"])
+            return dict(usage)
+
+    def report(self):
+        """{"rooms": [usage, ...], "games": {game_id: totals}}; running matches count toward their game."""
+        with self._lock:
+            rooms = [dict(u) for u in self._rooms.values()]
+            games = {g: dict(t) for g, t in self._games.items()}
+        for usage in rooms:
+            totals = games.setdefault(usage["game_id"], {
+                "matches": 0, "cpu_seconds": 0.0, "match_seconds": 0.0, "peak_rss_bytes": 0})
+            totals["running"] = totals.get("running", 0) + 1
+            totals["cpu_seconds"] += usage["cpu_seconds"]
+            totals["peak_rss_bytes"] = max(totals["peak_rss_bytes"], usage["peak_rss_bytes"])
+        for totals in games.values():
+            totals["cpu_seconds"] = round(totals["cpu_seconds"], 3)
+            totals["match_seconds"] = round(totals["match_seconds"], 3)
+        return {"rooms": rooms, "games": games}
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _sample(self, usage):
+        sample = read_proc_usage(usage["pid"])
+        if sample is None:
+            return
+        cpu_seconds, rss = sample
+        now = time.monotonic()
+        if usage["sampled_at"] is not None and now > usage["sampled_at"]:
+            usage["cpu_percent"] = round(
+                100.0 * (cpu_seconds - usage["cpu_seconds"]) / (now - usage["sampled_at"]), 1)
+        usage["cpu_seconds"] = cpu_seconds
+        usage["rss_bytes"] = rss
+        usage["peak_rss_bytes"] = max(usage["peak_rss_bytes"], rss)
+        usage["sampled_at"] = now
+
+    def sample_all(self):
+        with self._lock:
+            rooms = list(self._rooms.values())
+        for usage in rooms:
+            self._sample(usage)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample_all()
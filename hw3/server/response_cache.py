@@ -0,0 +1,36 @@
+import shared.utils as utils
+
+class ResponseCache:
+    """
+    Pre-encoded response frames for read-only catalog commands.
+
+    Entries are only valid for a single catalog revision. The first lookup
+    with a newer revision drops everything cached for the old one, so a
+    mutation in DBManager invalidates the cache without any explicit hook.
+    """
+    def __init__(self):
+        # (revision, {key: frame_bytes}) swapped as one reference, so
+        # handler threads can read it without a lock.
+        self._entries = (None, {})
+
+    def get(self, key, revision, build):
+        """
+        Returns the frame for `key` at `revision`, calling build() to produce
+        the response dict on a miss. Concurrent misses may both build; the
+        result is identical so the last writer simply wins.
+        """
+        cached_revision, frames = self._entries
+        if cached_revision is None or revision > cached_revision:
+            frames = {}
+            self._entries = (revision, frames)
+        elif revision < cached_revision:
+            # Caller holds an older snapshot than the cache; serve it uncached
+            return utils.encode_json(build())
+        frame = frames.get(key)
+        if frame is None:
+            frame = utils.encode_json(build())
+            frames[key] = frame
+        return frame
+
+    def clear(self):
+        self._entries = (None, {})
@@ -0,0 +1,295 @@
+"""
+Hosts many rooms of one multi-room game in a single process.
+
+Usage: python room_runner.py <report_fd> <room_module_path>
+
+Games opt in with "hosting": "multi_room" in config.json and ship a room
+module ("room_module", default rooms.py) that defines a GameRoom class:
+
+    class GameRoom:
+        def __init__(self, room): ...          # room: RoomContext
+        def on_connect(self, client): ...
+        def on_data(self, client, data): ...   # bytes, as received
+        def on_disconnect(self, client): ...
+        def on_close(self): ...
+
+Every callback is optional. They all run on the runner's one event loop,
+so they must not block. RoomContext has room_id, players, clients and
+send(client, data, key=None), broadcast(data, exclude=None, key=None),
+disconnect(client), end() (the match is over) and metrics(). An
+exception in a callback closes only that room.
+
+Each client's unsent data waits in a bounded OutboundQueue
+(shared/game_sdk/outbound.py). GameRoom may set the class attributes
+slow_consumer, max_queue_bytes and max_queue_messages to pick the
+policy for clients that do not keep up; the default drops their oldest
+messages.
+
+Control, one JSON object per line on stdin:
+    {"op": "open", "room_id": "7", "port": 9001, "players": ["a", "b"]}
+    {"op": "close", "room_id": "7"}
+EOF on stdin closes every room and exits.
+
+Reports, one JSON object per line on <report_fd>:
+    {"event": "ready"}
+    {"event": "opened", "room_id": "7", "port": 9001}
+    {"event": "open_failed", "room_id": "7", "error": "..."}
+    {"event": "closed", "room_id": "7", "reason": "ended" | "lobby" | "error"}
+"""
+import importlib.util
+import json
+import os
+import selectors
+import socket
+import sys
+import traceback
+
+from game_bootstrap import apply_env_limits
+from shared.game_sdk.outbound import DROP_OLDEST, OutboundQueue
+
+class Client:
+    def __init__(self, room, sock, addr):
+        self.room = room
+        self.sock = sock
+        self.addr = addr
+        game = room.runner.room_class
+        self.outq = OutboundQueue(getattr(game, "max_queue_bytes", 256 * 1024),
+                                  getattr(game, "max_queue_messages", 1024),
+                                  getattr(game, "slow_consumer", DROP_OLDEST))
+        self.writing = False # registered for EVENT_WRITE
+        self.closed = False
+
+    def send(self, data, key=None):
+        self.room.send(self, data, key)
+
+    def close(self):
+        self.room.disconnect(self)
+
+class RoomContext:
+    """One hosted match: its listening socket, clients and GameRoom instance."""
+    def __init__(self, runner, room_id, listener, players):
+        self.runner = runner
+        self.room_id = room_id
+        self.listener = listener
+        self.players = list(players)
+        self.clients = []
+        self.game = None
+        # Totals of clients that already left (see metrics())
+        self.dropped = 0
+        self.coalesced = 0
+        self.slow_disconnects = 0
+
+    def send(self, client, data, key=None):
+        if client.closed:
+            return
+        if not client.outq.push(data, key):
+            print(f"Game: dropping slow client {client.addr} ({client.outq.nbytes} bytes queued)")
+            self.slow_disconnects += 1
+            self.runner.drop_client(client)
+            return
+        self.runner.flush(client)
+
+    def broadcast(self, data, exclude=None, key=None):
+        for client in list(self.clients):
+            if client is not exclude:
+                self.send(client, data, key)
+
+    def metrics(self):
+        """Outbound queue totals of this room; dropped/coalesced include clients that left."""
+        queues = [client.outq for client in self.clients]
+        return {
+            "connections": len(queues),
+            "queued_bytes": sum(q.nbytes for q in queues),
+            "max_queue_bytes": max((q.nbytes for q in queues), default=0),
+            "max_queue_messages": max((len(q) for q in queues), default=0),
+            "dropped_messages": self.dropped + sum(q.dropped for q in queues),
+            "coalesced_messages": self.coalesced + sum(q.coalesced for q in queues),
+            "slow_disconnects": self.slow_disconnects,
+        }
+
+    def disconnect(self, client):
+        self.runner.drop_client(client)
+
+    def end(self):
+        self.runner.close_room(self.room_id, "ended")
+
+class Runner:
+    def __init__(self, report_fd, room_class):
+        self.report_fd = report_fd
+        self.room_class = room_class
+        self.sel = selectors.DefaultSelector()
+        self.rooms = {}
+        self.stdin_buf = b''
+        self.running = True
+
+    def report(self, **event):
+        try:
+            os.write(self.report_fd, (json.dumps(event) + "\n").encode())
+        except OSError:
+            self.running = False # lobby is gone
+
+    def callback(self, room, name, *args):
+        """Runs a GameRoom callback; a failing room is closed, the others keep going."""
+        handler = getattr(room.game, name, None)
+        if handler is None:
+            return
+        try:
+            handler(*args)
+        except Exception:
+            traceback.print_exc()
+            self.close_room(room.room_id, "error")
+
+    # --- Control ---
+    def open_room(self, room_id, port, players):
+        if room_id in self.rooms:
+            self.report(event="open_failed", room_id=room_id, error="Room already open")
+            return
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(("0.0.0.0", int(port)))
+            listener.listen()
+            listener.setblocking(False)
+        except OSError as e:
+            listener.close()
+            self.report(event="open_failed", room_id=room_id, error=str(e))
+            return
+        room = RoomContext(self, room_id, listener, players)
+        self.rooms[room_id] = room
+        self.sel.register(listener, selectors.EVENT_READ, ("accept", room))
+        try:
+            room.game = self.room_class(room)
+        except Exception as e:
+            traceback.print_exc()
+            self.sel.unregister(listener)
+            listener.close()
+            del self.rooms[room_id]
+            self.report(event="open_failed", room_id=room_id, error=f"GameRoom failed: {e}")
+            return
+        self.report(event="opened", room_id=room_id, port=listener.getsockname()[1])
+
+    def close_room(self, room_id, reason):
+        room = self.rooms.pop(room_id, None)
+        if room is None:
+            return
+        for client in list(room.clients):
+            self.drop_client(client, notify=False)
+        self.sel.unregister(room.listener)
+        room.listener.close()
+        if reason != "error":
+            self.callback(room, "on_close")
+        self.report(event="closed", room_id=room_id, reason=reason)
+
+    def handle_control(self, line):
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            print(f"Runner: bad control line {line!r}")
+            return
+        if msg.get("op") == "open":
+            self.open_room(str(msg["room_id"]), msg.get("port", 0), msg.get("players", []))
+        elif msg.get("op") == "close":
+            self.close_room(str(msg["room_id"]), "lobby")
+
+    def read_stdin(self):
+        chunk = os.read(sys.stdin.fileno(), 65536)
+        if not chunk:
+            self.running = False # lobby closed the control pipe
+            return
+        self.stdin_buf += chunk
+        while b'\n' in self.stdin_buf:
+            line, self.stdin_buf = self.stdin_buf.split(b'\n', 1)
+            if line.strip():
+                self.handle_control(line)
+
+    # --- Clients ---
+    def accept(self, room):
+        try:
+            sock, addr = room.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sock.setblocking(False)
+        client = Client(room, sock, addr)
+        room.clients.append(client)
+        self.sel.register(sock, selectors.EVENT_READ, ("client", client))
+        self.callback(room, "on_connect", client)
+
+    def read_client(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.drop_client(client)
+            return
+        self.callback(client.room, "on_data", client, data)
+
+    def flush(self, client):
+        """Writes as much of the client's queue as the socket takes; waits for EVENT_WRITE for the rest."""
+        if client.closed:
+            return
+        try:
+            pending = not client.outq.write(client.sock)
+        except OSError:
+            self.drop_client(client)
+            return
+        if pending != client.writing:
+            client.writing = pending
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+            self.sel.modify(client.sock, events, ("client", client))
+
+    def drop_client(self, client, notify=True):
+        if client.closed:
+            return
+        client.closed = True
+        self.sel.unregister(client.sock)
+        client.sock.close()
+        room = client.room
+        room.dropped += client.outq.dropped
+        room.coalesced += client.outq.coalesced
+        if client in room.clients:
+            room.clients.remove(client)
+        if notify and room.room_id in self.rooms:
+            self.callback(room, "on_disconnect", client)
+
+    # --- Loop ---
+    def run(self):
+        os.set_blocking(sys.stdin.fileno(), False)
+        self.sel.register(sys.stdin.fileno(), selectors.EVENT_READ, ("control", None))
+        self.report(event="ready")
+        while self.running:
+            for key, mask in self.sel.select():
+                kind, obj = key.data
+                if kind == "control":
+                    self.read_stdin()
+                elif kind == "accept":
+                    if obj.room_id in self.rooms:
+                        self.accept(obj)
+                elif kind == "client" and not obj.closed:
+                    if mask & selectors.EVENT_READ:
+                        self.read_client(obj)
+                    if mask & selectors.EVENT_WRITE and not obj.closed:
+                        self.flush(obj)
+        for room_id in list(self.rooms):
+            self.close_room(room_id, "lobby")
+
+def load_room_class(module_path):
+    spec = importlib.util.spec_from_file_location("game_rooms", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.GameRoom
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python room_runner.py <report_fd> <room_module_path>")
+        sys.exit(1)
+    report_fd = int(sys.argv[1])
+    module_path = os.path.abspath(sys.argv[2])
+    sys.path.insert(0, os.path.dirname(module_path))
+    apply_env_limits()
+    Runner(report_fd, load_room_class(module_path)).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+import json
+import os
+import select
+import subprocess
+import threading
+
+from server.resource_monitor import read_proc_usage
+
+class RunnerRoom:
+    """
+    Stands in for a Popen of one match hosted by a RoomRunner, so rooms,
+    end_game and match_history treat it like any other game server.
+    """
+    def __init__(self, runner, room_id):
+        self.runner = runner
+        self.room_id = room_id
+        self.pid = runner.process.pid
+        self.returncode = None
+        self.match_key = None # set by GameManager once the match is running
+        self._closed = threading.Event()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if not self._closed.wait(timeout):
+            raise subprocess.TimeoutExpired(f"room {self.room_id}", timeout)
+        return self.returncode
+
+    def terminate(self):
+        if self.returncode is None:
+            self.runner.close_room(self.room_id)
+
+    def kill(self):
+        # The runner has to stay up for its other rooms; stop waiting for this one
+        self.terminate()
+        self._mark_closed(-9)
+
+    def _mark_closed(self, returncode):
+        if self.returncode is None:
+            self.returncode = returncode
+        self._closed.set()
+
+class RoomRunner:
+    """
+    Lobby side of one server/room_runner.py process: sends open/close
+    commands on its stdin and reads events from its report pipe on a
+    reader thread.
+
+    on_room_closed(handle, returncode) is called from the reader thread
+    for every room that ends (0 when the game ended it, -1 when the
+    runner itself died). on_idle(runner) is called `idle_timeout` seconds
+    after the last room closed.
+
+    A runner taken over from a previous lobby process (see
+    server/handoff.py) is built with its control pipe as `stdin`, the
+    rooms it already hosts as `rooms` ({room_id: match_key}) and whatever
+    was left of a partly read event line as `pending`. Events are read
+    once start() is called.
+    """
+    def __init__(self, key, process, report_fd, on_room_closed, on_idle=None, idle_timeout=30.0,
+                 stdin=None, rooms=None, pending=b''):
+        self.key = key
+        self.process = process
+        self.stdin = stdin if stdin is not None else process.stdin
+        self.report_fd = report_fd
+        self.on_room_closed = on_room_closed
+        self.on_idle = on_idle
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # Writes to stdin can block on a busy runner; never hold _lock for them
+        self._send_lock = threading.Lock()
+        self._rooms = {}   # room_id -> RunnerRoom
+        self._opening = {} # room_id -> [threading.Event, event dict]
+        self._pending = 0  # reserved by open_room callers that have not sent "open" yet
+        self._buf = pending # unparsed tail of the report pipe
+        self.ready = threading.Event()
+        self.closed = False   # stdin closed or process gone: no new rooms
+        self.draining = False # game files changed: retire once empty
+        for room_id, match_key in (rooms or {}).items():
+            handle = self._rooms[room_id] = RunnerRoom(self, room_id)
+            handle.match_key = match_key
+        if rooms is not None:
+            self.ready.set()
+        self._stop_r, self._stop_w = os.pipe() # detach() wakes the reader through it
+        self._reader = threading.Thread(target=self._read_events, name=f"runner-{key[0]}", daemon=True)
+
+    def start(self):
+        """Starts reading the runner's events."""
+        self._reader.start()
+
+    def room_ids(self):
+        with self._lock:
+            return sorted(self._rooms)
+
+    def room(self, room_id):
+        """The RunnerRoom of a hosted room, or None."""
+        with self._lock:
+            return self._rooms.get(room_id)
+
+    def reserve(self):
+        """Claims a slot for a new room. False if the runner no longer takes rooms."""
+        with self._lock:
+            if self.closed or self.draining:
+                return False
+            self._pending += 1
+            return True
+
+    def open_room(self, room_id, port, players, timeout):
+        """Opens a reserved room and waits until it listens. Returns (RunnerRoom, port)."""
+        done = threading.Event()
+        with self._lock:
+            self._pending -= 1
+            self._opening[room_id] = [done, None]
+        try:
+            self._send({"op": "open", "room_id": room_id, "port": port, "players": players})
+            if not done.wait(timeout):
+                raise RuntimeError("Game room did not start listening in time")
+            event = self._opening[room_id][1]
+            if event.get("event") != "opened":
+                raise RuntimeError(event.get("error") or "Game runner exited")
+            with self._lock:
+                handle = self._rooms[room_id]
+            return handle, event["port"]
+        except Exception:
+            self._send({"op": "close", "room_id": room_id}, quiet=True) # in case it opened late
+            raise
+        finally:
+            with self._lock:
+                self._opening.pop(room_id, None)
+            self._check_idle()
+
+    def close_room(self, room_id):
+        self._send({"op": "close", "room_id": room_id}, quiet=True)
+
+    def retire(self):
+        """Closes the control pipe; the runner closes its rooms and exits."""
+        with self._lock:
+            self.closed = True
+        with self._send_lock:
+            try:
+                self.stdin.close()
+            except OSError:
+                pass
+
+    def retire_if_idle(self):
+        with self._lock:
+            if self._rooms or self._opening or self._pending or self.closed:
+                return False
+        self.retire()
+        return True
+
+    def drain(self):
+        """Takes no new rooms and retires as soon as the current ones end."""
+        with self._lock:
+            self.draining = True
+        self.retire_if_idle()
+
+    def _send(self, msg, quiet=False):
+        try:
+            with self._send_lock:
+                self.stdin.write((json.dumps(msg) + "\n").encode())
+                self.stdin.flush()
+        except (OSError, ValueError):
+            if not quiet:
+                raise RuntimeError("Game runner is not running")
+
+    def _check_idle(self):
+        with self._lock:
+            idle = not (self._rooms or self._opening or self._pending or self.closed)
+            draining = self.draining
+        if not idle:
+            return
+        if draining:
+            self.retire()
+        elif self.on_idle is not None:
+            timer = threading.Timer(self.idle_timeout, self.on_idle, args=(self,))
+            timer.daemon = True
+            timer.start()
+
+    def detach(self):
+        """
+        Stops reading events and hands the runner over, still hosting its
+        rooms (lobby restart). Returns (stdin_fd, report_fd, pending bytes),
+        fds now owned by the caller, or None if the runner already exited.
+        """
+        with self._lock:
+            if self._stop_w is not None:
+                os.write(self._stop_w, b'x')
+        self._reader.join()
+        with self._lock:
+            if self.closed and not self._rooms:
+                return None
+            self.closed = True # nothing new may be sent from this side
+        with self._send_lock:
+            stdin_fd = os.dup(self.stdin.fileno())
+            self.stdin.close()
+        return stdin_fd, self.report_fd, self._buf
+
+    def _read_events(self):
+        try:
+            self._read_loop()
+        finally:
+            with self._lock:
+                os.close(self._stop_r)
+                os.close(self._stop_w)
+                self._stop_w = None
+
+    def _read_loop(self):
+        poller = select.poll()
+        poller.register(self.report_fd, select.POLLIN)
+        poller.register(self._stop_r, select.POLLIN)
+        while True:
+            if any(fd == self._stop_r for fd, _ in poller.poll()):
+                return # detached: the events are left for the next lobby
+            try:
+                chunk = os.read(self.report_fd, 65536)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                break
+            self._buf += chunk
+            while b'\n' in self._buf:
+                line, self._buf = self._buf.split(b'\n', 1)
+                try:
+                    self._handle_event(json.loads(line))
+                except ValueError:
+                    continue
+        self._runner_exited()
+
+    def _handle_event(self, event):
+        kind = event.get("event")
+        if kind == "ready":
+            self.ready.set()
+            return
+        room_id = str(event.get("room_id"))
+        if kind in ("opened", "open_failed"):
+            with self._lock:
+                waiter = self._opening.get(room_id)
+                if waiter is None:
+                    return
+                if kind == "opened":
+                    self._rooms[room_id] = RunnerRoom(self, room_id)
+                waiter[1] = event
+            waiter[0].set()
+        elif kind == "closed":
+            with self._lock:
+                handle = self._rooms.pop(room_id, None)
+            if handle is not None:
+                returncode = 0 if event.get("reason") != "error" else 1
+                handle._mark_closed(returncode)
+                self.on_room_closed(handle, handle.returncode)
+            self._check_idle()
+
+    def _runner_exited(self):
+        """Report pipe hit EOF: the runner is gone, and so are all its rooms."""
+        with self._lock:
+            self.closed = True
+            handles = list(self._rooms.values())
+            self._rooms.clear()
+            waiters = list(self._opening.values())
+        for waiter in waiters:
+            waiter[1] = {"event": "open_failed", "error": "Game runner exited"}
+            waiter[0].set()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        os.close(self.report_fd)
+        self.ready.set() # wakes a spawn that is still waiting for "ready"
+        for handle in handles:
+            handle._mark_closed(-1)
+            self.on_room_closed(handle, handle.returncode)
+
+class RunnerManager:
+    """
+    Multi-room hosting: one RoomRunner per (game_id, version), shared by
+    all of that game's matches.
+
+    spawn(key, limits) starts a runner process and returns (Popen,
+    report_fd); on_room_closed is passed on to every RoomRunner.
+
+    A new match reuses the key's runner or spawns one. Spawns are
+    serialized per key, so concurrent starts share one runner. Runners
+    left without rooms for `idle_timeout` seconds exit; invalidate(game_id)
+    lets a game's runners finish their rooms and exit.
+    """
+    def __init__(self, spawn, on_room_closed, idle_timeout=30.0):
+        self.spawn = spawn
+        self.on_room_closed = on_room_closed
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._runners = {}     # (game_id, version) -> RoomRunner
+        self._spawn_locks = {} # (game_id, version) -> threading.Lock
+
+    def open_room(self, key, room_id, port, players, limits, timeout):
+        """Hosts a match on the key's runner. Returns (RunnerRoom, port)."""
+        with self._lock:
+            spawn_lock = self._spawn_locks.setdefault(key, threading.Lock())
+        with spawn_lock:
+            with self._lock:
+                runner = self._runners.get(key)
+            if runner is None or not runner.reserve():
+                process, report_fd = self.spawn(key, limits)
+                runner = RoomRunner(key, process, report_fd, self.on_room_closed,
+                                    self.on_idle, self.idle_timeout)
+                runner.start()
+                if not runner.ready.wait(timeout) or runner.closed:
+                    runner.retire()
+                    raise RuntimeError("Game runner did not start in time")
+                runner.reserve()
+                with self._lock:
+                    self._runners[key] = runner
+        return runner.open_room(room_id, port, players, timeout)
+
+    def adopt(self, key, process, report_fd, stdin, rooms, pending=b'', draining=False):
+        """
+        Takes over a runner started by a previous lobby process (see
+        server/handoff.py). The caller wires up the rooms, then calls start().
+        """
+        runner = RoomRunner(key, process, report_fd, self.on_room_closed, self.on_idle,
+                            self.idle_timeout, stdin=stdin, rooms=rooms, pending=pending)
+        if draining:
+            runner.draining = True # retires once its rooms end, like after invalidate()
+        else:
+            with self._lock:
+                self._runners[key] = runner
+        return runner
+
+    def on_idle(self, runner):
+        with self._lock:
+            if self._runners.get(runner.key) is not runner:
+                return
+            if not runner.retire_if_idle():
+                return
+            del self._runners[runner.key]
+
+    def invalidate(self, game_id):
+        with self._lock:
+            stale = [k for k in self._runners if k[0] == game_id]
+            runners = [self._runners.pop(k) for k in stale]
+        for runner in runners:
+            runner.drain()
+
+    def runners(self):
+        with self._lock:
+            return list(self._runners.values())
+
+    def report(self):
+        """[{game_id, version, pid, rooms, cpu_seconds, rss_bytes}] for live runners."""
+        report = []
+        for runner in self.runners():
+            usage = read_proc_usage(runner.process.pid) or (0.0, 0)
+            report.append({
+                "game_id": runner.key[0],
+                "version": runner.key[1],
+                "pid": runner.process.pid,
+                "rooms": runner.room_ids(),
+                "cpu_seconds": usage[0],
+                "rss_bytes": usage[1]
+            })
+        return report
+
+    def shutdown(self):
+        """Retires runners that host no rooms; busy ones keep running like any game server."""
+        for runner in self.runners():
+            if runner.retire_if_idle():
+                with self._lock:
+                    if self._runners.get(runner.key) is runner:
+                        del self._runners[runner.key]
@@ -0,0 +1,161 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Score contributed by a term appearing in each field
+FIELD_WEIGHTS = {"name": 3.0, "type": 2.0, "description": 1.0}
+REVIEW_WEIGHT = 0.5
+# Prefix matches score less than whole-word matches
+PREFIX_FACTOR = 0.5
+# A short prefix can match a large part of the vocabulary; only the first
+# MAX_PREFIX_TERMS terms (alphabetically) are expanded to bound query cost.
+MAX_PREFIX_TERMS = 64
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_RE.findall(str(text).lower())
+
+class SearchIndex:
+    """
+    In-process inverted index over the game catalog.
+
+    Two posting maps are kept, term -> {game_id: score}: one for catalog
+    fields (name, type, description) and one for review comments, so
+    queries can opt in to review text. A sorted vocabulary gives prefix
+    matching with bisect. Updates are incremental and per game.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}         # term -> {game_id: score}
+        self._review_postings = {}  # term -> {game_id: score}
+        self._doc_terms = {}        # game_id -> ({term: score}, {term: score})
+        self._names = {}            # game_id -> lowercase name (tie-break)
+        self._vocab = []            # sorted terms present in either map
+
+    @staticmethod
+    def _score_fields(game):
+        terms = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in set(tokenize(game.get(field))):
+                terms[term] = terms.get(term, 0.0) + weight
+        review_terms = {}
+        for review in game.get("reviews") or []:
+            for term in set(tokenize(review.get("comment"))):
+                review_terms[term] = review_terms.get(term, 0.0) + REVIEW_WEIGHT
+        return terms, review_terms
+
+    def _other(self, postings):
+        return self._review_postings if postings is self._postings else self._postings
+
+    def _add_terms(self, postings, game_id, terms):
+        other = self._other(postings)
+        for term, score in terms.items():
+            docs = postings.get(term)
+            if docs is None:
+                docs = postings[term] = {}
+                if term not in other:
+                    insort(self._vocab, term)
+            docs[game_id] = score
+
+    def _remove_terms(self, postings, game_id, terms):
+        other = self._other(postings)
+        for term in terms:
+            docs = postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(game_id, None)
+            if not docs:
+                del postings[term]
+                if term not in other:
+                    idx = bisect_left(self._vocab, term)
+                    if idx < len(self._vocab) and self._vocab[idx] == term:
+                        del self._vocab[idx]
+
+    def update_game(self, game_id, game):
+        """(Re)indexes one game. Only the terms that changed are touched."""
+        terms, review_terms = self._score_fields(game)
+        with self._lock:
+            old_terms, old_review_terms = self._doc_terms.get(game_id, ({}, {}))
+            self._remove_terms(self._postings, game_id,
+                               [t for t in old_terms if t not in terms])
+            self._remove_terms(self._review_postings, game_id,
+                               [t for t in old_review_terms if t not in review_terms])
+            self._add_terms(self._postings, game_id,
+                            {t: s for t, s in terms.items() if old_terms.get(t) != s})
+            self._add_terms(self._review_postings, game_id,
+                            {t: s for t, s in review_terms.items() if old_review_terms.get(t) != s})
+            self._doc_terms[game_id] = (terms, review_terms)
+            self._names[game_id] = str(game.get("name", "")).lower()
+
+    def remove_game(self, game_id):
+        with self._lock:
+            old = self._doc_terms.pop(game_id, None)
+            self._names.pop(game_id, None)
+            if old:
+                self._remove_terms(self._postings, game_id, old[0])
+                self._remove_terms(self._review_postings, game_id, old[1])
+
+    def _expand(self, term):
+        """Vocabulary terms starting with `term` (the exact term first)."""
+        vocab = self._vocab
+        idx = bisect_left(vocab, term)
+        expanded = []
+        while idx < len(vocab) and len(expanded) < MAX_PREFIX_TERMS and vocab[idx].startswith(term):
+            expanded.append(vocab[idx])
+            idx += 1
+        return expanded
+
+    def _term_postings(self, term, include_reviews):
+        """[(docs, factor), ...] for every vocabulary term matching `term`."""
+        maps = (self._postings, self._review_postings) if include_reviews else (self._postings,)
+        matched = []
+        for candidate in self._expand(term):
+            factor = 1.0 if candidate == term else PREFIX_FACTOR
+            for postings in maps:
+                docs = postings.get(candidate)
+                if docs:
+                    matched.append((docs, factor))
+        return matched
+
+    def search(self, query, offset=0, limit=20, include_reviews=False):
+        """
+        Every query term must match a term or a term prefix (AND).
+        Returns (total_matches, [game_id, ...]) for the requested page,
+        ranked by score, then name.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+        with self._lock:
+            per_term = [self._term_postings(t, include_reviews) for t in terms]
+            # Start from the most selective term; the others are only probed
+            # for games still in the running, so broad terms stay cheap.
+            per_term.sort(key=lambda matched: sum(len(docs) for docs, _ in matched))
+            scores = {}
+            for docs, factor in per_term[0]:
+                for game_id, score in docs.items():
+                    scores[game_id] = scores.get(game_id, 0.0) + score * factor
+            for matched in per_term[1:]:
+                narrowed = {}
+                for game_id, score in scores.items():
+                    extra = 0.0
+                    for docs, factor in matched:
+                        hit = docs.get(game_id)
+                        if hit is not None:
+                            extra += hit * factor
+                    if extra:
+                        narrowed[game_id] = score + extra
+                scores = narrowed
+                if not scores:
+                    break
+            names = self._names
+            top = heapq.nsmallest(offset + limit, scores.items(),
+                                  key=lambda item: (-item[1], names.get(item[0], ""), item[0]))
+        return len(scores), [gid for gid, _ in top[offset:]]
+
+    def __len__(self):
+        return len(self._doc_terms)
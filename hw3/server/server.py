@@ -1,19 +1,76 @@
 import socket
+import select
 import selectors
+import signal
 import sys
+import threading
 import traceback
 
 # Adjust path to handle module imports from root
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from server.agent_registry import AgentRegistry
 from server.db_manager import DBManager
 from server.game_manager import GameManager
+from server.handoff import add_fd, confirm_handoff, recv_handoff, start_successor
 from server.request_handler import RequestHandler
+from server.session_manager import SessionRegistry
 import shared.utils as utils
 
 HOST = '0.0.0.0'
-PORT = 8888
+PORT = int(os.environ.get("GAME_STORE_PORT", 8888))
+
+# SIGUSR2 restarts the lobby without dropping anyone: requests in progress
+# get RESTART_DRAIN_TIMEOUT s to finish, then a new server process takes over
+# the listening socket, every connection and every running match. If it
+# does not report ready within RESTART_READY_TIMEOUT s this process resumes.
+RESTART_DRAIN_TIMEOUT = 10.0
+RESTART_READY_TIMEOUT = 30.0
+# Holds the pid of the process currently serving (the target for SIGUSR2)
+PID_FILE = os.path.join("server_data", "lobby.pid")
+
+# Password KDF cost (PBKDF2 iterations) and size of the hashing process pool
+KDF_ITERATIONS = 200000
+HASH_WORKERS = os.cpu_count() or 1
+
+# Game server ports: ranges to allocate from, and seconds a freed port rests
+# before reuse. GAME_BIND_ZERO lets game servers bind port 0 and report back.
+GAME_PORT_RANGES = [(9000, 9100)]
+GAME_PORT_QUARANTINE = 30.0
+GAME_BIND_ZERO = False
+
+# Most pre-spawned idle game servers kept per game version (0 disables the
+# warm pool); sizes follow match starts over the last GAME_WARM_POOL_WINDOW s.
+GAME_WARM_POOL_MAX = 2
+GAME_WARM_POOL_WINDOW = 300.0
+
+# Game host agents (server/host_agent.py) share this secret with the lobby.
+# Unset: only agents on this machine may register. Matches run locally
+# while no agent is registered.
+GAME_AGENT_KEY = os.environ.get("GAME_AGENT_KEY")
+
+# Admin commands (ADMIN_RESOURCES, ADMIN_GAME_OUTPUT) need this key as their token; unset means
+# they are only accepted from this machine.
+ADMIN_KEY = os.environ.get("GAME_STORE_ADMIN_KEY")
+
+# Limits for every game server (see server/game_bootstrap.py). Each game's
+# config may only tighten them. Usage is sampled every
+# GAME_RESOURCE_SAMPLE_INTERVAL seconds.
+GAME_LIMITS = {"memory_mb": 1024, "cpu_seconds": None, "open_files": 256, "nice": 5}
+GAME_RESOURCE_SAMPLE_INTERVAL = 5.0
+
+# Pin each game server to its own core(s), keeping the first
+# LOBBY_RESERVED_CORES cores for the lobby (Linux only).
+GAME_CPU_AFFINITY = True
+LOBBY_RESERVED_CORES = 1
+
+# Game server stdout/stderr is kept per room in a ring buffer of this size
+# (ADMIN_GAME_OUTPUT). Set GAME_OUTPUT_SPILL_DIR to also keep it on disk,
+# one file per room rotated at GAME_OUTPUT_SPILL_BYTES.
+GAME_OUTPUT_BUFFER_BYTES = 64 * 1024
+GAME_OUTPUT_SPILL_DIR = None # e.g. os.path.join("server_data", "game_logs")
+GAME_OUTPUT_SPILL_BYTES = 1024 * 1024
 
 sel = selectors.DefaultSelector()
 
@@ -48,8 +105,14 @@ import socketserver
 class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
     def handle(self):
         print(f"Client {self.client_address} connected.")
+        parked = False
         try:
             while True:
+                if not self.server.wait_for_request(self.request):
+                    # Lobby restart: the next process picks the connection up here
+                    self.server.park(self.request)
+                    parked = True
+                    break
                 # recv_json blocks until full message or disconnect
                 request = utils.recv_json(self.request)
                 if not request:
@@ -61,11 +124,21 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
                 # Check for raw data response (File Download)
                 raw_data = response.pop("_raw_data", None)
                 
-                utils.send_json(self.request, response)
-                
-                if raw_data:
-                    # Send raw bytes
-                    self.request.sendall(raw_data)
+                # Pushes to a logged-in user (GAME_START) come from other
+                # threads; share the session's send lock so frames never interleave
+                session = self.server.app_handler.sessions.get_by_sock(self.request)
+                send_lock = session.send_lock if session else threading.Lock()
+                with send_lock:
+                    # Pre-encoded response (cached store reads)
+                    frame = response.pop("_frame", None)
+                    if frame is not None:
+                        self.request.sendall(frame)
+                    else:
+                        utils.send_json(self.request, response)
+                    
+                    if raw_data:
+                        # Send raw bytes
+                        self.request.sendall(raw_data)
                     
         except ConnectionResetError:
             pass
@@ -73,28 +146,187 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
             print(f"Error handling client {self.client_address}: {e}")
             traceback.print_exc()
         finally:
-            print(f"Client {self.client_address} disconnected.")
-            self.server.app_handler.handle_disconnect(self.request)
+            if parked:
+                print(f"Client {self.client_address} handed over.")
+            else:
+                print(f"Client {self.client_address} disconnected.")
+                self.server.app_handler.handle_disconnect(self.request)
 
 class GameStoreServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    Thread per connection. For a lobby restart, drain() makes each handler
+    thread stop at its next request boundary and park its connection:
+    left open, without disconnect cleanup, ready to be handed over.
+    """
     allow_reuse_address = True
-    pass
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.draining = False
+        self.handed_over = False
+        self._drain_r, self._drain_w = socket.socketpair()
+        self._clients = threading.Condition()
+        self._serving = set() # connections whose handler thread runs
+        self._parked = []
+
+    def process_request(self, request, client_address):
+        with self._clients:
+            self._serving.add(request)
+        super().process_request(request, client_address)
+
+    def wait_for_request(self, sock):
+        """Blocks until `sock` is readable. False once draining: park instead."""
+        if not hasattr(select, "poll"):
+            return True # Windows: no restarts
+        poller = select.poll()
+        poller.register(sock, select.POLLIN)
+        poller.register(self._drain_r, select.POLLIN)
+        poller.poll()
+        return not self.draining
+
+    def park(self, sock):
+        with self._clients:
+            self._serving.discard(sock)
+            self._parked.append(sock)
+            self._clients.notify_all()
+
+    def shutdown_request(self, request):
+        with self._clients:
+            if request in self._serving:
+                self._serving.discard(request)
+                self._clients.notify_all()
+            elif request in self._parked:
+                return # stays open for the next lobby process
+        super().shutdown_request(request)
+
+    def drain(self, timeout):
+        """
+        Parks every connection at its next request boundary. Returns the
+        parked sockets once no handler thread runs, or after `timeout` s
+        (connections still busy then are not handed over).
+        """
+        with self._clients:
+            self.draining = True
+            self._drain_w.send(b'x')
+            self._clients.wait_for(lambda: not self._serving, timeout)
+            return list(self._parked)
+
+    def resume(self):
+        """Ends a drain; the parked connections are served again by adopt_client()."""
+        with self._clients:
+            self.draining = False
+            self._drain_r.recv(16)
+            parked, self._parked = self._parked, []
+        return parked
+
+    def adopt_client(self, sock):
+        """Serves a connection accepted before a restart."""
+        self.process_request(sock, sock.getpeername())
+
+def build_handler(db_mgr, token_secret=None):
+    game_mgr = GameManager(port_ranges=GAME_PORT_RANGES, port_quarantine=GAME_PORT_QUARANTINE,
+                           bind_zero=GAME_BIND_ZERO, warm_pool_max=GAME_WARM_POOL_MAX,
+                           warm_pool_window=GAME_WARM_POOL_WINDOW,
+                           agents=AgentRegistry(GAME_AGENT_KEY), limits=GAME_LIMITS,
+                           resource_interval=GAME_RESOURCE_SAMPLE_INTERVAL,
+                           cpu_affinity=GAME_CPU_AFFINITY, lobby_cores=LOBBY_RESERVED_CORES,
+                           output_buffer_bytes=GAME_OUTPUT_BUFFER_BYTES,
+                           output_spill_dir=GAME_OUTPUT_SPILL_DIR,
+                           output_spill_bytes=GAME_OUTPUT_SPILL_BYTES)
+    return RequestHandler(db_mgr, game_mgr, sessions=SessionRegistry(token_secret), admin_key=ADMIN_KEY)
+
+def adopt_lobby(server, db_mgr, state, fds, socks):
+    """Serves an exported lobby: its sessions, rooms and matches, and its parked connections."""
+    server.app_handler = build_handler(db_mgr, bytes.fromhex(state["token_secret"]))
+    server.app_handler.adopt_state(state, fds, socks)
+    for index in state["clients"]:
+        server.adopt_client(socks[index])
+
+def restart(server, db_mgr):
+    """
+    Hands the lobby to a new server process (SIGUSR2). The listening socket
+    stays open throughout, so new connections just queue until the new
+    process accepts them. Runs on its own thread; serve_forever returns.
+    """
+    print("Restart: draining connections...")
+    server.shutdown()
+    parked = server.drain(RESTART_DRAIN_TIMEOUT)
+    fds = []
+    socks = {add_fd(fds, sock.fileno()): sock for sock in parked}
+    sock_index = {sock: index for index, sock in socks.items()}
+    state = server.app_handler.export_state(fds, sock_index)
+    state["clients"] = list(socks)
+    state["listen"] = add_fd(fds, server.socket.fileno())
+    try:
+        # Started from the files on disk now, so a deploy takes effect
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+        successor = start_successor([sys.executable, "-m", "server.server"], state, fds,
+                                    RESTART_READY_TIMEOUT, env)
+    except Exception as e:
+        print(f"Restart failed, resuming: {e}")
+        server.resume()
+        adopt_lobby(server, db_mgr, state, fds, socks)
+        return
+    print(f"Restart: pid {successor.pid} took over {len(parked)} connection(s) "
+          f"and {len(state['games']['rooms'])} room(s)")
+    server.handed_over = True
+
+def take_over(channel_fd, db_mgr):
+    """Successor side of restart(): receives the lobby and serves it."""
+    channel = socket.socket(fileno=channel_fd)
+    state, fds = recv_handoff(channel)
+    listener = socket.socket(fileno=fds[state["listen"]])
+    server = GameStoreServer(listener.getsockname(), ThreadedTCPRequestHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+    socks = {index: socket.socket(fileno=fds[index]) for index in state["clients"]}
+    adopt_lobby(server, db_mgr, state, fds, socks)
+    confirm_handoff(channel)
+    return server
+
+def write_pid_file():
+    os.makedirs(os.path.dirname(PID_FILE), exist_ok=True)
+    with open(PID_FILE, "w") as f:
+        f.write(f"{os.getpid()}\n")
 
 def main():
     # Initialize Managers
-    db_mgr = DBManager()
-    game_mgr = GameManager()
-    req_handler = RequestHandler(db_mgr, game_mgr)
-    
-    server = GameStoreServer((HOST, PORT), ThreadedTCPRequestHandler)
-    server.app_handler = req_handler
-    
-    print(f"Server started on {HOST}:{PORT}")
+    db_mgr = DBManager(kdf_iterations=KDF_ITERATIONS, hash_workers=HASH_WORKERS)
+    if len(sys.argv) == 3 and sys.argv[1] == "--handoff":
+        server = take_over(int(sys.argv[2]), db_mgr)
+        print(f"Server took over on {server.server_address[0]}:{server.server_address[1]}")
+    else:
+        server = GameStoreServer((HOST, PORT), ThreadedTCPRequestHandler)
+        server.app_handler = build_handler(db_mgr)
+        print(f"Server started on {HOST}:{PORT}")
+    write_pid_file()
+
+    restarts = []
+    def request_restart(signum, frame):
+        if restarts and restarts[-1].is_alive():
+            return
+        restarts.append(threading.Thread(target=restart, args=(server, db_mgr), name="lobby-restart"))
+        restarts[-1].start()
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, request_restart)
+
     try:
-        server.serve_forever()
+        while True:
+            server.serve_forever()
+            # Only a restart stops serve_forever
+            restarts[-1].join()
+            if server.handed_over:
+                print("Restart: handed over, exiting")
+                db_mgr.verifier.shutdown()
+                sys.stdout.flush()
+                os._exit(0) # running matches belong to the new process now
     except KeyboardInterrupt:
         print("Server shutting down...")
         server.shutdown()
+        server.app_handler.matchmaker.stop()
+        db_mgr.verifier.shutdown()
+        server.app_handler.gm.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+import shared.utils as utils
+
+DEFAULT_SESSION_TTL = 12 * 60 * 60 # seconds
+
+class TokenSigner:
+    """
+    Stateless session tokens: base64url("<role>:<expires>:<username>") + "." + HMAC.
+    A token can be verified with the secret alone, no session lookup.
+    """
+    def __init__(self, secret=None):
+        self.secret = secret or os.urandom(32)
+
+    def _sign(self, body):
+        return hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+
+    def issue(self, username, role, expires_at):
+        body = f"{role}:{int(expires_at)}:{username}".encode('utf-8')
+        return base64.urlsafe_b64encode(body).decode('ascii') + "." + self._sign(body)
+
+    def verify(self, token, now=None):
+        """Returns (username, role) or None if forged, malformed or expired."""
+        if not isinstance(token, str) or "." not in token:
+            return None
+        encoded, signature = token.rsplit(".", 1)
+        try:
+            body = base64.urlsafe_b64decode(encoded.encode('ascii'))
+        except (ValueError, UnicodeEncodeError):
+            return None
+        if not hmac.compare_digest(self._sign(body), signature):
+            return None
+        try:
+            role, expires_at, username = body.decode('utf-8').split(":", 2)
+            expires_at = int(expires_at)
+        except (UnicodeDecodeError, ValueError):
+            return None
+        if expires_at <= (now if now is not None else time.time()):
+            return None
+        return username, role
+
+class Session:
+    """One logged-in connection and the state that belongs to it."""
+    def __init__(self, username, role, sock, token, expires_at):
+        self.username = username
+        self.role = role
+        self.sock = sock
+        self.token = token
+        self.created_at = time.time()
+        self.expires_at = expires_at
+        self.state = {} # per-connection state, e.g. current room
+        # Pushes to this client (GAME_START etc.) come from other handler threads
+        self.send_lock = threading.Lock()
+
+    def is_expired(self, now=None):
+        return self.expires_at <= (now if now is not None else time.time())
+
+    def send(self, data):
+        with self.send_lock:
+            utils.send_json(self.sock, data)
+
+class SessionRegistry:
+    """
+    Sessions indexed both by socket and by username, so login, auth and
+    disconnect cleanup are all O(1). Expired sessions are ignored by the
+    lookups and replaced on the next login; they are dropped for good
+    when their connection closes.
+    """
+    def __init__(self, secret=None, ttl=DEFAULT_SESSION_TTL):
+        self.signer = TokenSigner(secret)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_sock = {}
+        self._by_user = {}
+
+    def create(self, username, role, sock):
+        """
+        Registers a login. Returns the new Session, or None if the user is
+        already logged in on another connection with a live session.
+        """
+        now = time.time()
+        with self._lock:
+            existing = self._by_user.get(username)
+            if existing is not None:
+                if not existing.is_expired(now) and existing.sock is not sock:
+                    return None
+                self._discard(existing)
+            previous = self._by_sock.get(sock)
+            if previous is not None:
+                self._discard(previous) # re-login on the same connection
+            expires_at = now + self.ttl
+            session = Session(username, role, sock,
+                              self.signer.issue(username, role, expires_at), expires_at)
+            self._by_sock[sock] = session
+            self._by_user[username] = session
+            return session
+
+    def _discard(self, session):
+        """Caller holds self._lock."""
+        if self._by_sock.get(session.sock) is session:
+            del self._by_sock[session.sock]
+        if self._by_user.get(session.username) is session:
+            del self._by_user[session.username]
+
+    def verify_token(self, token):
+        """(username, role) for a valid token. Signature check only, no lookup."""
+        return self.signer.verify(token)
+
+    def get_by_sock(self, sock):
+        return self._by_sock.get(sock)
+
+    def get_by_user(self, username):
+        session = self._by_user.get(username)
+        if session is not None and session.is_expired():
+            return None
+        return session
+
+    def remove_by_sock(self, sock):
+        with self._lock:
+            session = self._by_sock.pop(sock, None)
+            if session is not None and self._by_user.get(session.username) is session:
+                del self._by_user[session.username]
+            return session
+
+    def export_state(self, sock_index):
+        """Sessions of the handed-over connections, for a lobby restart (see server/handoff.py)."""
+        with self._lock:
+            sessions = list(self._by_sock.values())
+        return [{
+            "username": s.username, "role": s.role, "token": s.token,
+            "created_at": s.created_at, "expires_at": s.expires_at, "state": s.state,
+            "sock": sock_index[s.sock]
+        } for s in sessions if s.sock in sock_index]
+
+    def adopt_state(self, sessions, socks):
+        """Restores exported sessions on the adopted sockets. Tokens stay valid when the secret is kept."""
+        with self._lock:
+            for entry in sessions:
+                sock = socks.get(entry["sock"])
+                if sock is None:
+                    continue
+                session = Session(entry["username"], entry["role"], sock, entry["token"], entry["expires_at"])
+                session.created_at = entry["created_at"]
+                session.state = entry["state"]
+                self._by_sock[sock] = session
+                self._by_user[session.username] = session
+
+    def online_users(self):
+        now = time.time()
+        return [name for name, s in list(self._by_user.items()) if not s.is_expired(now)]
+
+    def __contains__(self, username):
+        return self.get_by_user(username) is not None
+
+    def __len__(self):
+        return len(self._by_user)
@@ -0,0 +1,182 @@
+import math
+import threading
+import time
+from collections import deque
+
+class PooledWorker:
+    """An idle, pre-spawned game server waiting on stdin for its assignment."""
+    def __init__(self, process, report_fd, output_fd=None):
+        self.process = process
+        self.report_fd = report_fd # read end of the bootstrap's port pipe
+        self.output_fd = output_fd # read end of its stdout/stderr, if captured
+        self.spawned_at = time.time()
+
+    def alive(self):
+        return self.process.poll() is None
+
+class WarmPool:
+    """
+    Pre-spawned game server workers, kept per (game_id, version).
+
+    spawn(key) starts one worker and returns a PooledWorker; close(worker)
+    disposes of one that will never be used. Both run on the pool's refill
+    thread (or the caller of invalidate/shutdown), never under the pool lock.
+
+    Pool size follows demand: a key's target is the number of matches it
+    started during the last `window` seconds, times `headroom`, clamped to
+    [min_size, max_size]. Keys nobody started within the window shrink to
+    min_size, and keys never started get no workers at all.
+    """
+    def __init__(self, spawn, close, max_size=2, min_size=0, window=300.0,
+                 headroom=0.5, refill_interval=1.0):
+        self.spawn = spawn
+        self.close = close
+        self.max_size = max_size
+        self.min_size = min(min_size, max_size)
+        self.window = window
+        self.headroom = headroom
+        self.refill_interval = refill_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._idle = {}        # key -> deque of PooledWorker (oldest first)
+        self._starts = {}      # key -> deque of start timestamps within the window
+        self._generation = {}  # game_id -> int, bumped by invalidate()
+        self._stopping = False
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+
+    def take(self, key):
+        """Returns a live idle worker for `key`, or None."""
+        dead = []
+        with self._lock:
+            self._ensure_thread()
+            workers = self._idle.get(key)
+            worker = None
+            while workers:
+                candidate = workers.popleft()
+                if candidate.alive():
+                    worker = candidate
+                    break
+                dead.append(candidate)
+            if worker is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        for w in dead:
+            self._discard(w)
+        return worker
+
+    def record_start(self, key):
+        """Counts one match start for `key` and lets the refill thread react."""
+        now = time.monotonic()
+        with self._lock:
+            self._ensure_thread()
+            starts = self._starts.setdefault(key, deque())
+            starts.append(now)
+            self._expire(starts, now)
+            self._wakeup.notify()
+
+    def target_size(self, key, now=None):
+        with self._lock:
+            return self._target(key, now if now is not None else time.monotonic())
+
+    def idle_count(self, key=None):
+        with self._lock:
+            if key is not None:
+                return len(self._idle.get(key, ()))
+            return sum(len(w) for w in self._idle.values())
+
+    def invalidate(self, game_id):
+        """Discards every worker of `game_id` (new version uploaded, or deleted)."""
+        with self._lock:
+            self._generation[game_id] = self._generation.get(game_id, 0) + 1
+            stale = []
+            for key in [k for k in self._idle if k[0] == game_id]:
+                stale.extend(self._idle.pop(key))
+            for key in [k for k in self._starts if k[0] == game_id]:
+                del self._starts[key]
+        for worker in stale:
+            self._discard(worker)
+
+    def shutdown(self):
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+            thread = self._thread
+            stale = [w for workers in self._idle.values() for w in workers]
+            self._idle.clear()
+        if thread is not None:
+            thread.join(timeout=10)
+        for worker in stale:
+            self._discard(worker)
+
+    def _ensure_thread(self):
+        """Caller holds self._lock."""
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name="warm-pool", daemon=True)
+            self._thread.start()
+
+    def _expire(self, starts, now):
+        while starts and now - starts[0] > self.window:
+            starts.popleft()
+
+    def _target(self, key, now):
+        """Caller holds self._lock."""
+        starts = self._starts.get(key)
+        if starts is None:
+            return 0
+        self._expire(starts, now)
+        wanted = math.ceil(len(starts) * self.headroom)
+        return max(self.min_size, min(self.max_size, wanted))
+
+    def _discard(self, worker):
+        try:
+            self.close(worker)
+        except Exception as e:
+            print(f"Warm pool: failed to close worker {worker.process.pid}: {e}")
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                now = time.monotonic()
+                surplus, deficits = [], []
+                for key in set(self._starts) | set(self._idle):
+                    workers = self._idle.get(key, deque())
+                    dead = [w for w in workers if not w.alive()]
+                    for w in dead:
+                        workers.remove(w)
+                    surplus.extend(dead)
+                    target = self._target(key, now)
+                    while len(workers) > target:
+                        surplus.append(workers.popleft()) # oldest first
+                    if len(workers) < target:
+                        deficits.append((key, target - len(workers),
+                                         self._generation.get(key[0], 0)))
+                    if not workers:
+                        self._idle.pop(key, None)
+                    if key in self._starts and not self._starts[key] and target == 0:
+                        del self._starts[key]
+            for worker in surplus:
+                self._discard(worker)
+            # Spawning is slow; do it unlocked and drop results made stale by invalidate()
+            for key, count, generation in deficits:
+                for _ in range(count):
+                    try:
+                        worker = self.spawn(key)
+                    except Exception as e:
+                        print(f"Warm pool: could not spawn worker for {key}: {e}")
+                        break
+                    with self._lock:
+                        keep = not self._stopping and self._generation.get(key[0], 0) == generation
+                        if keep:
+                            self._idle.setdefault(key, deque()).append(worker)
+                    if not keep:
+                        self._discard(worker)
+                        break
+            with self._lock:
+                if self._stopping:
+                    return
+                self._wakeup.wait(self.refill_interval)
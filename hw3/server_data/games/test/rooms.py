@@ -0,0 +1,17 @@
+# Multi-room version of server.py: one chat room per match, all hosted in
+# one process by the lobby (config.json "hosting": "multi_room").
+
+class GameRoom:
+    # A client that stops reading loses its oldest unread lines (see room_runner.py)
+    slow_consumer = "drop_oldest"
+
+    def __init__(self, room):
+        self.room = room
+
+    def on_connect(self, client):
+        print(f"Game: New connection from {client.addr}")
+        client.send(b"Welcome to the Global Chat Room!\n")
+
+    def on_data(self, client, data):
+        # Broadcast to everyone in this room, sender included
+        self.room.broadcast(f"User{client.addr[1]}: ".encode() + data)
@@ -0,0 +1,17 @@
+"""
+Event-loop base for game servers (see server.GameServer): one thread
+serves every player of a match, with framed messages, a connection
+registry, broadcast helpers, bounded per-client outbound queues,
+lifecycle hooks and an optional UDP transport with a reliability
+layer; snapshot.py delta-encodes game state for syncing it to clients,
+entities.py keeps entities in NumPy arrays (import it explicitly: it
+needs numpy, which the package itself never loads) and
+interest.py filters broadcasts down to the clients that can see them.
+The game templates are built on it.
+"""
+from shared.game_sdk.framing import FramingError, JsonFraming, LengthPrefixFraming, LineFraming
+from shared.game_sdk.interest import InterestGrid
+from shared.game_sdk.outbound import COALESCE, DISCONNECT, DROP_OLDEST, OutboundQueue
+from shared.game_sdk.server import Connection, GameServer, UdpPeer
+from shared.game_sdk.snapshot import ClientBaseline, Schema, SnapshotDecoder, SnapshotHistory
+from shared.game_sdk.udp import RELIABLE, SEQUENCED, UdpClient, UdpEndpoint
@@ -0,0 +1,190 @@
+# Not re-exported by the package: games import shared.game_sdk.entities
+# themselves, so servers, pool workers and room runners never load numpy.
+try:
+    import numpy as np
+except ImportError:
+    np = None # optional: only EntityStore and its systems need it
+
+ID_MASK = 0xFFFFFFFF # handle = generation << 32 | entity id
+
+class EntityStore:
+    """
+    Entities as a structure of arrays: one contiguous NumPy array per
+    component, EntityStore(x="f4", y="f4", vx="f4", vy="f4", timer="f4"),
+    so a system updates every entity with a few array operations instead
+    of a Python loop over objects. Needs numpy.
+
+    Live entities are always rows 0..len(store)-1, packed: store["x"] is
+    a view of their x values, store.handles their handles. despawn()
+    moves the last row into the hole, so rows are not stable across
+    despawns; handles are. A handle is the entity id and a generation:
+    ids are reused from a free list, and the generation is bumped on
+    every despawn, so an old handle to a reused id is simply not alive.
+    """
+    def __init__(self, capacity=1024, **components):
+        if np is None:
+            raise ImportError("EntityStore needs numpy (pip install numpy)")
+        if not components:
+            raise ValueError("An entity store needs at least one component")
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in components.items()}
+        self.capacity = max(1, capacity)
+        self.arrays = {name: np.zeros(self.capacity, dtype) for name, dtype in self.dtypes.items()}
+        self._handles = np.zeros(self.capacity, np.int64) # row -> handle
+        self.rows = np.full(self.capacity, -1, np.int64)   # id -> row, -1 when free
+        self.generations = np.zeros(self.capacity, np.int64)
+        self.free = [] # despawned ids, reused last in first out
+        self.next_id = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        """The live rows of one component (a view: writes go to the store)."""
+        return self.arrays[name][:self.count]
+
+    @property
+    def handles(self):
+        return self._handles[:self.count]
+
+    def spawn(self, **values):
+        """Adds an entity; components not given start at zero. Returns its handle."""
+        if self.free:
+            entity_id = self.free.pop()
+        else:
+            entity_id = self.next_id
+            self.next_id += 1
+            if entity_id >= len(self.rows):
+                self.rows = self._grow(self.rows, -1)
+                self.generations = self._grow(self.generations, 0)
+        row = self.count
+        if row == self.capacity:
+            self.capacity *= 2
+            self.arrays = {name: self._grow(array, 0) for name, array in self.arrays.items()}
+            self._handles = self._grow(self._handles, 0)
+        for name, array in self.arrays.items():
+            array[row] = values.pop(name, 0)
+        if values:
+            raise KeyError(f"Unknown components: {', '.join(values)}")
+        handle = int(self.generations[entity_id]) << 32 | entity_id
+        self._handles[row] = handle
+        self.rows[entity_id] = row
+        self.count += 1
+        return handle
+
+    @staticmethod
+    def _grow(array, fill):
+        grown = np.full(len(array) * 2, fill, array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _row(self, handle):
+        handle = int(handle)
+        entity_id = handle & ID_MASK
+        if entity_id >= self.next_id or self.generations[entity_id] != handle >> 32:
+            return -1
+        return int(self.rows[entity_id])
+
+    def alive(self, handle):
+        return self._row(handle) >= 0
+
+    def row(self, handle):
+        """Current row of a live entity; KeyError if it was despawned."""
+        row = self._row(handle)
+        if row < 0:
+            raise KeyError(f"Entity {int(handle):#x} is not alive")
+        return row
+
+    def get(self, handle, name):
+        return self.arrays[name][self.row(handle)]
+
+    def set(self, handle, name, value):
+        self.arrays[name][self.row(handle)] = value
+
+    def despawn(self, handle):
+        row = self.row(handle)
+        entity_id = int(handle) & ID_MASK
+        last = self.count - 1
+        if row != last:
+            for array in self.arrays.values():
+                array[row] = array[last]
+            moved = int(self._handles[last])
+            self._handles[row] = moved
+            self.rows[moved & ID_MASK] = row
+        self.rows[entity_id] = -1
+        self.generations[entity_id] += 1
+        self.free.append(entity_id)
+        self.count = last
+
+    def despawn_many(self, handles):
+        for handle in handles:
+            if self.alive(handle):
+                self.despawn(handle)
+
+# Systems: each updates every live entity of a store at once.
+
+def move(store, dt, x="x", y="y", vx="vx", vy="vy"):
+    """Position += velocity * dt."""
+    xs, ys = store[x], store[y]
+    xs += store[vx] * dt
+    ys += store[vy] * dt
+
+def tick_timers(store, dt, timer="timer"):
+    """
+    Counts running timers (> 0) down by dt. Returns the handles of the
+    entities whose timer ran out this tick; timers at 0 stay stopped.
+    """
+    timers = store[timer]
+    running = timers > 0
+    timers[running] -= dt
+    expired = running & (timers <= 0)
+    timers[expired] = 0
+    return store.handles[expired]
+
+def collisions(store, cell=None, x="x", y="y", radius="radius"):
+    """
+    Pairs of overlapping circles, as two arrays of rows (a[k] < b[k]
+    is not guaranteed, a[k] != b[k] is).
+
+    Broadphase on a uniform grid: entities are sorted by cell, and
+    each one is tested only against the entities of its own cell and
+    of four neighbouring cells (the other four test it), found with
+    binary searches. `cell` must be at least the largest diameter;
+    by default it is.
+    """
+    n = len(store)
+    empty = np.zeros(0, np.int64)
+    if n < 2:
+        return empty, empty
+    xs, ys, rs = store[x], store[y], store[radius]
+    if cell is None:
+        cell = max(float(rs.max()) * 2, 1e-9)
+    cx = np.floor(xs / cell).astype(np.int64)
+    cy = np.floor(ys / cell).astype(np.int64)
+    keys = cx * (1 << 32) + cy # a neighbour's key is key + dx * 2**32 + dy
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    positions = np.arange(n)
+    firsts, seconds = [], []
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        target = sorted_keys + (dx * (1 << 32) + dy)
+        lo = np.searchsorted(sorted_keys, target, "left")
+        hi = np.searchsorted(sorted_keys, target, "right")
+        if dx == 0 and dy == 0:
+            lo = positions + 1 # later entities of the same cell only
+        counts = np.maximum(hi - lo, 0)
+        total = int(counts.sum())
+        if not total:
+            continue
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        firsts.append(np.repeat(order, counts))
+        seconds.append(order[starts + np.arange(total)])
+    if not firsts:
+        return empty, empty
+    a = np.concatenate(firsts)
+    b = np.concatenate(seconds)
+    dx = xs[a] - xs[b]
+    dy = ys[a] - ys[b]
+    reach = rs[a] + rs[b]
+    hit = dx * dx + dy * dy < reach * reach
+    return a[hit], b[hit]
@@ -0,0 +1,86 @@
+import json
+import struct
+
+class FramingError(ValueError):
+    """The peer sent something that is not a valid frame; its connection is dropped."""
+
+class LineFraming:
+    """
+    Newline-terminated messages, the format of the template clients.
+    Messages are bytes without the line ending (a trailing \\r is stripped
+    too). A line longer than `max_length` is an error.
+
+    Each connection gets its own instance, since decode() keeps whatever
+    partial line has arrived so far.
+    """
+    def __init__(self, max_length=64 * 1024):
+        self.max_length = max_length
+        self._buf = bytearray()
+
+    def encode(self, message):
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        return message + b"\n"
+
+    def decode(self, data):
+        """Feeds received bytes; returns the messages completed by them."""
+        self._buf += data
+        messages = []
+        start = 0
+        while True:
+            end = self._buf.find(b"\n", start)
+            if end < 0:
+                break
+            messages.append(bytes(self._buf[start:end]).rstrip(b"\r"))
+            start = end + 1
+        del self._buf[:start]
+        if len(self._buf) > self.max_length:
+            raise FramingError(f"Line longer than {self.max_length} bytes")
+        return messages
+
+class LengthPrefixFraming:
+    """
+    Messages prefixed with their length as a 4-byte big-endian integer, the
+    framing of the lobby protocol (shared/utils.py). Binary-safe.
+    """
+    HEADER = struct.Struct(">I")
+
+    def __init__(self, max_length=1024 * 1024):
+        self.max_length = max_length
+        self._buf = bytearray()
+
+    def encode(self, message):
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        return self.HEADER.pack(len(message)) + message
+
+    def decode(self, data):
+        self._buf += data
+        messages = []
+        pos = 0
+        header = self.HEADER.size
+        while len(self._buf) - pos >= header:
+            (length,) = self.HEADER.unpack_from(self._buf, pos)
+            if length > self.max_length:
+                raise FramingError(f"Frame of {length} bytes exceeds {self.max_length}")
+            if len(self._buf) - pos - header < length:
+                break
+            messages.append(bytes(self._buf[pos + header:pos + header + length]))
+            pos += header + length
+        del self._buf[:pos]
+        return messages
+
+class JsonFraming(LengthPrefixFraming):
+    """
+    JSON objects in length-prefixed frames, the same wire format as
+    shared.utils.send_json/recv_json, so clients can use those directly.
+    """
+    def encode(self, message):
+        return super().encode(json.dumps(message).encode('utf-8'))
+
+    def decode(self, data):
+        frames = super().decode(data)
+        try:
+            return [json.loads(frame) for frame in frames]
+        except ValueError as e:
+            raise FramingError(f"Invalid JSON frame: {e}")
@@ -0,0 +1,156 @@
+import math
+
+class InterestGrid:
+    """
+    Interest management on a uniform grid (a spatial hash: cell ->
+    entities in it): which clients should hear about which entities.
+
+    Entities have a position, set_entity(key, x, y); viewers (usually
+    Connections) have one plus the view radius given to the grid,
+    set_viewer(conn, x, y). A viewer is interested in every entity in
+    the square of cells around its own that covers its view, so its
+    relevant set only changes when an entity or the viewer crosses a
+    cell boundary, and is then updated incrementally: a move inside a
+    cell is a dict lookup, a crossing touches the viewers of the two
+    cells, a viewer crossing touches the row or column of cells that
+    entered or left its window.
+
+        grid.set_entity(unit_id, x, y)          # every tick, for movers
+        self.broadcast(update, to=grid.watchers(unit_id))
+        for conn, (entered, left) in grid.pop_changes().items():
+            ...                                 # send spawns / despawns
+
+    `cell` should be about the view radius or a fraction of it: smaller
+    cells fit the view more tightly but cost more per viewer move.
+    """
+    def __init__(self, cell, view_radius):
+        if cell <= 0 or view_radius < 0:
+            raise ValueError("cell must be positive and view_radius not negative")
+        self.cell = cell
+        self.reach = math.ceil(view_radius / cell) # window: cells within reach of the viewer's
+        self.grid = {}         # cell -> {entity key}
+        self.where = {}        # entity key -> cell
+        self._watchers = {}    # entity key -> {viewer}
+        self.windows = {}      # cell -> {viewer whose window covers it}
+        self.viewer_cells = {} # viewer -> cell
+        self._relevant = {}    # viewer -> {entity key}
+        self.changes = {}      # viewer -> {entity key: True entered / False left}
+
+    def cell_of(self, x, y):
+        return (int(x // self.cell), int(y // self.cell))
+
+    def _window(self, cell):
+        cx, cy = cell
+        reach = self.reach
+        return {(cx + dx, cy + dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)}
+
+    def _enter(self, viewer, key):
+        self._relevant[viewer].add(key)
+        changes = self.changes.setdefault(viewer, {})
+        if changes.get(key) is False:
+            del changes[key] # left and came back within one tick
+        else:
+            changes[key] = True
+
+    def _leave(self, viewer, key):
+        self._relevant[viewer].discard(key)
+        changes = self.changes.setdefault(viewer, {})
+        if changes.get(key) is True:
+            del changes[key]
+        else:
+            changes[key] = False
+
+    def set_entity(self, key, x, y):
+        """Adds or moves an entity."""
+        cell = self.cell_of(x, y)
+        old = self.where.get(key)
+        if old == cell:
+            return
+        if old is not None:
+            members = self.grid[old]
+            members.discard(key)
+            if not members:
+                del self.grid[old]
+        self.grid.setdefault(cell, set()).add(key)
+        self.where[key] = cell
+        before = self._watchers.get(key, ())
+        after = self.windows.get(cell, ())
+        for viewer in [v for v in before if v not in after]:
+            self._leave(viewer, key)
+        for viewer in [v for v in after if v not in before]:
+            self._enter(viewer, key)
+        self._watchers[key] = set(after)
+
+    def remove_entity(self, key):
+        cell = self.where.pop(key, None)
+        if cell is None:
+            return
+        members = self.grid[cell]
+        members.discard(key)
+        if not members:
+            del self.grid[cell]
+        for viewer in self._watchers.pop(key, ()):
+            self._leave(viewer, key)
+
+    def set_viewer(self, viewer, x, y):
+        """Adds or moves a viewer."""
+        cell = self.cell_of(x, y)
+        old = self.viewer_cells.get(viewer)
+        if old == cell:
+            return
+        self.viewer_cells[viewer] = cell
+        self._relevant.setdefault(viewer, set())
+        before = self._window(old) if old is not None else set()
+        after = self._window(cell)
+        for gone in before - after:
+            viewers = self.windows[gone]
+            viewers.discard(viewer)
+            if not viewers:
+                del self.windows[gone]
+            for key in self.grid.get(gone, ()):
+                self._watchers[key].discard(viewer)
+                self._leave(viewer, key)
+        for new in after - before:
+            self.windows.setdefault(new, set()).add(viewer)
+            for key in self.grid.get(new, ()):
+                self._watchers[key].add(viewer)
+                self._enter(viewer, key)
+
+    def remove_viewer(self, viewer):
+        cell = self.viewer_cells.pop(viewer, None)
+        if cell is None:
+            return
+        for window_cell in self._window(cell):
+            viewers = self.windows[window_cell]
+            viewers.discard(viewer)
+            if not viewers:
+                del self.windows[window_cell]
+        for key in self._relevant.pop(viewer):
+            self._watchers[key].discard(viewer)
+        self.changes.pop(viewer, None)
+
+    def relevant(self, viewer):
+        """Entity keys the viewer is interested in (do not modify)."""
+        return self._relevant.get(viewer, set())
+
+    def watchers(self, key):
+        """Viewers interested in an entity: who gets its updates (do not modify)."""
+        return self._watchers.get(key, set())
+
+    def viewers_near(self, x, y):
+        """Viewers interested in a point, e.g. for an event with no entity."""
+        return self.windows.get(self.cell_of(x, y), set())
+
+    def pop_changes(self):
+        """
+        {viewer: (entered, left)} since the last call, for the viewers
+        whose relevant set changed; call it once per tick.
+        """
+        result = {}
+        for viewer, changes in self.changes.items():
+            if changes:
+                entered = [key for key, inside in changes.items() if inside]
+                left = [key for key, inside in changes.items() if not inside]
+                result[viewer] = (entered, left)
+        self.changes = {}
+        return result
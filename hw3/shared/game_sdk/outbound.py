@@ -0,0 +1,113 @@
+from collections import deque
+from itertools import islice
+
+# Slow-consumer policies: what happens when a client does not read fast
+# enough and its queue is over the limit.
+DROP_OLDEST = "drop_oldest" # drop the oldest unsent messages
+COALESCE = "coalesce"       # a keyed message replaces its queued predecessor; then drop oldest
+DISCONNECT = "disconnect"   # drop the client
+POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+# Most buffers one sendmsg() takes (IOV_MAX is 1024 on Linux)
+MAX_IOV = 256
+
+class OutboundQueue:
+    """
+    Bounded queue of framed messages waiting for one non-blocking socket.
+
+    Messages are kept as the bytes objects they were queued with, so a
+    broadcast queues one shared object per client instead of a copy.
+    write() sends as much as the socket takes without blocking, several
+    messages per syscall where sendmsg() exists.
+
+    When more than `max_bytes` or `max_messages` are queued, `policy`
+    decides (see POLICIES). With COALESCE, push(data, key) replaces a
+    queued message with the same key, e.g. the last position of a
+    player, so a slow client gets the newest state instead of every
+    state. A message that is partly written is never dropped or replaced.
+    """
+    def __init__(self, max_bytes=256 * 1024, max_messages=1024, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.policy = policy
+        self.frames = deque() # [data, key]
+        self.offset = 0       # bytes of frames[0] already written
+        self.nbytes = 0       # unwritten bytes
+        self.keyed = {}       # key -> its queued frame (COALESCE)
+        # Metrics
+        self.peak_bytes = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.writes = 0 # send syscalls
+
+    def __len__(self):
+        return len(self.frames)
+
+    def push(self, data, key=None):
+        """Queues a message. False: over the limit under DISCONNECT, drop the client."""
+        if self.policy == COALESCE and key is not None:
+            frame = self.keyed.get(key)
+            if frame is not None and not (frame is self.frames[0] and self.offset):
+                self.nbytes += len(data) - len(frame[0])
+                frame[0] = data
+                self.coalesced += 1
+                return self._trim()
+        frame = [data, key]
+        self.frames.append(frame)
+        self.nbytes += len(data)
+        if key is not None and self.policy == COALESCE:
+            self.keyed[key] = frame
+        return self._trim()
+
+    def _trim(self):
+        self.peak_bytes = max(self.peak_bytes, self.nbytes)
+        while self.nbytes > self.max_bytes or len(self.frames) > self.max_messages:
+            if self.policy == DISCONNECT:
+                return False
+            oldest = 1 if self.offset else 0 # skip a partly written message
+            if oldest >= len(self.frames):
+                break
+            frame = self.frames[oldest]
+            del self.frames[oldest]
+            self._forget(frame)
+            self.nbytes -= len(frame[0])
+            self.dropped += 1
+        return True
+
+    def _forget(self, frame):
+        if frame[1] is not None and self.keyed.get(frame[1]) is frame:
+            del self.keyed[frame[1]]
+
+    def write(self, sock):
+        """
+        Writes what the socket takes. Returns True once the queue is empty.
+        OSError other than "would block" is left to the caller.
+        """
+        try:
+            while self.frames:
+                head = memoryview(self.frames[0][0])[self.offset:]
+                if len(self.frames) > 1 and hasattr(sock, "sendmsg"):
+                    sent = sock.sendmsg([head] + [frame[0] for frame in islice(self.frames, 1, MAX_IOV)])
+                else:
+                    sent = sock.send(head)
+                self.writes += 1
+                self._consume(sent)
+        except (BlockingIOError, InterruptedError):
+            pass
+        return not self.frames
+
+    def _consume(self, sent):
+        self.nbytes -= sent
+        sent += self.offset
+        while self.frames and sent >= len(self.frames[0][0]):
+            frame = self.frames.popleft()
+            sent -= len(frame[0])
+            self._forget(frame)
+        self.offset = sent
+
+    def metrics(self):
+        return {"queued_messages": len(self.frames), "queued_bytes": self.nbytes,
+                "peak_bytes": self.peak_bytes, "dropped": self.dropped,
+                "coalesced": self.coalesced, "writes": self.writes}
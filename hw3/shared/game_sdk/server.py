@@ -0,0 +1,547 @@
+import heapq
+import itertools
+import json
+import secrets
+import selectors
+import socket
+import sys
+import time
+import traceback
+from collections import deque
+
+from shared.game_sdk.framing import FramingError, LineFraming
+from shared.game_sdk.outbound import DROP_OLDEST, OutboundQueue
+from shared.game_sdk.udp import HEADER, HELLO, MAX_DATAGRAM, RELIABLE, UdpEndpoint
+
+# Bind-zero servers with `udp` pick a new port this often when the one the
+# OS chose for TCP is taken for UDP
+UDP_BIND_ATTEMPTS = 5
+
+class Connection:
+    """One connected client. `data` is free for the game's per-player state."""
+    def __init__(self, server, conn_id, sock, addr):
+        self.server = server
+        self.id = conn_id
+        self.sock = sock
+        self.addr = addr
+        self.framing = server.framing() # decoder state of this connection
+        self.data = {}
+        self.connected_at = time.time()
+        self.outq = OutboundQueue(server.max_queue_bytes, server.max_queue_messages, server.slow_consumer)
+        self.writing = False # registered for EVENT_WRITE
+        self.closed = False
+        # With `udp` set: what this client's UdpClient.hello() must send
+        self.udp_token = secrets.token_urlsafe(12) if server.udp else None
+        self.udp_peer = None
+
+    def send(self, message, key=None, immediate=False):
+        self.server.send(self, message, key, immediate)
+
+    def close(self):
+        self.server.disconnect(self)
+
+class UdpPeer:
+    """One client of the UDP transport, known by its address; `conn` is its TCP connection."""
+    def __init__(self, server, addr, conn):
+        self.server = server
+        self.addr = addr
+        self.conn = conn
+        self.endpoint = UdpEndpoint()
+        self.data = {}
+        self.last_seen = time.monotonic()
+        self.closed = False
+
+    def send(self, message, reliable=True):
+        self.server.send_datagram(self, message, reliable)
+
+    def close(self):
+        self.server.drop_udp_peer(self)
+
+class GameServer:
+    """
+    Base class for game servers: one thread, one selector loop, no
+    blocking I/O. Subclass it and override the hooks you need:
+
+        on_start()                  listening, before the first client
+        on_connect(conn)            a client connected
+        on_message(conn, message)   one decoded message from a client
+        on_disconnect(conn)         a client left (or was dropped)
+        on_tick()                   every tick, when `tick_rate` is set
+        on_stop()                   the server is shutting down
+
+    and, with `udp` set, on_udp_connect(peer), on_datagram(peer, message,
+    reliable) and on_udp_disconnect(peer).
+
+    Hooks run on the event loop, so they must not block. An exception in
+    a client's hook drops that client; the others keep playing.
+
+    Messages are framed by the `framing` class (LineFraming by default,
+    what the template clients speak; see framing.py). send() and
+    broadcast() never block: what a socket does not take right away
+    waits in the client's bounded OutboundQueue and is written when the
+    socket becomes writable. A client that falls `max_queue_bytes` or
+    `max_queue_messages` behind is handled by `slow_consumer` (see
+    outbound.py); `key` on send/broadcast names what COALESCE may
+    replace. metrics() reports queue depths and drops, and is printed
+    every `metrics_interval` seconds when that is set.
+
+    With `tick_rate` (ticks per second) set, sends are not written right
+    away: each client's messages gather in its queue and go out in one
+    write per tick, after on_tick(). That turns N players' chatter into
+    one syscall per player per tick instead of one per message and
+    recipient. Pass immediate=True to send/broadcast for messages that
+    must not wait for the tick. In spatial games, broadcast(..., to=)
+    with an InterestGrid (interest.py) sends an update only to the
+    clients that can see it.
+
+    With `udp` set, the server also takes datagrams on the same port
+    number, for real-time traffic that should not wait behind a lost TCP
+    segment. Each client address becomes a UdpPeer with a reliability
+    layer (see udp.py): peer.send(message) is reliable and ordered,
+    peer.send(message, reliable=False) is sequenced (newest wins, never
+    retransmitted). Peers silent for `udp_timeout` seconds are dropped.
+    A UDP client is only accepted once its first reliable message is the
+    `udp_token` of a live TCP connection (send it over TCP, e.g. in
+    on_connect; UdpClient.hello() sends it back), up to `udp_max_peers`;
+    other datagrams are ignored and counted in `udp_rejected`. A peer is
+    dropped with its TCP connection, and a new hello for the same
+    connection replaces it.
+    If the UDP port number is taken, a server on port 0 picks another
+    port for both; one given a fixed port serves TCP only (udp_sock None).
+    Advertise it with "transports": ["tcp", "udp"] in config.json; the
+    lobby passes that on in GAME_START. `connections` maps
+    connection ids to every connected client. call_later() runs a
+    callback on the loop after a delay, e.g. for game ticks; other
+    threads hand work to the loop with call_threadsafe().
+
+    A game's server.py typically ends with `MyGame.main()`, which takes
+    the port from the command line like every game server.
+    """
+    framing = LineFraming
+    host = '0.0.0.0'
+    recv_bytes = 64 * 1024
+    max_queue_bytes = 256 * 1024
+    max_queue_messages = 1024
+    slow_consumer = DROP_OLDEST
+    metrics_interval = None
+    tick_rate = None
+    udp = False
+    udp_timeout = 10.0
+    udp_max_peers = 1024
+    udp_poll_interval = 0.02 # retransmit/ack check
+
+    def __init__(self, port=0, host=None, framing=None):
+        self.port = port
+        if host is not None:
+            self.host = host
+        if framing is not None:
+            self.framing = framing
+        self.connections = {} # id -> Connection
+        self.running = False
+        self.listener = None
+        self.sel = selectors.DefaultSelector()
+        self._encoder = self.framing()
+        self._ids = itertools.count(1)
+        self._timers = [] # heap of (due, seq, callback, args)
+        self._timer_seq = itertools.count()
+        # Totals of clients that already left (see metrics())
+        self._closed_dropped = 0
+        self._closed_coalesced = 0
+        self._closed_writes = 0
+        self.slow_disconnects = 0
+        self._dirty = {} # connections with messages waiting for the tick (dict: ordered set)
+        self._next_tick = None
+        self.udp_sock = None
+        self.udp_peers = {} # addr -> UdpPeer
+        self.udp_rejected = 0 # datagrams from addresses without a valid hello
+        self._udp_tokens = {} # Connection.udp_token -> Connection
+        self._pending = deque() # callbacks from other threads
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.sel.register(self._wake_r, selectors.EVENT_READ, self._wake_r)
+
+    # --- Hooks ---
+    def on_start(self):
+        pass
+
+    def on_connect(self, conn):
+        pass
+
+    def on_message(self, conn, message):
+        pass
+
+    def on_disconnect(self, conn):
+        pass
+
+    def on_tick(self):
+        pass
+
+    def on_stop(self):
+        pass
+
+    def on_udp_connect(self, peer):
+        pass
+
+    def on_datagram(self, peer, message, reliable):
+        pass
+
+    def on_udp_disconnect(self, peer):
+        pass
+
+    # --- Sending ---
+    def send(self, conn, message, key=None, immediate=False):
+        self.send_raw(conn, self._encoder.encode(message), key, immediate)
+
+    def broadcast(self, message, exclude=None, key=None, immediate=False, to=None):
+        """
+        Sends one message to every client (but `exclude`), or only to the
+        connections in `to`, e.g. InterestGrid.watchers(); it is encoded once.
+        """
+        data = self._encoder.encode(message)
+        for conn in list(self.connections.values() if to is None else to):
+            if conn is not exclude:
+                self.send_raw(conn, data, key, immediate)
+
+    def send_raw(self, conn, data, key=None, immediate=False):
+        """Queues already framed bytes."""
+        if conn.closed:
+            return
+        if not conn.outq.push(data, key):
+            print(f"Game: dropping slow client {conn.addr} ({conn.outq.nbytes} bytes queued)")
+            self.slow_disconnects += 1
+            self.disconnect(conn)
+            return
+        if self.tick_rate and not immediate:
+            if not conn.writing: # else EVENT_WRITE picks it up
+                self._dirty[conn] = None
+            return
+        self._flush(conn)
+
+    def disconnect(self, conn, notify=True):
+        if conn.closed:
+            return
+        conn.closed = True
+        self._closed_dropped += conn.outq.dropped
+        self._closed_coalesced += conn.outq.coalesced
+        self._closed_writes += conn.outq.writes
+        self._dirty.pop(conn, None)
+        self.sel.unregister(conn.sock)
+        conn.sock.close()
+        self.connections.pop(conn.id, None)
+        self._udp_tokens.pop(conn.udp_token, None)
+        if notify:
+            self._call(conn, self.on_disconnect, conn)
+        if conn.udp_peer is not None:
+            self.drop_udp_peer(conn.udp_peer, notify)
+
+    # --- UDP transport ---
+    def send_datagram(self, peer, message, reliable=True):
+        if peer.closed:
+            return
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        self._sendto(peer, peer.endpoint.send(message, reliable))
+
+    def broadcast_datagram(self, message, reliable=True, exclude=None):
+        for peer in list(self.udp_peers.values()):
+            if peer is not exclude:
+                self.send_datagram(peer, message, reliable)
+
+    def drop_udp_peer(self, peer, notify=True):
+        if peer.closed:
+            return
+        peer.closed = True
+        self.udp_peers.pop(peer.addr, None)
+        if peer.conn.udp_peer is peer:
+            peer.conn.udp_peer = None
+        if notify:
+            self._call_udp(peer, self.on_udp_disconnect, peer)
+
+    def _sendto(self, peer, datagram):
+        try:
+            self.udp_sock.sendto(datagram, peer.addr)
+        except OSError:
+            pass # lost like any datagram; reliable messages are retransmitted
+
+    def _read_udp(self):
+        for _ in range(256): # then let TCP clients have a turn
+            try:
+                datagram, addr = self.udp_sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue # e.g. ICMP port unreachable for an earlier sendto
+            peer = self.udp_peers.get(addr)
+            new = peer is None
+            if new:
+                peer = self._udp_hello(addr, datagram)
+                if peer is None:
+                    self.udp_rejected += 1
+                    continue
+            peer.last_seen = time.monotonic()
+            messages = peer.endpoint.receive(datagram)
+            if new:
+                messages = messages[1:] # the hello
+                self._call_udp(peer, self.on_udp_connect, peer)
+            for message, reliable in messages:
+                if peer.closed:
+                    break
+                self._call_udp(peer, self.on_datagram, peer, message, reliable)
+
+    def _udp_hello(self, addr, datagram):
+        """A UdpPeer for a new address whose datagram is a valid hello, else None."""
+        if len(datagram) <= HEADER.size + len(HELLO) or len(self.udp_peers) >= self.udp_max_peers:
+            return None
+        _, _, _, channel, message_id = HEADER.unpack_from(datagram)
+        payload = datagram[HEADER.size:]
+        if channel != RELIABLE or message_id != 0 or not payload.startswith(HELLO):
+            return None
+        token = payload[len(HELLO):].decode('utf-8', 'replace')
+        conn = self._udp_tokens.get(token)
+        if conn is None:
+            return None
+        if conn.udp_peer is not None: # the client came back from a new address
+            self.drop_udp_peer(conn.udp_peer)
+        peer = conn.udp_peer = self.udp_peers[addr] = UdpPeer(self, addr, conn)
+        return peer
+
+    def _poll_udp(self):
+        self.call_later(self.udp_poll_interval, self._poll_udp)
+        now = time.monotonic()
+        for peer in list(self.udp_peers.values()):
+            if peer.endpoint.failed or now - peer.last_seen > self.udp_timeout:
+                self.drop_udp_peer(peer)
+                continue
+            for datagram in peer.endpoint.poll():
+                self._sendto(peer, datagram)
+
+    def _call_udp(self, peer, hook, *args):
+        try:
+            hook(*args)
+        except Exception:
+            traceback.print_exc()
+            self.drop_udp_peer(peer, notify=False)
+
+    def metrics(self):
+        """Outbound queue totals; dropped/coalesced include clients that already left."""
+        queues = [conn.outq for conn in self.connections.values()]
+        return {
+            "connections": len(queues),
+            "queued_bytes": sum(q.nbytes for q in queues),
+            "max_queue_bytes": max((q.nbytes for q in queues), default=0),
+            "max_queue_messages": max((len(q) for q in queues), default=0),
+            "dropped_messages": self._closed_dropped + sum(q.dropped for q in queues),
+            "coalesced_messages": self._closed_coalesced + sum(q.coalesced for q in queues),
+            "slow_disconnects": self.slow_disconnects,
+            "writes": self._closed_writes + sum(q.writes for q in queues),
+        }
+
+    def _log_metrics(self):
+        print(f"Game metrics: {json.dumps(self.metrics())}")
+        self.call_later(self.metrics_interval, self._log_metrics)
+
+    # --- Timers ---
+    def call_later(self, delay, callback, *args):
+        heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timer_seq), callback, args))
+
+    def _tick(self):
+        # Scheduled against the previous due time, so ticks do not drift;
+        # after a stall the schedule restarts instead of bursting to catch up
+        now = time.monotonic()
+        self._next_tick = max(self._next_tick + 1.0 / self.tick_rate, now)
+        self.call_later(self._next_tick - now, self._tick)
+        try:
+            self.on_tick()
+        except Exception:
+            traceback.print_exc()
+        self.flush_all()
+
+    def flush_all(self):
+        """Writes every client's queued messages now: one write per client."""
+        dirty, self._dirty = self._dirty, {}
+        for conn in dirty:
+            if not conn.closed:
+                self._flush(conn)
+
+    def call_threadsafe(self, callback, *args):
+        """Runs callback(*args) on the loop; the only GameServer method other threads may call."""
+        self._pending.append((callback, args))
+        try:
+            self._wake_w.send(b"x")
+        except (BlockingIOError, OSError):
+            pass # already woken, or shut down
+
+    def _run_pending(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self._pending:
+            callback, args = self._pending.popleft()
+            try:
+                callback(*args)
+            except Exception:
+                traceback.print_exc()
+
+    def _run_timers(self):
+        """Runs due timers. Returns seconds until the next one (None: no timers)."""
+        while self._timers:
+            due, _, callback, args = self._timers[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                return delay
+            heapq.heappop(self._timers)
+            try:
+                callback(*args)
+            except Exception:
+                traceback.print_exc()
+        return None
+
+    # --- Loop ---
+    def listen(self):
+        requested = self.port
+        for attempt in range(UDP_BIND_ATTEMPTS if self.udp and not requested else 1):
+            self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.listener.bind((self.host, requested))
+            self.port = self.listener.getsockname()[1]
+            # Bound before listen(): once the lobby learns the port, both transports are up
+            if not self.udp or self._bind_udp():
+                break
+            if requested or attempt == UDP_BIND_ATTEMPTS - 1:
+                # A fixed port (or no luck): serve TCP only rather than not at all
+                print(f"Game: UDP port {self.port} is taken; serving TCP only")
+                break
+            self.listener.close() # the OS picked a number taken for UDP: pick again
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.sel.register(self.listener, selectors.EVENT_READ, None)
+        print(f"Game Server listening on {self.port}")
+
+    def _bind_udp(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((self.host, self.port))
+        except OSError:
+            sock.close()
+            return False
+        sock.setblocking(False)
+        self.udp_sock = sock
+        self.sel.register(sock, selectors.EVENT_READ, sock)
+        return True
+
+    def serve_forever(self):
+        if self.listener is None:
+            self.listen()
+        self.running = True
+        if self.metrics_interval:
+            self.call_later(self.metrics_interval, self._log_metrics)
+        if self.tick_rate:
+            self._next_tick = time.monotonic() + 1.0 / self.tick_rate
+            self.call_later(1.0 / self.tick_rate, self._tick)
+        if self.udp_sock is not None:
+            self.call_later(self.udp_poll_interval, self._poll_udp)
+        self.on_start()
+        try:
+            while self.running:
+                timeout = self._run_timers()
+                if not self.running:
+                    break
+                for key, mask in self.sel.select(timeout):
+                    if key.data is None:
+                        self._accept()
+                        continue
+                    if key.data is self._wake_r:
+                        self._run_pending()
+                        continue
+                    if key.data is self.udp_sock:
+                        self._read_udp()
+                        continue
+                    conn = key.data
+                    if mask & selectors.EVENT_READ and not conn.closed:
+                        self._read(conn)
+                    if mask & selectors.EVENT_WRITE and not conn.closed:
+                        self._flush(conn)
+        finally:
+            for conn in list(self.connections.values()):
+                self.disconnect(conn, notify=False)
+            self.sel.close()
+            self.listener.close()
+            if self.udp_sock is not None:
+                self.udp_sock.close()
+            self._wake_r.close()
+            self._wake_w.close()
+            self.on_stop()
+
+    def stop(self):
+        """Ends serve_forever after the current loop iteration (from another thread: call_threadsafe(stop))."""
+        self.running = False
+
+    @classmethod
+    def main(cls, argv=None):
+        """Entry point for a game's server.py: python server.py <port>."""
+        argv = sys.argv if argv is None else argv
+        if len(argv) < 2:
+            print("Usage: python server.py <port>")
+            sys.exit(1)
+        cls(int(argv[1])).serve_forever()
+
+    def _call(self, conn, hook, *args):
+        try:
+            hook(*args)
+        except Exception:
+            traceback.print_exc()
+            self.disconnect(conn, notify=False)
+
+    def _accept(self):
+        while True:
+            try:
+                sock, addr = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print(f"Game: accept failed: {e}") # e.g. out of file descriptors
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = Connection(self, next(self._ids), sock, addr)
+            self.connections[conn.id] = conn
+            if conn.udp_token is not None:
+                self._udp_tokens[conn.udp_token] = conn
+            self.sel.register(sock, selectors.EVENT_READ, conn)
+            self._call(conn, self.on_connect, conn)
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(self.recv_bytes)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.disconnect(conn)
+            return
+        try:
+            messages = conn.framing.decode(data)
+        except FramingError as e:
+            print(f"Game: dropping {conn.addr}: {e}")
+            self.disconnect(conn)
+            return
+        for message in messages:
+            if conn.closed:
+                break
+            self._call(conn, self.on_message, conn, message)
+
+    def _flush(self, conn):
+        """Writes as much of the queue as the socket takes; waits for EVENT_WRITE for the rest."""
+        try:
+            pending = not conn.outq.write(conn.sock)
+        except OSError:
+            self.disconnect(conn)
+            return
+        if pending != conn.writing:
+            conn.writing = pending
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+            self.sel.modify(conn.sock, events, conn)
@@ -0,0 +1,198 @@
+import struct
+
+KEYFRAME = 0
+DELTA = 1
+# kind, snapshot seq, baseline seq (0 for keyframes), entity count
+HEADER = struct.Struct(">BIII")
+
+def write_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def read_varint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+class Schema:
+    """
+    The fields every entity has, in order, with their struct format
+    character: Schema(x="f", y="f", hp="H", state="B"). Values are
+    compared exactly, so floats that did not move cost nothing.
+    """
+    def __init__(self, **fields):
+        if not fields:
+            raise ValueError("A schema needs at least one field")
+        self.names = list(fields)
+        self.structs = [struct.Struct(">" + fmt) for fmt in fields.values()]
+        self.mask_bytes = (len(self.names) + 7) // 8
+        self.full_mask = (1 << len(self.names)) - 1
+
+    def row(self, entity):
+        """Entity dict -> tuple in field order."""
+        return tuple(entity[name] for name in self.names)
+
+    def pack(self, row, mask):
+        out = bytearray(mask.to_bytes(self.mask_bytes, "big"))
+        for i, st in enumerate(self.structs):
+            if mask >> i & 1:
+                out += st.pack(row[i])
+        return out
+
+    def unpack(self, data, pos, base):
+        """Reads one entity's mask and fields; fields not in the mask come from `base`."""
+        mask = int.from_bytes(data[pos:pos + self.mask_bytes], "big")
+        pos += self.mask_bytes
+        row = list(base) if base is not None else [None] * len(self.names)
+        for i, st in enumerate(self.structs):
+            if mask >> i & 1:
+                (row[i],) = st.unpack_from(data, pos)
+                pos += st.size
+        return tuple(row), pos
+
+class SnapshotHistory:
+    """
+    Server side: the world as it was at the last `history` snapshots.
+
+    capture(world) records the current state ({entity id: {field: value}},
+    ids 0..2**32-1) and returns its sequence number. encode_for(client)
+    then builds what that client needs: a delta against the newest
+    snapshot it acknowledged, or a keyframe (every entity, every field)
+    when it has acknowledged none that is still kept, or when its last
+    keyframe is `keyframe_interval` snapshots old. A delta lists only the
+    entities that changed, and for each a field bitmask plus the changed
+    fields, packed big-endian; removed entities are listed by id. Ids
+    are varints of the gap to the previous id.
+
+    Clients that acknowledged the same snapshot get the same bytes: the
+    delta is built once per baseline and capture.
+    """
+    def __init__(self, schema, history=32, keyframe_interval=64):
+        self.schema = schema
+        self.history = history
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.snapshots = {} # seq -> {id: row}
+        self._encoded = {}  # baseline seq (0: keyframe) -> bytes of the current snapshot
+
+    def capture(self, world):
+        self.seq += 1
+        row = self.schema.row
+        self.snapshots[self.seq] = {entity_id: row(entity) for entity_id, entity in world.items()}
+        self.snapshots.pop(self.seq - self.history, None)
+        self._encoded = {}
+        return self.seq
+
+    def encode_for(self, client):
+        """Bytes of the current snapshot for one client (a ClientBaseline)."""
+        baseline = client.acked
+        if baseline not in self.snapshots or baseline == self.seq or \
+                self.seq - client.keyframe_seq >= self.keyframe_interval:
+            baseline = 0
+        if baseline == 0:
+            client.keyframe_seq = self.seq
+        data = self._encoded.get(baseline)
+        if data is None:
+            data = self._encoded[baseline] = self.encode(baseline)
+        return data
+
+    def encode(self, baseline=0):
+        """The current snapshot as a keyframe (baseline 0) or a delta against `baseline`."""
+        current = self.snapshots[self.seq]
+        schema = self.schema
+        body = bytearray()
+        previous = 0
+        if baseline == 0:
+            for entity_id in sorted(current): # ids stored as gaps, like everywhere
+                write_varint(body, entity_id - previous)
+                previous = entity_id
+                body += schema.pack(current[entity_id], schema.full_mask)
+            return HEADER.pack(KEYFRAME, self.seq, 0, len(current)) + body
+        base = self.snapshots[baseline]
+        removed = sorted(entity_id for entity_id in base if entity_id not in current)
+        write_varint(body, len(removed))
+        for entity_id in removed:
+            write_varint(body, entity_id - previous)
+            previous = entity_id
+        count = 0
+        previous = 0
+        for entity_id in sorted(current):
+            row = current[entity_id]
+            old = base.get(entity_id)
+            if old == row:
+                continue
+            if old is None:
+                mask = schema.full_mask
+            else:
+                mask = 0
+                for i, value in enumerate(row):
+                    if value != old[i]:
+                        mask |= 1 << i
+            write_varint(body, entity_id - previous)
+            previous = entity_id
+            body += schema.pack(row, mask)
+            count += 1
+        return HEADER.pack(DELTA, self.seq, baseline, count) + body
+
+class ClientBaseline:
+    """What one client acknowledged; the game calls ack(seq) when the client reports it."""
+    def __init__(self):
+        self.acked = 0
+        self.keyframe_seq = 0
+
+    def ack(self, seq):
+        if seq > self.acked:
+            self.acked = seq
+
+class SnapshotDecoder:
+    """
+    Client side: rebuilds the world from keyframes and deltas. decode()
+    returns (seq, world) with world as {entity id: {field: value}}; the
+    client should then acknowledge seq to the server. A delta whose
+    baseline is no longer kept here raises KeyError; the server sends a
+    keyframe after a while anyway (or once the ack it gets is unknown).
+    """
+    def __init__(self, schema, history=32):
+        self.schema = schema
+        self.history = history
+        self.snapshots = {} # seq -> {id: row}
+        self.latest = 0
+
+    def decode(self, data):
+        kind, seq, baseline, count = HEADER.unpack_from(data)
+        pos = HEADER.size
+        schema = self.schema
+        if kind == KEYFRAME:
+            rows = {}
+            entity_id = 0
+            for _ in range(count):
+                gap, pos = read_varint(data, pos)
+                entity_id += gap
+                rows[entity_id], pos = schema.unpack(data, pos, None)
+        else:
+            base = self.snapshots[baseline]
+            rows = dict(base)
+            removed, pos = read_varint(data, pos)
+            entity_id = 0
+            for _ in range(removed):
+                gap, pos = read_varint(data, pos)
+                entity_id += gap
+                rows.pop(entity_id, None)
+            entity_id = 0
+            for _ in range(count):
+                gap, pos = read_varint(data, pos)
+                entity_id += gap
+                rows[entity_id], pos = schema.unpack(data, pos, base.get(entity_id))
+        self.snapshots[seq] = rows
+        for old in [s for s in self.snapshots if s <= seq - self.history]:
+            del self.snapshots[old]
+        self.latest = max(self.latest, seq)
+        names = schema.names
+        return seq, {entity_id: dict(zip(names, row)) for entity_id, row in rows.items()}
@@ -0,0 +1,221 @@
+import select
+import socket
+import struct
+import time
+
+# Packet header: seq, ack, ack_bits, channel, message id (big-endian, 11 bytes)
+HEADER = struct.Struct(">HHIBH")
+MAX_DATAGRAM = 1200 # payload + header; stays under common path MTUs
+
+ACK = 0        # header only: acknowledges, carries nothing
+RELIABLE = 1   # retransmitted until acked, delivered once and in order
+SEQUENCED = 2  # sent once; older than the newest received is dropped
+
+# First reliable message of every UDP client: HELLO + the token its TCP
+# connection got (Connection.udp_token). Servers ignore addresses that
+# have not sent one.
+HELLO = b"HELLO "
+
+def seq_newer(a, b):
+    """True if 16-bit sequence number a is after b (wraps around)."""
+    return 0 < ((a - b) & 0xFFFF) < 0x8000
+
+class UdpEndpoint:
+    """
+    Reliability layer for one UDP peer, without the socket: send() and
+    poll() return datagrams to write, receive() takes one that arrived.
+    Both ends of a UDP game connection (GameServer's UdpPeer, UdpClient)
+    run one.
+
+    Every datagram has its own packet sequence number and acknowledges
+    the newest packet received from the peer plus the 32 before it
+    (ack/ack_bits), so acks survive losses without packets of their own.
+    RELIABLE messages are kept until their packet is acked; poll()
+    retransmits just the ones whose packet was not acked within `rto`
+    (doubling per try, up to 8x), under a new packet number. The receiver puts
+    them back in order by message id. SEQUENCED messages (state updates)
+    are never retransmitted, and one older than the newest already
+    delivered is dropped, so a late packet never rolls state back.
+
+    Reliable messages more than `reorder_window` ids ahead of the next
+    one to deliver are dropped rather than buffered (the sender
+    retransmits them), so a peer cannot make the buffer grow.
+
+    A message that was retransmitted `max_retries` times sets `failed`;
+    the peer is considered gone.
+    """
+    def __init__(self, rto=0.2, max_retries=10, ack_delay=0.02, clock=time.monotonic, reorder_window=256):
+        self.rto = rto
+        self.max_retries = max_retries
+        self.ack_delay = ack_delay
+        self.clock = clock
+        self.reorder_window = reorder_window
+        self.local_seq = 0
+        self.remote_seq = None # newest packet received
+        self.recv_bits = 0     # bit i: packet remote_seq - 1 - i received
+        self.send_reliable_id = 0
+        self.send_sequenced_id = 0
+        self.recv_reliable_id = 0   # next reliable message to deliver
+        self.reorder = {}           # reliable message id -> payload, arrived early
+        self.recv_sequenced_id = None
+        self.unacked = {}           # packet seq -> [message id, payload, sent_at, tries]
+        self.ack_pending = False    # received something that wants an ack
+        self.last_sent = 0.0
+        self.failed = False
+        # Metrics
+        self.retransmits = 0
+        self.stale = 0 # sequenced messages dropped as out of date
+
+    def send(self, payload, reliable=True):
+        """Returns the datagram carrying `payload`."""
+        if len(payload) + HEADER.size > MAX_DATAGRAM:
+            raise ValueError(f"Datagram payload over {MAX_DATAGRAM - HEADER.size} bytes")
+        if reliable:
+            message_id = self.send_reliable_id
+            self.send_reliable_id = (message_id + 1) & 0xFFFF
+            return self._packet(RELIABLE, message_id, payload, 0)
+        message_id = self.send_sequenced_id
+        self.send_sequenced_id = (message_id + 1) & 0xFFFF
+        return self._packet(SEQUENCED, message_id, payload)
+
+    def _packet(self, channel, message_id, payload, tries=None):
+        seq = self.local_seq
+        self.local_seq = (seq + 1) & 0xFFFF
+        now = self.clock()
+        if channel == RELIABLE:
+            self.unacked[seq] = [message_id, payload, now, tries]
+        self.ack_pending = False # acks ride on every packet
+        self.last_sent = now
+        ack = self.remote_seq if self.remote_seq is not None else 0
+        return HEADER.pack(seq, ack, self.recv_bits, channel, message_id) + payload
+
+    def receive(self, datagram):
+        """Takes one datagram. Returns the messages it completes: [(payload, reliable)]."""
+        if len(datagram) < HEADER.size:
+            return []
+        seq, ack, ack_bits, channel, message_id = HEADER.unpack_from(datagram)
+        payload = datagram[HEADER.size:]
+        self._acked(ack, ack_bits)
+        if not self._record(seq):
+            return [] # duplicate packet
+        if channel == ACK:
+            return []
+        self.ack_pending = True
+        if channel == SEQUENCED:
+            if self.recv_sequenced_id is not None and not seq_newer(message_id, self.recv_sequenced_id):
+                self.stale += 1
+                return []
+            self.recv_sequenced_id = message_id
+            return [(payload, False)]
+        if channel != RELIABLE or not seq_newer(message_id, (self.recv_reliable_id - 1) & 0xFFFF):
+            return [] # already delivered (its ack was lost), or unknown channel
+        if (message_id - self.recv_reliable_id) & 0xFFFF >= self.reorder_window:
+            return [] # too far ahead to buffer; retransmitted later
+        self.reorder[message_id] = payload
+        delivered = []
+        while self.recv_reliable_id in self.reorder:
+            delivered.append((self.reorder.pop(self.recv_reliable_id), True))
+            self.recv_reliable_id = (self.recv_reliable_id + 1) & 0xFFFF
+        return delivered
+
+    def _record(self, seq):
+        """Notes packet `seq` for our acks. False if it was seen already."""
+        if self.remote_seq is None:
+            self.remote_seq = seq
+        elif seq_newer(seq, self.remote_seq):
+            shift = (seq - self.remote_seq) & 0xFFFF
+            bits = (self.recv_bits << shift) | (1 << (shift - 1)) if shift <= 32 else 0
+            self.recv_bits = bits & 0xFFFFFFFF
+            self.remote_seq = seq
+        else:
+            back = (self.remote_seq - seq) & 0xFFFF
+            if back == 0 or (back <= 32 and self.recv_bits & (1 << (back - 1))):
+                return False
+            if back <= 32:
+                self.recv_bits |= 1 << (back - 1)
+        return True
+
+    def _acked(self, ack, ack_bits):
+        if not self.unacked:
+            return
+        self.unacked.pop(ack, None)
+        for i in range(32):
+            if ack_bits >> i & 1:
+                self.unacked.pop((ack - 1 - i) & 0xFFFF, None)
+
+    def poll(self):
+        """Datagrams due now: retransmits, and an ack if none went out for a while."""
+        now = self.clock()
+        out = []
+        for seq, (message_id, payload, sent_at, tries) in list(self.unacked.items()):
+            if now - sent_at < self.rto * (2 ** min(tries, 3)):
+                continue
+            del self.unacked[seq]
+            if tries >= self.max_retries:
+                self.failed = True
+                continue
+            self.retransmits += 1
+            out.append(self._packet(RELIABLE, message_id, payload, tries + 1))
+        if self.ack_pending and now - self.last_sent >= self.ack_delay:
+            out.append(self._packet(ACK, 0, b""))
+        return out
+
+class UdpClient:
+    """
+    Client side of the UDP transport, for game clients: connects to the
+    game server's port (the lobby's GAME_START lists "udp" in
+    "transports" when the server offers it). The server only talks to
+    clients that first send the token it gave their TCP connection:
+
+        client = UdpClient(ip, port)
+        client.hello(token)                       # conn.udp_token, sent over TCP
+        client.send(b"join")                      # reliable
+        client.send(b"pos 1 2", reliable=False)   # sequenced
+        for message, reliable in client.receive(0.05): ...
+
+    receive() also retransmits and acks, so call it regularly.
+    """
+    def __init__(self, host, port, endpoint=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect((host, port))
+        self.sock.setblocking(False)
+        self.endpoint = endpoint or UdpEndpoint()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def hello(self, token):
+        """Must be the first message sent: links this client to its TCP connection."""
+        if isinstance(token, str):
+            token = token.encode('utf-8')
+        self.send(HELLO + token)
+
+    def send(self, message, reliable=True):
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        self._write(self.endpoint.send(message, reliable))
+
+    def receive(self, timeout=0):
+        """Messages that arrived within `timeout` seconds: [(bytes, reliable)]."""
+        messages = []
+        if select.select([self.sock], [], [], timeout)[0]:
+            while True:
+                try:
+                    datagram = self.sock.recv(MAX_DATAGRAM)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except ConnectionRefusedError:
+                    continue # ICMP for an earlier datagram; the server may not be up yet
+                messages.extend(self.endpoint.receive(datagram))
+        for datagram in self.endpoint.poll():
+            self._write(datagram)
+        return messages
+
+    def _write(self, datagram):
+        try:
+            self.sock.send(datagram)
+        except (BlockingIOError, ConnectionRefusedError):
+            pass # lost; reliable messages are retransmitted
+
+    def close(self):
+        self.sock.close()
@@ -6,10 +6,12 @@ FIELD_PAYLOAD = "payload"
 FIELD_STATUS = "status"
 FIELD_MESSAGE = "message"
 FIELD_TOKEN = "token"
+FIELD_REVISION = "revision" # Catalog revision (store cache validation)
 
 # Status Codes
 STATUS_OK = "OK"
 STATUS_ERROR = "ERROR"
+STATUS_NOT_MODIFIED = "NOT_MODIFIED" # Client copy at FIELD_REVISION is still current
 
 # Developer Commands
 CMD_DEV_REGISTER = "DEV_REGISTER"
@@ -23,6 +25,7 @@ CMD_GAME_DELETE = "GAME_DELETE"
 CMD_PLAYER_REGISTER = "PLAYER_REGISTER"
 CMD_PLAYER_LOGIN = "PLAYER_LOGIN"
 CMD_STORE_LIST = "STORE_LIST"
+CMD_STORE_SEARCH = "STORE_SEARCH"
 CMD_GAME_DETAIL = "GAME_DETAIL"
 CMD_GAME_DOWNLOAD = "GAME_DOWNLOAD"
 CMD_PLAYER_LIST = "PLAYER_LIST"
@@ -31,3 +34,15 @@ CMD_ROOM_LIST = "ROOM_LIST"
 CMD_ROOM_JOIN = "ROOM_JOIN"
 CMD_GAME_START_NOTIFY = "GAME_START_NOTIFY" # Server -> Client (Host) to start game
 CMD_GAME_RATING = "GAME_RATING"
+CMD_MATCH_QUEUE = "MATCH_QUEUE"   # Join the matchmaking queue; GAME_START is pushed when matched
+CMD_MATCH_CANCEL = "MATCH_CANCEL" # Leave the matchmaking queue
+
+# Game Host Agent Commands
+CMD_AGENT_REGISTER = "AGENT_REGISTER"   # Agent -> Lobby: announce host, control port, capacity
+CMD_AGENT_HEARTBEAT = "AGENT_HEARTBEAT" # Agent -> Lobby: capacity update and finished matches
+CMD_AGENT_SPAWN = "AGENT_SPAWN"         # Lobby -> Agent: start a match, reply once listening
+CMD_AGENT_KILL = "AGENT_KILL"           # Lobby -> Agent: stop a match
+
+# Admin Commands (token = GAME_STORE_ADMIN_KEY; loopback only when unset)
+CMD_ADMIN_RESOURCES = "ADMIN_RESOURCES" # Per-room / per-game CPU and memory usage
+CMD_ADMIN_GAME_OUTPUT = "ADMIN_GAME_OUTPUT" # Captured stdout/stderr of a game server
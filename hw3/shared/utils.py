@@ -2,13 +2,19 @@ import json
 import struct
 import socket
 
-def send_json(sock, data):
+def encode_json(data):
     """
-    Sends a JSON object over the socket with a 4-byte length prefix.
+    Encodes a JSON object into a complete frame (4-byte length prefix + body).
     """
     json_bytes = json.dumps(data).encode('utf-8')
     # Prefix with 4-byte big-endian integer length
-    msg = struct.pack('>I', len(json_bytes)) + json_bytes
+    return struct.pack('>I', len(json_bytes)) + json_bytes
+
+def send_json(sock, data):
+    """
+    Sends a JSON object over the socket with a 4-byte length prefix.
+    """
+    msg = encode_json(data)
     # print(f"DEBUG: Sending {len(msg)} bytes")
     sock.sendall(msg)
 
@@ -0,0 +1,48 @@
+import sys
+import os
+import subprocess
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.cpu_scheduler import CpuScheduler
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="needs sched_setaffinity")
+
+def test_lobby_cores_are_reserved_and_matches_spread():
+    # Bookkeeping only: cores 1-3 may not exist here, setting them is best effort
+    sched = CpuScheduler(lobby_cores=1, cores=[0, 1, 2, 3])
+    assert sched.lobby_cores == {0} and sched.game_cores == [1, 2, 3]
+    placed = [sched.assign(str(i), 2 ** 22 + i)[0] for i in range(6)]
+    assert sorted(placed) == [1, 1, 2, 2, 3, 3]
+    assert 0 not in placed
+
+def test_release_rebalances():
+    sched = CpuScheduler(lobby_cores=0, cores=[0, 1])
+    for i in range(4):
+        sched.assign(str(i), 2 ** 22 + i)
+    # Both matches on core 0 end: core 1 now has two more than core 0
+    on_core0 = [r for r, cores in sched.placement()["rooms"].items() if cores == [0]]
+    for room_id in on_core0:
+        sched.release(room_id)
+    counts = sched.placement()["core_matches"]
+    assert sorted(counts.values()) == [1, 1]
+
+def test_at_least_one_core_left_for_games():
+    sched = CpuScheduler(lobby_cores=8, cores=[0, 1])
+    assert sched.game_cores == [1]
+
+def test_game_process_is_pinned():
+    core = min(os.sched_getaffinity(0))
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        sched = CpuScheduler(lobby_cores=0, cores=[core])
+        assert sched.assign("r", child.pid) == [core]
+        assert os.sched_getaffinity(child.pid) == {core}
+        sched.release("r")
+        assert sched.placement()["rooms"] == {}
+    finally:
+        child.kill()
+        child.wait()
@@ -0,0 +1,62 @@
+import sys
+import os
+import json
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.db_manager import DBManager
+
+def make_meta(game_id, version="1.0.0"):
+    return {"game_id": game_id, "name": game_id.title(), "version": version,
+            "description": "desc", "type": "CLI"}
+
+def test_snapshot_is_not_mutated_by_writers(tmp_path):
+    db = DBManager(str(tmp_path))
+    db.add_game_update("dev", make_meta("g1"))
+
+    before = db.get_game("g1")
+    listing = db.get_all_games()
+    db.add_review("g1", "p1", 5, "fun")
+    db.add_game_update("dev", make_meta("g1", "1.1.0"))
+
+    # Old snapshot entries are untouched, new reads see the changes
+    assert before["reviews"] == []
+    assert before["versions"] == ["1.0.0"]
+    assert listing[0]["version"] == "1.0.0"
+    after = db.get_game("g1")
+    assert after["version"] == "1.1.0"
+    assert after["versions"] == ["1.0.0", "1.1.0"]
+    assert len(after["reviews"]) == 1
+
+def test_commits_are_persisted(tmp_path):
+    db = DBManager(str(tmp_path))
+    db.add_game_update("dev", make_meta("g1"))
+    db.add_game_update("dev", make_meta("g2"))
+    assert not db.add_game_update("other_dev", make_meta("g1"))
+    assert db.delete_game("dev", "g2")
+
+    with open(os.path.join(str(tmp_path), "games.json")) as f:
+        saved = json.load(f)
+    assert list(saved) == ["g1"]
+    assert list(DBManager(str(tmp_path)).games) == ["g1"]
+
+def test_concurrent_writers_on_different_games(tmp_path):
+    import threading
+    db = DBManager(str(tmp_path))
+    for i in range(8):
+        db.add_game_update("dev", make_meta(f"g{i}"))
+
+    def review(game_id):
+        for n in range(20):
+            db.add_review(game_id, "p", n, "")
+
+    threads = [threading.Thread(target=review, args=(f"g{i}",)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    reloaded = DBManager(str(tmp_path))
+    for i in range(8):
+        assert len(reloaded.get_game(f"g{i}")["reviews"]) == 20
@@ -0,0 +1,52 @@
+import sys
+import os
+import random
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+pytest.importorskip("numpy") # entities are the only part of the SDK that needs it
+
+from shared.game_sdk.entities import EntityStore, collisions, move, tick_timers
+
+def test_entity_store_handles_survive_despawns():
+    store = EntityStore(capacity=2, x="f4", hp="i2")
+    a, b, c = (store.spawn(x=i, hp=10 * i) for i in range(3)) # grows past capacity
+    store.despawn(a)
+    assert len(store) == 2 and not store.alive(a)
+    # c moved into a's row; its handle still finds it
+    assert store.get(c, "hp") == 20 and store.row(c) == 0
+    assert sorted(store.handles.tolist()) == sorted([b, c])
+    # The freed id is reused under a new generation: the old handle stays dead
+    d = store.spawn(hp=7)
+    assert d & 0xFFFFFFFF == a & 0xFFFFFFFF and d != a
+    assert not store.alive(a) and store.get(d, "hp") == 7
+    with pytest.raises(KeyError):
+        store.despawn(a)
+    store.set(b, "x", 5)
+    assert store.get(b, "x") == 5
+    with pytest.raises(KeyError):
+        store.spawn(mana=1)
+
+def test_entity_systems_move_timers_and_collisions():
+    store = EntityStore(x="f4", y="f4", vx="f4", vy="f4", radius="f4", timer="f4")
+    mover = store.spawn(vx=2, vy=-1, timer=0.25)
+    idle = store.spawn(x=100, y=100)
+    move(store, 0.5)
+    assert (store.get(mover, "x"), store.get(mover, "y")) == (1, -0.5)
+    assert tick_timers(store, 0.1).size == 0
+    assert tick_timers(store, 0.2).tolist() == [mover]
+    assert tick_timers(store, 0.2).size == 0 and store.get(idle, "timer") == 0
+
+    rng = random.Random(3)
+    store = EntityStore(x="f4", y="f4", radius="f4")
+    for _ in range(400):
+        store.spawn(x=rng.uniform(-50, 50), y=rng.uniform(-50, 50), radius=rng.uniform(0.5, 2))
+    a, b = collisions(store)
+    found = {(min(i, j), max(i, j)) for i, j in zip(a.tolist(), b.tolist())}
+    xs, ys, rs = store["x"], store["y"], store["radius"]
+    expected = {(i, j) for i in range(len(store)) for j in range(i + 1, len(store))
+                if (xs[i] - xs[j]) ** 2 + (ys[i] - ys[j]) ** 2 < (rs[i] + rs[j]) ** 2}
+    assert found == expected and len(found) == len(a) and expected
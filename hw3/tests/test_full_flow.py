@@ -16,7 +16,7 @@ from shared.protocol import *
 import shared.utils as utils
 
 def check_game_server(ip, port):
-    time.sleep(1) # wait for startup
+    # GAME_START is only sent once the game server is listening
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.connect((ip, port))
@@ -0,0 +1,660 @@
+import sys
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.game_manager import GameManager
+from shared.game_sdk import (COALESCE, DISCONNECT, DROP_OLDEST, ClientBaseline, FramingError, GameServer,
+                             InterestGrid, JsonFraming, LengthPrefixFraming, LineFraming, OutboundQueue, Schema,
+                             SnapshotDecoder, SnapshotHistory, UdpClient, UdpEndpoint)
+from shared.game_sdk.snapshot import DELTA, HEADER, KEYFRAME
+import shared.utils as utils
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_line_framing_reassembles_partial_lines():
+    framing = LineFraming(max_length=16)
+    assert framing.decode(b"he") == []
+    assert framing.decode(b"llo\r\nwor") == [b"hello"]
+    assert framing.decode(b"ld\n\n") == [b"world", b""]
+    assert framing.encode("hi") == b"hi\n"
+    with pytest.raises(FramingError):
+        framing.decode(b"x" * 17)
+
+def test_length_prefix_and_json_framing():
+    framing = LengthPrefixFraming(max_length=8)
+    data = framing.encode(b"abc") + framing.encode(b"")
+    assert framing.decode(data[:5]) == []
+    assert framing.decode(data[5:]) == [b"abc", b""]
+    with pytest.raises(FramingError):
+        framing.decode(b"\x00\x00\x00\x09")
+    framing = JsonFraming()
+    assert framing.decode(framing.encode({"a": [1]}) * 2) == [{"a": [1]}, {"a": [1]}]
+    with pytest.raises(FramingError):
+        JsonFraming().decode(LengthPrefixFraming().encode(b"{nope"))
+
+class TrickleSocket:
+    """Takes at most `budget` bytes per call, then would block."""
+    def __init__(self, budget):
+        self.budget = budget
+        self.data = b""
+
+    def send(self, data):
+        if not self.budget:
+            raise BlockingIOError
+        taken = bytes(data[:self.budget])
+        self.budget -= len(taken)
+        self.data += taken
+        return len(taken)
+
+    def sendmsg(self, buffers):
+        return self.send(b"".join(buffers))
+
+def test_outbound_queue_drops_oldest_but_not_a_partial_write():
+    q = OutboundQueue(max_bytes=10, policy=DROP_OLDEST)
+    sock = TrickleSocket(2)
+    assert q.push(b"aaaa") and not q.write(sock) # "aa" written, "aa" pending
+    assert q.push(b"bbbb") and q.push(b"cccc")
+    assert q.dropped == 0
+    assert q.push(b"dddd") # 14 bytes: "bbbb" goes, the started "aaaa" stays
+    assert q.dropped == 1 and q.nbytes == 10
+    sock.budget = 100
+    assert q.write(sock) and sock.data == b"aaaaccccdddd"
+    assert q.metrics()["queued_bytes"] == 0 and q.writes == 2
+
+def test_outbound_queue_coalesces_by_key():
+    q = OutboundQueue(max_messages=3, policy=COALESCE)
+    q.push(b"pos1=0", key="p1")
+    q.push(b"chat", key=None)
+    q.push(b"pos1=5", key="p1")
+    q.push(b"pos2=7", key="p2")
+    assert [f[0] for f in q.frames] == [b"pos1=5", b"chat", b"pos2=7"]
+    assert q.coalesced == 1 and q.dropped == 0
+    q.push(b"more")
+    assert [f[0] for f in q.frames] == [b"chat", b"pos2=7", b"more"] and q.dropped == 1
+    q.push(b"pos1=9", key="p1") # its queued entry was dropped: queued anew
+    assert q.frames[-1][0] == b"pos1=9" and q.coalesced == 1
+
+def test_outbound_queue_disconnect_policy():
+    q = OutboundQueue(max_messages=2, policy=DISCONNECT)
+    assert q.push(b"a") and q.push(b"b")
+    assert not q.push(b"c")
+    with pytest.raises(ValueError):
+        OutboundQueue(policy="block")
+
+class ChatServer(GameServer):
+    def __init__(self):
+        super().__init__(port=0, host="127.0.0.1")
+        self.events = []
+
+    def on_start(self):
+        self.events.append("start")
+
+    def on_connect(self, conn):
+        conn.data["name"] = f"p{conn.id}"
+        self.broadcast(f"{conn.data['name']} joined")
+
+    def on_message(self, conn, message):
+        if message == b"boom":
+            raise RuntimeError("bad hook")
+        if message == b"later":
+            self.call_later(0.05, self.broadcast, b"tick")
+            return
+        if message.startswith(b"@"): # @<conn id> text: only that client
+            target, text = message[1:].split(b" ", 1)
+            self.broadcast(text, to=[self.connections[int(target)]])
+            return
+        self.broadcast(conn.data["name"].encode() + b": " + message, exclude=conn)
+
+    def on_disconnect(self, conn):
+        self.events.append(f"left {conn.data['name']}")
+        self.broadcast(f"{conn.data['name']} left")
+
+    def on_stop(self):
+        self.events.append("stop")
+
+@pytest.fixture
+def chat():
+    server = ChatServer()
+    server.listen()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    clients = []
+
+    def connect():
+        s = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+        f = s.makefile("rb")
+        clients.append((s, f))
+        return s, f
+    yield server, connect
+    for s, f in clients:
+        f.close()
+        s.close()
+    server.call_threadsafe(server.stop)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+def test_broadcast_and_disconnect_hook(chat):
+    server, connect = chat
+    a, fa = connect()
+    assert fa.readline() == b"p1 joined\n"
+    b, fb = connect()
+    assert fa.readline() == b"p2 joined\n" and fb.readline() == b"p2 joined\n"
+    # Two messages in one segment, one split over two
+    a.sendall(b"hi\nthere\nhal")
+    a.sendall(b"f\n")
+    assert [fb.readline() for _ in range(3)] == [b"p1: hi\n", b"p1: there\n", b"p1: half\n"]
+    assert sorted(server.connections) == [1, 2]
+    fb.close()
+    b.close()
+    assert fa.readline() == b"p2 left\n"
+    assert wait_for(lambda: sorted(server.connections) == [1])
+    assert server.events == ["start", "left p2"]
+
+def test_broadcast_to_a_subset(chat):
+    server, connect = chat
+    (a, _), (_, fb), (_, fc) = connect(), connect(), connect()
+    assert wait_for(lambda: len(server.connections) == 3)
+    a.sendall(b"@2 secret\nhi\n")
+    assert fb.readline() == b"p2 joined\n" and fb.readline() == b"p3 joined\n"
+    assert fb.readline() == b"secret\n" and fb.readline() == b"p1: hi\n"
+    assert fc.readline() == b"p3 joined\n" and fc.readline() == b"p1: hi\n"
+
+def test_failing_hook_drops_only_that_client(chat):
+    server, connect = chat
+    a, fa = connect()
+    b, fb = connect()
+    fa.readline(); fa.readline(); fb.readline()
+    b.sendall(b"boom\n")
+    assert fb.readline() == b"" # dropped
+    a.sendall(b"later\n")
+    assert fa.readline() == b"tick\n"
+    assert list(server.connections) == [1]
+
+def test_oversized_line_drops_client(chat):
+    server, connect = chat
+    a, fa = connect()
+    fa.readline()
+    a.sendall(b"x" * (70 * 1024))
+    assert fa.readline() == b""
+    assert wait_for(lambda: not server.connections)
+
+def test_slow_reader_does_not_block_the_loop(chat):
+    server, connect = chat
+    slow, _ = connect()
+    fast, ffast = connect()
+    ffast.readline()
+    big = b"y" * 60000
+    for _ in range(200): # 12 MB the slow client never reads
+        server.call_threadsafe(server.send, server.connections[1], big)
+    fast.sendall(b"ping\n")
+    server.call_threadsafe(server.send, server.connections[2], b"still serving")
+    assert ffast.readline() == b"still serving\n"
+    # The slow client's queue stayed bounded: the oldest messages were dropped
+    queue = server.connections[1].outq
+    assert queue.nbytes <= server.max_queue_bytes + len(big) and queue.dropped > 100
+    metrics = server.metrics()
+    assert metrics["connections"] == 2 and metrics["dropped_messages"] == queue.dropped
+    assert metrics["max_queue_bytes"] == queue.nbytes
+
+def test_slow_consumer_disconnect_policy():
+    class Strict(GameServer):
+        slow_consumer = DISCONNECT
+        max_queue_bytes = 64 * 1024
+
+        def on_message(self, conn, message):
+            self.call_later(0, self.tick, 100)
+
+        def tick(self, left):
+            # Ten 10 KB messages every 5 ms; the loop writes between ticks
+            for _ in range(10):
+                self.broadcast(b"z" * 10000)
+            if left > 1:
+                self.call_later(0.005, self.tick, left - 1)
+
+    server = Strict(port=0, host="127.0.0.1")
+    server.listen()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        slow = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+        fast = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+        f = fast.makefile("rb")
+        assert wait_for(lambda: len(server.connections) == 2)
+        # Sender reads everything, so only the one that never reads falls behind
+        reader = threading.Thread(target=lambda: [f.readline() for _ in range(1000)])
+        reader.start()
+        fast.sendall(b"go\n")
+        reader.join(timeout=10)
+        assert wait_for(lambda: server.slow_disconnects == 1)
+        assert list(server.connections) == [2]
+        f.close()
+        fast.close()
+        slow.close()
+    finally:
+        server.call_threadsafe(server.stop)
+        thread.join(timeout=5)
+
+def test_tick_batches_writes_and_immediate_skips_the_wait():
+    class Ticked(GameServer):
+        tick_rate = 2 # 500 ms, so the batching is observable
+
+        def __init__(self):
+            super().__init__(port=0, host="127.0.0.1")
+            self.ticks = 0
+
+        def on_tick(self):
+            self.ticks += 1
+
+        def on_message(self, conn, message):
+            self.broadcast(message, immediate=message.startswith(b"!"))
+
+    server = Ticked()
+    server.listen()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        a = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+        b = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+        fb = b.makefile("rb")
+        assert wait_for(lambda: len(server.connections) == 2)
+        a.sendall(b"".join(b"m%d\n" % i for i in range(20)))
+        assert [fb.readline() for _ in range(20)] == [b"m%d\n" % i for i in range(20)]
+        queue = server.connections[2].outq
+        assert wait_for(lambda: queue.writes) and queue.writes == 1 # one tick, one write
+        start = time.monotonic()
+        a.sendall(b"!urgent\n")
+        assert fb.readline() == b"!urgent\n" and time.monotonic() - start < 0.4
+        assert server.ticks >= 1
+        for x in (fb, b, a):
+            x.close()
+    finally:
+        server.call_threadsafe(server.stop)
+        thread.join(timeout=5)
+
+def test_json_framing_speaks_lobby_wire_format():
+    class Adder(GameServer):
+        framing = JsonFraming
+
+        def on_message(self, conn, message):
+            conn.send({"sum": sum(message["values"])})
+
+    server = Adder(port=0, host="127.0.0.1")
+    server.listen()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        s = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+        utils.send_json(s, {"values": [1, 2, 3]})
+        assert utils.recv_json(s) == {"sum": 6}
+        s.close()
+    finally:
+        server.call_threadsafe(server.stop)
+        thread.join(timeout=5)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_udp_endpoint_over_a_lossy_reordering_link():
+    rng = random.Random(7)
+    clock = FakeClock()
+    # Retries to spare: at this loss rate some acks miss the 32-packet window
+    a, b = UdpEndpoint(max_retries=30, clock=clock), UdpEndpoint(clock=clock)
+    to_b, to_a = [], []
+    got_reliable, got_sequenced = [], []
+
+    def deliver(queue, endpoint, out):
+        rng.shuffle(queue) # reordered, 20% late by a round, 30% lost, both ways
+        late = []
+        for datagram in queue:
+            fate = rng.random()
+            if fate < 0.3:
+                continue
+            if fate < 0.5:
+                late.append(datagram)
+                continue
+            out.extend(endpoint.receive(datagram))
+        queue[:] = late
+
+    for i in range(200):
+        to_b.append(a.send(b"r%d" % i))
+        to_b.append(a.send(b"s%d" % i, reliable=False))
+        clock.now += 0.01
+        delivered = []
+        deliver(to_b, b, delivered)
+        for message, reliable in delivered:
+            (got_reliable if reliable else got_sequenced).append(message)
+        deliver(to_a, a, [])
+        to_b.extend(a.poll())
+        to_a.extend(b.poll())
+    for _ in range(300): # no new traffic: retransmits catch up
+        clock.now += 0.05
+        delivered = []
+        deliver(to_b, b, delivered)
+        got_reliable.extend(m for m, reliable in delivered if reliable)
+        deliver(to_a, a, [])
+        to_b.extend(a.poll())
+        to_a.extend(b.poll())
+
+    # Every reliable message exactly once, in order
+    assert got_reliable == [b"r%d" % i for i in range(200)]
+    assert a.retransmits > 0 and not a.unacked and not a.failed
+    # Sequenced: some lost, never a step back
+    numbers = [int(m[1:]) for m in got_sequenced]
+    assert numbers == sorted(set(numbers)) and 50 < len(numbers) < 200
+    assert b.stale > 0
+
+def test_udp_endpoint_gives_up_on_a_silent_peer():
+    clock = FakeClock()
+    a = UdpEndpoint(rto=0.1, max_retries=3, clock=clock)
+    a.send(b"hello?")
+    for _ in range(100):
+        clock.now += 0.1
+        a.poll()
+    assert a.failed and a.retransmits == 3
+
+class UdpEcho(GameServer):
+    udp = True
+
+    def __init__(self):
+        super().__init__(port=0, host="127.0.0.1")
+        self.peers = []
+
+    def on_connect(self, conn):
+        conn.send(conn.udp_token)
+
+    def on_udp_connect(self, peer):
+        self.peers.append(peer.addr)
+
+    def on_datagram(self, peer, message, reliable):
+        peer.send(b"echo " + message, reliable)
+
+def test_game_server_udp_transport():
+    server = UdpEcho()
+    server.listen()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    client = UdpClient("127.0.0.1", server.port)
+    # Same port number for both transports; the token comes over TCP
+    tcp = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+    tcp_file = tcp.makefile("rb")
+    try:
+        client.hello(tcp_file.readline().strip())
+        client.send(b"a")
+        client.send(b"b", reliable=False)
+        client.send("c")
+        got = []
+        deadline = time.time() + 5
+        while len(got) < 3 and time.time() < deadline:
+            got.extend(client.receive(0.05))
+        assert sorted(got) == [(b"echo a", True), (b"echo b", False), (b"echo c", True)]
+        assert [m for m, reliable in got if reliable] == [b"echo a", b"echo c"]
+        assert len(server.peers) == 1
+        assert wait_for(lambda: not client.endpoint.unacked)
+        # The UDP peer goes with its TCP connection
+        tcp_file.close()
+        tcp.close()
+        assert wait_for(lambda: not server.udp_peers)
+    finally:
+        tcp_file.close()
+        tcp.close()
+        client.close()
+        server.call_threadsafe(server.stop)
+        thread.join(timeout=5)
+
+def test_game_server_ignores_udp_without_a_hello():
+    server = UdpEcho()
+    server.udp_max_peers = 1
+    server.listen()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    flood = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(100)]
+    tcp = [socket.create_connection(("127.0.0.1", server.port), timeout=5) for _ in range(2)]
+    files = [s.makefile("rb") for s in tcp]
+    clients = [UdpClient("127.0.0.1", server.port) for _ in range(2)]
+    try:
+        # A flood from foreign addresses: garbage, data without a hello, hellos with a made-up token
+        for i, s in enumerate(flood):
+            datagram = [b"junk", UdpEndpoint().send(b"move 1 2"), UdpEndpoint().send(b"HELLO forged%d" % i)][i % 3]
+            s.sendto(datagram, ("127.0.0.1", server.port))
+        assert wait_for(lambda: server.udp_rejected == len(flood))
+        assert not server.udp_peers and not server.peers
+        # A real hello gets through, up to udp_max_peers
+        for client, f in zip(clients, files):
+            client.hello(f.readline().strip())
+            client.send(b"hi")
+        got = []
+        deadline = time.time() + 2
+        while not got and time.time() < deadline:
+            got = clients[0].receive(0.05)
+        assert got == [(b"echo hi", True)]
+        assert wait_for(lambda: server.udp_rejected > len(flood)) # the second client: over the cap
+        assert len(server.udp_peers) == 1
+    finally:
+        for f, s in zip(files, tcp):
+            f.close()
+            s.close()
+        for s in flood:
+            s.close()
+        for client in clients:
+            client.close()
+        server.call_threadsafe(server.stop)
+        thread.join(timeout=5)
+
+def test_udp_port_taken():
+    # Bind-zero: the OS picks a TCP port whose UDP number is taken; the server picks again
+    server = UdpEcho()
+    results = iter([False, True])
+    server._bind_udp = lambda: next(results)
+    server.listen()
+    assert server.port and not list(results)
+    server.listener.close()
+    # A fixed port whose UDP number is taken: TCP only instead of failing to start
+    blocker = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    blocker.bind(("127.0.0.1", 0))
+    server = UdpEcho()
+    server.port = blocker.getsockname()[1]
+    try:
+        server.listen()
+        assert server.udp_sock is None
+        assert server.listener.getsockname()[1] == blocker.getsockname()[1]
+    finally:
+        server.listener.close()
+        blocker.close()
+
+def test_udp_endpoint_bounds_its_reorder_buffer():
+    a, b = UdpEndpoint(), UdpEndpoint(reorder_window=8)
+    datagrams = [a.send(b"m%d" % i) for i in range(20)]
+    for datagram in datagrams[1:]:
+        assert b.receive(datagram) == []
+    assert sorted(b.reorder) == list(range(1, 8))
+    assert [m for m, _ in b.receive(datagrams[0])] == [b"m%d" % i for i in range(8)]
+
+UDP_GAME = """
+from shared.game_sdk import GameServer
+
+class Game(GameServer):
+    udp = True
+
+    def on_connect(self, conn):
+        conn.send(conn.udp_token)
+
+    def on_datagram(self, peer, message, reliable):
+        peer.send(b"pong", reliable)
+
+if __name__ == "__main__":
+    Game.main()
+"""
+
+@pytest.mark.skipif(os.name == 'nt', reason="readiness pipe needs pass_fds")
+def test_game_start_advertises_udp(tmp_path, monkeypatch):
+    game_dir = os.path.join(str(tmp_path), "server_data", "games", "udp")
+    os.makedirs(game_dir)
+    with open(os.path.join(game_dir, "server.py"), "w") as f:
+        f.write(UDP_GAME)
+    monkeypatch.chdir(tmp_path)
+    gm = GameManager(port_ranges=[(9821, 9830)], port_quarantine=0)
+    room_id = gm.create_room("host", "udp", {"transports": ["tcp", "udp"]})
+    try:
+        ok, info = gm.start_game(room_id, "host")
+        assert ok, info
+        assert info["transports"] == ["tcp", "udp"]
+        tcp = socket.create_connection(("127.0.0.1", info["port"]), timeout=5)
+        tcp_file = tcp.makefile("rb")
+        client = UdpClient("127.0.0.1", info["port"])
+        client.hello(tcp_file.readline().strip())
+        client.send(b"ping")
+        got = []
+        deadline = time.time() + 5
+        while not got and time.time() < deadline:
+            got = client.receive(0.05)
+        client.close()
+        tcp_file.close()
+        tcp.close()
+        assert got == [(b"pong", True)]
+        # A multi-room runner would host it: TCP only
+        assert gm._transports(gm.rooms[room_id], udp_bound=False) == ["tcp"]
+    finally:
+        gm.end_game(room_id)
+        gm.shutdown()
+
+@pytest.mark.skipif(os.name == 'nt', reason="readiness pipe needs pass_fds")
+def test_game_start_without_udp_port_advertises_tcp_only(tmp_path, monkeypatch):
+    game_dir = os.path.join(str(tmp_path), "server_data", "games", "udp")
+    os.makedirs(game_dir)
+    with open(os.path.join(game_dir, "server.py"), "w") as f:
+        f.write(UDP_GAME)
+    monkeypatch.chdir(tmp_path)
+    squatter = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    squatter.bind(("0.0.0.0", 9831)) # the only port's UDP side is taken
+    gm = GameManager(port_ranges=[(9831, 9832)], port_quarantine=0)
+    room_id = gm.create_room("host", "udp", {"transports": ["tcp", "udp"]})
+    try:
+        ok, info = gm.start_game(room_id, "host")
+        assert ok, info
+        assert info["port"] == 9831
+        assert info["transports"] == ["tcp"]
+        tcp = socket.create_connection(("127.0.0.1", 9831), timeout=5)
+        tcp.close()
+    finally:
+        gm.end_game(room_id)
+        gm.shutdown()
+        squatter.close()
+
+SCHEMA = Schema(x="f", y="f", hp="H", kind="B")
+
+def make_world(n):
+    return {i * 3: {"x": float(i), "y": 0.5, "hp": 100, "kind": i % 4} for i in range(n)}
+
+def test_snapshot_delta_round_trip():
+    history, decoder, client = SnapshotHistory(SCHEMA), SnapshotDecoder(SCHEMA), ClientBaseline()
+    world = make_world(50)
+    history.capture(world)
+    keyframe = history.encode_for(client)
+    assert HEADER.unpack_from(keyframe)[0] == KEYFRAME
+    seq, state = decoder.decode(keyframe)
+    assert state == world
+    client.ack(seq)
+
+    world[3]["x"] = 7.25          # one field
+    world[6].update(hp=1, kind=2)  # two fields
+    del world[9]
+    world[1000] = {"x": 1.0, "y": 2.0, "hp": 3, "kind": 0}
+    history.capture(world)
+    delta = history.encode_for(client)
+    assert HEADER.unpack_from(delta)[:3] == (DELTA, 2, 1)
+    assert len(delta) < 60 < len(keyframe) // 10
+    seq, state = decoder.decode(delta)
+    assert seq == 2 and state == world
+    client.ack(seq)
+    # Nothing changed: an empty delta
+    history.capture(world)
+    assert HEADER.unpack_from(history.encode_for(client))[3] == 0
+
+def test_snapshot_delta_against_an_older_ack_and_keyframes():
+    history = SnapshotHistory(SCHEMA, history=8, keyframe_interval=20)
+    decoder, client, other = SnapshotDecoder(SCHEMA), ClientBaseline(), ClientBaseline()
+    world = make_world(20)
+    history.capture(world)
+    client.ack(decoder.decode(history.encode_for(client))[0])
+    # Deltas 2..4 are lost; the client still acks only 1, so 5 is a delta against 1
+    for step in range(4):
+        world[0]["x"] += 1.0
+        world[3]["hp"] -= 1
+        history.capture(world)
+    data = history.encode_for(client)
+    assert HEADER.unpack_from(data)[:3] == (DELTA, 5, 1)
+    assert decoder.decode(data) == (5, world)
+    # Clients with the same baseline share the encoding
+    other.ack(1)
+    other.keyframe_seq = client.keyframe_seq
+    assert history.encode_for(other) is data
+    # An ack older than the kept history gets a keyframe
+    for _ in range(10):
+        history.capture(world)
+    assert HEADER.unpack_from(history.encode_for(client))[0] == KEYFRAME
+    # Unacked, so the next one is a keyframe again; then one per keyframe_interval
+    kinds = []
+    for _ in range(40):
+        history.capture(world)
+        data = history.encode_for(client)
+        kinds.append(HEADER.unpack_from(data)[0])
+        client.ack(decoder.decode(data)[0])
+    assert [i for i, kind in enumerate(kinds) if kind == KEYFRAME] == [0, 20]
+
+def test_sdk_import_does_not_load_numpy():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, shared.game_sdk, shared.game_sdk.outbound; print('numpy' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, timeout=30)
+    assert out.stdout.strip() == "False", out.stderr
+
+def test_interest_grid_tracks_windows_incrementally():
+    rng = random.Random(5)
+    grid = InterestGrid(cell=10, view_radius=15) # windows of 5x5 cells
+    entities = {k: (rng.uniform(-100, 100), rng.uniform(-100, 100)) for k in range(300)}
+    viewers = {v: (rng.uniform(-100, 100), rng.uniform(-100, 100)) for v in "abcd"}
+    seen = {v: set() for v in viewers}
+    for k, (x, y) in entities.items():
+        grid.set_entity(k, x, y)
+    for step in range(30):
+        for v in viewers:
+            if step % 3 == 0 or v not in grid.viewer_cells:
+                viewers[v] = (viewers[v][0] + rng.uniform(-12, 12), viewers[v][1] + rng.uniform(-12, 12))
+                grid.set_viewer(v, *viewers[v])
+        for k in rng.sample(sorted(entities), 60):
+            entities[k] = (entities[k][0] + rng.uniform(-6, 6), entities[k][1] + rng.uniform(-6, 6))
+            grid.set_entity(k, *entities[k])
+        removed = rng.choice(sorted(entities))
+        del entities[removed]
+        grid.remove_entity(removed)
+        # Replaying the changes gives the same sets as a scan over everything
+        for v, (entered, left) in grid.pop_changes().items():
+            assert not seen[v] & set(entered) and set(left) <= seen[v]
+            seen[v] = (seen[v] | set(entered)) - set(left)
+        for v, (vx, vy) in viewers.items():
+            cx, cy = grid.cell_of(vx, vy)
+            expected = {k for k, (x, y) in entities.items()
+                        if abs(grid.cell_of(x, y)[0] - cx) <= 2 and abs(grid.cell_of(x, y)[1] - cy) <= 2}
+            assert grid.relevant(v) == seen[v] == expected
+            assert all(v in grid.watchers(k) for k in expected)
+    assert grid.viewers_near(*viewers["a"]) >= {"a"}
+    grid.remove_viewer("a")
+    assert all("a" not in grid.watchers(k) for k in entities) and "a" not in grid.viewers_near(*viewers["a"])
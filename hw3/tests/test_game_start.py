@@ -0,0 +1,91 @@
+import sys
+import os
+import socket
+import threading
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.game_manager import GameManager
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason="readiness pipe needs pass_fds")
+
+# Listens on the port from argv after `delay` seconds, then serves until killed
+SLOW_SERVER = """
+import socket, sys, time
+time.sleep({delay})
+s = socket.socket()
+s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+s.bind(("0.0.0.0", int(sys.argv[1])))
+s.listen()
+while True:
+    c, _ = s.accept()
+    c.sendall(b"Welcome")
+    c.close()
+"""
+
+def make_game(tmp_path, monkeypatch, source):
+    game_dir = os.path.join(str(tmp_path), "server_data", "games", "g")
+    os.makedirs(game_dir)
+    with open(os.path.join(game_dir, "server.py"), "w") as f:
+        f.write(source)
+    monkeypatch.chdir(tmp_path)
+
+@pytest.mark.parametrize("bind_zero", [False, True])
+def test_start_returns_once_listening(tmp_path, monkeypatch, bind_zero):
+    make_game(tmp_path, monkeypatch, SLOW_SERVER.format(delay=0.5))
+    gm = GameManager(port_ranges=[(9930, 9940)], port_quarantine=0,
+                     bind_zero=bind_zero, advertise_ip="10.0.0.7")
+    room_id = gm.create_room("host", "g", {})
+    try:
+        ok, info = gm.start_game(room_id, "host")
+        assert ok, info
+        assert info["ip"] == "10.0.0.7" and info["transports"] == ["tcp"]
+        # No retry: the server must already be accepting
+        with socket.create_connection(("127.0.0.1", info["port"]), timeout=5) as s:
+            assert s.recv(64) == b"Welcome"
+        assert gm.rooms[room_id].status == "PLAYING"
+    finally:
+        gm.end_game(room_id)
+        gm.shutdown()
+
+def test_room_lock_is_free_while_starting(tmp_path, monkeypatch):
+    make_game(tmp_path, monkeypatch, SLOW_SERVER.format(delay=1.0))
+    gm = GameManager(port_ranges=[(9940, 9950)], port_quarantine=0)
+    room_id = gm.create_room("host", "g", {})
+    result = {}
+    starter = threading.Thread(target=lambda: result.update(r=gm.start_game(room_id, "host")))
+    starter.start()
+    try:
+        deadline = time.time() + 5
+        while gm.rooms[room_id].status != "STARTING" and time.time() < deadline:
+            time.sleep(0.01)
+        # Room operations answer immediately instead of waiting for the spawn
+        began = time.time()
+        assert gm.join_room(room_id, "late") == (False, "Game already started")
+        assert [r["status"] for r in gm.list_rooms()] == ["STARTING"]
+        assert time.time() - began < 0.5
+        # Closing the room mid-start kills the new server and fails the start
+        gm.end_game(room_id)
+        starter.join(10)
+        ok, msg = result["r"]
+        assert not ok and "closed" in msg
+        assert gm.ports.available() == 10
+    finally:
+        gm.shutdown()
+
+def test_start_fails_when_server_never_listens(tmp_path, monkeypatch):
+    make_game(tmp_path, monkeypatch, "import time\ntime.sleep(30)\n")
+    gm = GameManager(port_ranges=[(9950, 9951)], port_quarantine=0, ready_timeout=0.5)
+    room_id = gm.create_room("host", "g", {})
+    try:
+        ok, msg = gm.start_game(room_id, "host")
+        assert not ok and "listening" in msg
+        room = gm.rooms[room_id]
+        assert room.status == "WAITING" and room.port is None
+        assert gm.ports.available() == 1
+    finally:
+        gm.shutdown()
@@ -0,0 +1,226 @@
+import sys
+import os
+import json
+import shutil
+import signal
+import socket
+import subprocess
+import threading
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.db_manager import DBManager
+from server.game_manager import GameManager
+from server.handoff import AdoptedProcess, recv_handoff, send_handoff
+from shared.protocol import *
+import shared.utils as utils
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "pidfd_open"), reason="handoff needs pidfds (Linux)")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOBBY_PORT = 9839
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def gone(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] == "Z" # exited, parent has not reaped it
+    except OSError:
+        return True
+
+def connect(port):
+    s = socket.create_connection(("127.0.0.1", port), timeout=5)
+    return s, s.makefile("rb")
+
+def test_adopted_process_signals_and_reaps():
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    adopted = AdoptedProcess(process.pid)
+    assert adopted.poll() is None
+    with pytest.raises(subprocess.TimeoutExpired):
+        adopted.wait(timeout=0.1)
+    adopted.terminate()
+    assert adopted.wait(timeout=5) == -signal.SIGTERM # still our child: real status
+    assert AdoptedProcess(process.pid).poll() == -1   # gone: nothing to adopt
+
+def test_room_table_survives_handoff(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(str(tmp_path), "server_data", "games", "tmpl"))
+    monkeypatch.chdir(tmp_path)
+    old = GameManager(port_ranges=[(9840, 9850)], port_quarantine=0)
+    new = None
+    try:
+        solo = old.create_room("a", "tmpl", {"version": "1.0"})
+        multi = old.create_room("b", "tmpl", {"version": "1.0", "hosting": "multi_room"})
+        waiting = old.create_room("c", "tmpl", {"version": "1.0"})
+        old.join_room(waiting, "d")
+        ports = {}
+        for room_id, host in ((solo, "a"), (multi, "b")):
+            ok, info = old.start_game(room_id, host)
+            assert ok, info
+            ports[room_id] = info["port"]
+        games = {room_id: connect(port) for room_id, port in ports.items()}
+        for _, f in games.values():
+            assert f.readline() == b"Welcome to the Dummy Game Server!\n"
+        solo_pid = old.rooms[solo].process.pid
+
+        fds = []
+        state = json.loads(json.dumps(old.export_state(fds, {})))
+        ours, theirs = socket.socketpair()
+        sender = threading.Thread(target=send_handoff, args=(ours, state, fds))
+        sender.start()
+        state, received = recv_handoff(theirs)
+        sender.join()
+        for fd in fds:
+            os.close(fd) # the old lobby exits
+        ours.close()
+        theirs.close()
+
+        new = GameManager(port_ranges=[(9840, 9850)], port_quarantine=0)
+        new.adopt_state(state, received, {})
+        assert [r["id"] for r in new.list_rooms()] == [solo, multi, waiting]
+        assert new.rooms[waiting].players == ["c", "d"] and new.rooms[waiting].status == "WAITING"
+        assert new.list_rooms(status="PLAYING") == new.list_rooms()[:2]
+        assert all(new.ports.is_used(port) for port in ports.values())
+        assert new.create_room("e", "tmpl", {"version": "1.0"}) == "4"
+        assert new.rooms[solo].process.pid == solo_pid
+
+        # Players never noticed
+        for room_id, (s, f) in games.items():
+            s.sendall(b"still here\n")
+            assert f.readline() == b"Echo: still here\n"
+        assert "listening on" in new.game_output(solo)["output"]
+        for s, f in games.values():
+            f.close()
+            s.close()
+
+        # Matches are ended and recorded by the new lobby
+        new.end_game(solo)
+        assert wait_for(lambda: any(r["room_id"] == solo for r in new.match_history))
+        new.end_game(multi)
+        assert wait_for(lambda: any(r["room_id"] == multi for r in new.match_history))
+        assert not new.ports.is_used(ports[solo]) and not new.ports.is_used(ports[multi])
+    finally:
+        for gm in (old, new):
+            if gm is None:
+                continue
+            for room_id in list(gm.rooms):
+                gm.end_game(room_id)
+            for runner in gm.runners.runners():
+                runner.retire()
+            gm.shutdown()
+
+def test_failed_restart_resumes_serving(tmp_path, monkeypatch):
+    import server.server as lobby_server
+    monkeypatch.chdir(tmp_path)
+    def fail(*args, **kwargs):
+        raise RuntimeError("successor crashed")
+    monkeypatch.setattr(lobby_server, "start_successor", fail)
+    server = lobby_server.GameStoreServer(("127.0.0.1", 0), lobby_server.ThreadedTCPRequestHandler)
+    server.app_handler = lobby_server.build_handler(None)
+    room_id = server.app_handler.gm.create_room("a", "tmpl", {"version": "1.0"})
+    serving = threading.Thread(target=server.serve_forever)
+    serving.start()
+    client = socket.create_connection(server.server_address, timeout=5)
+    try:
+        assert len(request(client, CMD_ROOM_LIST)[FIELD_PAYLOAD]) == 1
+        old_handler = server.app_handler
+        lobby_server.restart(server, None)
+        serving.join(timeout=5)
+        assert not server.handed_over and server.app_handler is not old_handler
+        serving = threading.Thread(target=server.serve_forever)
+        serving.start()
+        # Same connection, same rooms, new rooms continue the numbering
+        assert [r["id"] for r in request(client, CMD_ROOM_LIST)[FIELD_PAYLOAD]] == [room_id]
+        assert server.app_handler.gm.create_room("b", "tmpl", {}) == str(int(room_id) + 1)
+    finally:
+        client.close()
+        server.shutdown()
+        serving.join(timeout=5)
+        server.server_close()
+        server.app_handler.matchmaker.stop()
+        server.app_handler.gm.shutdown()
+
+def request(sock, command, payload=None, token=None):
+    message = {FIELD_COMMAND: command, FIELD_PAYLOAD: payload or {}}
+    if token:
+        message[FIELD_TOKEN] = token
+    utils.send_json(sock, message)
+    return utils.recv_json(sock)
+
+def lobby_pid():
+    with open(os.path.join("server_data", "lobby.pid")) as f:
+        return int(f.read())
+
+def test_lobby_restart_keeps_connections_and_matches(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(str(tmp_path), "server_data", "games", "tmpl"))
+    monkeypatch.chdir(tmp_path)
+    db = DBManager(kdf_iterations=1000, hash_workers=1)
+    db.add_game_update("dev", {"game_id": "tmpl", "name": "Template", "version": "1.0"})
+    db.verifier.shutdown()
+
+    env = dict(os.environ, GAME_STORE_PORT=str(LOBBY_PORT), PYTHONPATH=ROOT)
+    log = open(os.path.join(str(tmp_path), "lobby.log"), "w")
+    first = subprocess.Popen([sys.executable, "-m", "server.server"],
+                             env=env, stdout=log, stderr=subprocess.STDOUT)
+    game_pid = None
+    try:
+        assert wait_for(lambda: os.path.exists(os.path.join("server_data", "lobby.pid")), 20)
+        lobby = socket.create_connection(("127.0.0.1", LOBBY_PORT), timeout=10)
+        assert request(lobby, CMD_PLAYER_REGISTER, {"username": "p", "password": "pw"})[FIELD_STATUS] == STATUS_OK
+        token = request(lobby, CMD_PLAYER_LOGIN, {"username": "p", "password": "pw"})[FIELD_TOKEN]
+        room_id = request(lobby, CMD_ROOM_CREATE, {"game_id": "tmpl"}, token)[FIELD_PAYLOAD]["room_id"]
+        started = request(lobby, CMD_GAME_START_NOTIFY, {"room_id": room_id}, token)
+        assert started[FIELD_STATUS] == STATUS_OK, started
+        game, game_file = connect(started[FIELD_PAYLOAD]["port"])
+        game_file.readline()
+        game_pid = request(lobby, CMD_ADMIN_RESOURCES)[FIELD_PAYLOAD]["rooms"][0]["pid"]
+
+        first.send_signal(signal.SIGUSR2)
+        assert first.wait(timeout=30) == 0
+        assert lobby_pid() != first.pid
+
+        # Same lobby connection, same token, same room; the match kept running
+        rooms = request(lobby, CMD_ROOM_LIST, {}, token)[FIELD_PAYLOAD]
+        assert [(r["id"], r["status"]) for r in rooms] == [(room_id, "PLAYING")]
+        game.sendall(b"hi\n")
+        assert game_file.readline() == b"Echo: hi\n"
+        assert request(lobby, CMD_ROOM_CREATE, {"game_id": "tmpl"}, token)[FIELD_STATUS] == STATUS_OK
+        # The user is still logged in on this connection, so a second login is refused
+        other = socket.create_connection(("127.0.0.1", LOBBY_PORT), timeout=10)
+        assert request(other, CMD_PLAYER_LOGIN, {"username": "p", "password": "pw"})[FIELD_MESSAGE] == "User already logged in"
+        other.close()
+
+        # Disconnect cleanup now happens in the new lobby: the host's match is stopped
+        game_file.close()
+        game.close()
+        lobby.close()
+        assert wait_for(lambda: gone(game_pid), 15)
+    finally:
+        log.close()
+        if first.poll() is None:
+            first.kill()
+            first.wait()
+        try:
+            pid = lobby_pid()
+            if pid != first.pid:
+                os.kill(pid, signal.SIGINT)
+                assert wait_for(lambda: gone(pid), 15)
+        except (OSError, ValueError):
+            pass
+        if game_pid is not None:
+            try:
+                os.kill(game_pid, signal.SIGKILL)
+            except OSError:
+                pass
@@ -0,0 +1,137 @@
+import sys
+import os
+import shutil
+import socket
+import threading
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.agent_registry import AgentRegistry
+from server.db_manager import DBManager
+from server.game_manager import GameManager
+from server.host_agent import HostAgent
+from server.request_handler import RequestHandler
+from server.server import GameStoreServer, ThreadedTCPRequestHandler
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason="readiness pipe needs pass_fds")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+@pytest.fixture
+def lobby(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(str(tmp_path), "server_data", "games", "tmpl"))
+    monkeypatch.chdir(tmp_path)
+    db = DBManager(os.path.join(str(tmp_path), "server_data"), kdf_iterations=1000, hash_workers=0)
+    db.add_game_update("dev", {"game_id": "tmpl", "name": "Template", "version": "1.0"})
+    gm = GameManager(port_ranges=[(9960, 9970)], port_quarantine=0, agents=AgentRegistry())
+    server = GameStoreServer(("127.0.0.1", 0), ThreadedTCPRequestHandler)
+    server.daemon_threads = True
+    server.app_handler = RequestHandler(db, gm)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield gm, server.server_address, db
+    server.shutdown()
+    server.server_close()
+    gm.shutdown()
+
+def start_agent(name, lobby_addr, ports, tmp_path):
+    agent = HostAgent(name, lobby_addr, listen_addr=("127.0.0.1", 0), advertise_host="127.0.0.1",
+                      data_dir=os.path.join(str(tmp_path), "agent_data"),
+                      port_ranges=[ports], heartbeat_interval=0.1, port_quarantine=0)
+    agent.start()
+    return agent
+
+def test_matches_spread_over_agents(lobby, tmp_path):
+    gm, lobby_addr, _ = lobby
+    agents = [start_agent("a1", lobby_addr, (9970, 9975), tmp_path),
+              start_agent("a2", lobby_addr, (9980, 9985), tmp_path)]
+    try:
+        assert wait_for(lambda: len(gm.agents) == 2)
+        rooms = []
+        for host in ("h1", "h2"):
+            room_id = gm.create_room(host, "tmpl", {"version": "1.0"})
+            ok, info = gm.start_game(room_id, host)
+            assert ok, info
+            rooms.append(room_id)
+            # Game files were fetched from the lobby; server is already listening
+            with socket.create_connection((info["ip"], info["port"]), timeout=5) as s:
+                assert s.recv(64).startswith(b"Welcome")
+        placed = {gm.rooms[r].agent.agent_id for r in rooms}
+        assert placed == {"a1", "a2"} # least-loaded agent gets the next match
+        assert not any(gm.ports.is_used(p) for p in range(9960, 9970))
+
+        # Lobby-initiated stop: the agent kills the match and reports the exit
+        gm.end_game(rooms[0])
+        assert wait_for(lambda: sum(len(a.gm.rooms) for a in agents) == 1)
+        assert wait_for(lambda: sum(len(a.rooms) for a in gm.agents.agents()) == 1)
+
+        # Losing an agent closes the rooms it was hosting
+        survivor = gm.rooms[rooms[1]].agent.agent_id
+        next(a for a in agents if a.agent_id == survivor).stop()
+        assert wait_for(lambda: rooms[1] not in gm.rooms)
+        assert [a.agent_id for a in gm.agents.agents()] != [survivor]
+    finally:
+        for agent in agents:
+            agent.stop()
+
+def test_match_exit_on_agent_closes_lobby_room(lobby, tmp_path):
+    gm, lobby_addr, _ = lobby
+    agent = start_agent("solo", lobby_addr, (9990, 9995), tmp_path)
+    try:
+        assert wait_for(lambda: len(gm.agents) == 1)
+        config = {"version": "1.0", "min_players": 2, "max_players": 2,
+                  "transports": ["tcp", "udp"], "limits": {"open_files": 256}}
+        room_id = gm.create_room("h", "tmpl", config)
+        gm.join_room(room_id, "p2")
+        ok, info = gm.start_game(room_id, "h")
+        assert ok, info
+        # The agent's room has the lobby's config and players, like a local start
+        local_room = next(iter(agent.gm.rooms.values()))
+        assert local_room.game_config == config and local_room.players == ["h", "p2"]
+        # The template server never binds UDP, so the agent does not offer it
+        assert info["transports"] == ["tcp"]
+        # The game server exits on its own (crash / match over)
+        local_room.process.kill()
+        assert wait_for(lambda: room_id not in gm.rooms)
+        record = gm.match_history[-1]
+        assert record["room_id"] == room_id and record["exit_code"] == -9
+        assert gm.agents.agents()[0].rooms == set()
+    finally:
+        agent.stop()
+
+def test_new_version_leaves_running_matches_files_alone(lobby, tmp_path):
+    gm, lobby_addr, db = lobby
+    agent = start_agent("upd", lobby_addr, (9995, 9999), tmp_path)
+    try:
+        assert wait_for(lambda: len(gm.agents) == 1)
+        old_room = gm.create_room("h1", "tmpl", {"version": "1.0"})
+        assert gm.start_game(old_room, "h1")[0]
+        db.add_game_update("dev", {"game_id": "tmpl", "name": "Template", "version": "2.0"})
+        new_room = gm.create_room("h2", "tmpl", {"version": "2.0"})
+        assert gm.start_game(new_room, "h2")[0]
+        # Both versions are installed side by side while the 1.0 match runs
+        assert sorted(os.listdir(agent.games_dir)) == ["tmpl@1.0", "tmpl@2.0"]
+        assert sorted(r.game_id for r in agent.gm.rooms.values()) == ["tmpl@1.0", "tmpl@2.0"]
+        gm.end_game(old_room)
+        assert wait_for(lambda: os.listdir(agent.games_dir) == ["tmpl@2.0"])
+    finally:
+        agent.stop()
+
+def test_unauthorized_agent_is_refused(lobby, tmp_path):
+    gm, lobby_addr, _ = lobby
+    gm.agents.key = "secret"
+    with pytest.raises(RuntimeError):
+        start_agent("intruder", lobby_addr, (9995, 9999), tmp_path)
+    assert len(gm.agents) == 0
@@ -0,0 +1,160 @@
+import sys
+import os
+import shutil
+import socket
+import threading
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.game_manager import GameManager
+from server.matchmaker import Matchmaker
+from shared.protocol import *
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GAME = {"game_id": "g", "version": "1.0", "min_players": 2, "max_players": 3}
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+class Notifications:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.messages = {}
+
+    def __call__(self, username, message):
+        with self.lock:
+            self.messages[username] = message
+
+def test_forms_full_rooms_in_queue_order():
+    mm = Matchmaker(None, Notifications(), fill_wait=5.0)
+    for i in range(7):
+        assert mm.enqueue(f"p{i}", GAME) == (True, i + 1)
+    batches = mm.form_matches()
+    assert [players for _, players in batches] == [["p0", "p1", "p2"], ["p3", "p4", "p5"]]
+    # p6 alone is below min_players, and waits regardless of fill_wait
+    assert mm.form_matches(now=time.monotonic() + 60) == []
+    assert mm.queued() == 1
+
+def test_partial_room_after_fill_wait():
+    mm = Matchmaker(None, Notifications(), fill_wait=5.0)
+    mm.enqueue("a", GAME)
+    mm.enqueue("b", GAME)
+    assert mm.form_matches() == [] # min_players reached, but still hoping to fill the room
+    [(game, players)] = mm.form_matches(now=time.monotonic() + 5)
+    assert game is GAME and players == ["a", "b"]
+    assert mm.queued() == 0 and mm.queued(("g", "1.0")) == 0
+
+def test_queues_are_per_game_version():
+    mm = Matchmaker(None, Notifications(), fill_wait=0)
+    mm.enqueue("a", GAME)
+    mm.enqueue("b", dict(GAME, version="2.0"))
+    assert mm.form_matches() == []
+    assert mm.queued(("g", "1.0")) == 1 and mm.queued(("g", "2.0")) == 1
+
+def test_cancel_and_duplicate_enqueue():
+    mm = Matchmaker(None, Notifications(), fill_wait=0)
+    assert mm.enqueue("a", GAME)[0]
+    assert mm.enqueue("a", dict(GAME, game_id="other")) == (False, "Already in the match queue")
+    mm.enqueue("b", GAME)
+    mm.enqueue("c", GAME)
+    assert mm.cancel("b") and not mm.cancel("b")
+    [(_, players)] = mm.form_matches()
+    assert players == ["a", "c"]
+    assert mm.enqueue("a", GAME)[0] # matched players may queue again
+
+def test_bad_player_limits_do_not_stop_matchmaking():
+    assert Matchmaker.player_limits({"min_players": "two", "max_players": "four"}) == (1, 1)
+    assert Matchmaker.player_limits({"min_players": 2, "max_players": [3]}) == (2, 2)
+    assert Matchmaker.player_limits({"min_players": "2", "max_players": True}) == (2, 2)
+    mm = Matchmaker(None, Notifications(), fill_wait=0)
+    mm.enqueue("a", dict(GAME, game_id="typo", min_players="one", max_players="four"))
+    mm.enqueue("b", GAME)
+    mm.enqueue("c", GAME)
+    mm._games[("g", "1.0")] = None # a queue whose matching blows up
+    batches = mm.form_matches()
+    assert [players for _, players in batches] == [["a"]] and mm.queued() == 2
+
+def test_room_player_limits():
+    gm = GameManager()
+    room_id = gm.create_room("h", "g", GAME)
+    assert gm.start_game(room_id, "h") == (False, "Need at least 2 players")
+    assert gm.join_room(room_id, "h") == (False, "Already in room")
+    assert gm.join_room(room_id, "a")[0] and gm.join_room(room_id, "b")[0]
+    assert gm.join_room(room_id, "c") == (False, "Room is full")
+    gm.shutdown()
+
+@pytest.mark.skipif(os.name == 'nt', reason="readiness pipe needs pass_fds")
+def test_matched_players_get_game_start(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(str(tmp_path), "server_data", "games", "g"))
+    monkeypatch.chdir(tmp_path)
+    gm = GameManager(port_ranges=[(9940, 9950)], port_quarantine=0)
+    notes = Notifications()
+    mm = Matchmaker(gm, notes, tick_interval=0.05, fill_wait=0.2)
+    try:
+        for name in ("a", "b"):
+            mm.enqueue(name, GAME)
+        assert wait_for(lambda: len(notes.messages) == 2)
+        a, b = notes.messages["a"], notes.messages["b"]
+        assert a == b and a[FIELD_COMMAND] == "GAME_START"
+        room = gm.rooms[a[FIELD_PAYLOAD]["room_id"]]
+        assert room.host == "a" and room.players == ["a", "b"] and room.status == "PLAYING"
+        with socket.create_connection(("127.0.0.1", a[FIELD_PAYLOAD]["port"]), timeout=5) as s:
+            assert s.recv(64).startswith(b"Welcome")
+        assert mm.matches_formed == 1 and mm.queued() == 0
+        gm.end_game(room.room_id)
+    finally:
+        mm.stop()
+        gm.shutdown()
+
+def test_failed_start_notifies_and_closes_room(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # no game files: the start fails
+    gm = GameManager(port_ranges=[(9950, 9955)], port_quarantine=0)
+    notes = Notifications()
+    mm = Matchmaker(gm, notes)
+    try:
+        assert not mm.start_match(GAME, ["a", "b"])
+        assert {m[FIELD_COMMAND] for m in notes.messages.values()} == {"MATCH_FAILED"}
+        assert gm.rooms == {}
+    finally:
+        mm.stop()
+        gm.shutdown()
+
+@pytest.mark.skipif(os.name == 'nt', reason="readiness pipe needs pass_fds")
+def test_players_who_cannot_join_are_left_out(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(str(tmp_path), "server_data", "games", "g"))
+    monkeypatch.chdir(tmp_path)
+    gm = GameManager(port_ranges=[(9955, 9960)], port_quarantine=0)
+    join_room = gm.join_room
+    gm.join_room = lambda room_id, player: (False, "Player left") if player == "gone" else join_room(room_id, player)
+    notes = Notifications()
+    mm = Matchmaker(gm, notes)
+    try:
+        # Enough players joined: the match starts without the one who could not
+        assert mm.start_match(GAME, ["a", "gone", "b"])
+        assert notes.messages["gone"] == {FIELD_COMMAND: "MATCH_FAILED", FIELD_MESSAGE: "Player left"}
+        start = notes.messages["a"][FIELD_PAYLOAD]
+        assert notes.messages["b"][FIELD_COMMAND] == "GAME_START"
+        assert gm.rooms[start["room_id"]].players == ["a", "b"]
+        gm.end_game(start["room_id"])
+        # Too few joined: no room, and the others are first in the queue again
+        notes.messages.clear()
+        mm.enqueue("c", GAME)
+        assert not mm.start_match(GAME, ["d", "gone"])
+        assert set(notes.messages) == {"gone"} and gm.rooms == {}
+        [(_, players)] = mm.form_matches(now=time.monotonic() + 60)
+        assert players == ["d", "c"]
+    finally:
+        mm.stop()
+        gm.shutdown()
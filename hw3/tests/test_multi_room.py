@@ -0,0 +1,134 @@
+import sys
+import os
+import json
+import socket
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.game_manager import GameManager
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason="runner report pipe needs pass_fds")
+
+# Echoes; "end" finishes the match, "boom" raises inside the callback
+ROOMS = """
+class GameRoom:
+    def __init__(self, room):
+        self.room = room
+
+    def on_connect(self, client):
+        client.send(f"room {self.room.room_id} players {','.join(self.room.players)}\\n".encode())
+
+    def on_data(self, client, data):
+        if data.startswith(b"end"):
+            self.room.end()
+        elif data.startswith(b"boom"):
+            raise ValueError("boom")
+        else:
+            self.room.broadcast(b"echo " + data)
+"""
+
+CONFIG = {"game_id": "mr", "version": "1.0", "hosting": "multi_room"}
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+@pytest.fixture
+def gm(tmp_path, monkeypatch):
+    game_dir = os.path.join(str(tmp_path), "server_data", "games", "mr")
+    os.makedirs(game_dir)
+    with open(os.path.join(game_dir, "rooms.py"), "w") as f:
+        f.write(ROOMS)
+    with open(os.path.join(game_dir, "config.json"), "w") as f:
+        json.dump(CONFIG, f)
+    monkeypatch.chdir(tmp_path)
+    manager = GameManager(port_ranges=[(9870, 9880)], port_quarantine=0, runner_idle_timeout=0.2)
+    yield manager
+    for room_id in list(manager.rooms):
+        manager.end_game(room_id)
+    for runner in manager.runners.runners():
+        runner.retire()
+    manager.shutdown()
+
+def start(gm, host, *players):
+    room_id = gm.create_room(host, "mr", dict(CONFIG))
+    for player in players:
+        gm.join_room(room_id, player)
+    ok, info = gm.start_game(room_id, host)
+    assert ok, info
+    return room_id, info["port"]
+
+def connect(port):
+    s = socket.create_connection(("127.0.0.1", port), timeout=5)
+    return s, s.makefile("rb")
+
+def test_matches_share_one_runner(gm):
+    (r1, p1), (r2, p2) = start(gm, "a", "b"), start(gm, "c")
+    assert gm.rooms[r1].process.pid == gm.rooms[r2].process.pid
+    [runner] = gm.runners.runners()
+    assert runner.room_ids() == sorted([r1, r2])
+
+    s1, f1 = connect(p1)
+    s2, f2 = connect(p2)
+    assert f1.readline() == f"room {r1} players a,b\n".encode()
+    assert f2.readline() == f"room {r2} players c\n".encode()
+    s1.sendall(b"hi\n")
+    assert f1.readline() == b"echo hi\n"
+    s1.close()
+    s2.close()
+
+    # Lobby-side end: only that room closes and the exit is recorded
+    gm.end_game(r1)
+    assert wait_for(lambda: runner.room_ids() == [r2])
+    assert wait_for(lambda: gm.match_history and gm.match_history[-1]["room_id"] == r1)
+    assert gm.resource_report()["runners"][0]["rooms"] == [r2]
+
+def test_room_ends_itself_or_fails_alone(gm):
+    (r1, p1), (r2, p2) = start(gm, "a"), start(gm, "b")
+    s1, f1 = connect(p1)
+    f1.readline()
+    s1.sendall(b"end\n")
+    assert wait_for(lambda: r1 not in gm.rooms)
+    assert gm.match_history[-1]["exit_code"] == 0
+    assert not gm.ports.is_used(p1)
+
+    s2, f2 = connect(p2)
+    f2.readline()
+    s2.sendall(b"boom\n")
+    assert wait_for(lambda: r2 not in gm.rooms)
+    assert gm.match_history[-1]["exit_code"] == 1
+    s1.close()
+    s2.close()
+
+def test_runner_crash_closes_its_rooms_and_idle_runner_exits(gm):
+    r1, _ = start(gm, "a")
+    runner = gm.runners.runners()[0]
+    runner.process.kill()
+    assert wait_for(lambda: r1 not in gm.rooms)
+    assert gm.match_history[-1]["exit_code"] == -1
+
+    # A fresh runner is spawned for the next match, and exits once idle
+    r2, _ = start(gm, "b")
+    fresh = gm.rooms[r2].process.runner
+    assert fresh is not runner
+    gm.end_game(r2)
+    assert wait_for(lambda: gm.runners.runners() == [])
+    assert fresh.process.wait(timeout=5) == 0
+
+def test_invalidate_drains_runner(gm):
+    r1, _ = start(gm, "a")
+    runner = gm.rooms[r1].process.runner
+    gm.invalidate_game("mr")
+    assert runner.process.poll() is None # keeps hosting the running match
+    r2, _ = start(gm, "b")
+    assert gm.rooms[r2].process.runner is not runner
+    gm.end_game(r1)
+    assert runner.process.wait(timeout=5) == 0
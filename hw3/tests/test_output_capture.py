@@ -0,0 +1,122 @@
+import sys
+import os
+import shutil
+import subprocess
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.game_manager import GameManager
+from server.output_capture import OutputCapture, RingBuffer, SpillFile
+from server.request_handler import RequestHandler
+from shared.protocol import *
+
+posix_only = pytest.mark.skipif(os.name == 'nt', reason="output pipes need a selectable pipe")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_ring_buffer_keeps_newest_bytes():
+    ring = RingBuffer(8)
+    ring.write(b"abcdef")
+    ring.write(b"ghij")
+    assert ring.tail() == b"cdefghij" and ring.dropped == 2 and ring.total == 10
+    ring.write(b"0123456789")
+    assert ring.tail() == b"23456789" and ring.dropped == 12
+    assert ring.tail(3) == b"789"
+
+def test_spill_file_rotates(tmp_path):
+    path = os.path.join(str(tmp_path), "room.log")
+    spill = SpillFile(path, max_bytes=10, backups=2)
+    for chunk in (b"aaaaaaaa", b"bbbbbbbb", b"cccccccc", b"dddddddd"):
+        spill.write(chunk)
+    spill.close()
+    with open(path, "rb") as f:
+        assert f.read() == b"dddddddd"
+    with open(path + ".1", "rb") as f:
+        assert f.read() == b"cccccccc"
+    with open(path + ".2", "rb") as f:
+        assert f.read() == b"bbbbbbbb"
+    assert not os.path.exists(path + ".3")
+
+def spawn_writer(code):
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen([sys.executable, "-c", code], stdout=write_fd, stderr=subprocess.STDOUT)
+    os.close(write_fd)
+    return process, read_fd
+
+@posix_only
+def test_noisy_stream_is_bounded_and_quiet_one_intact(tmp_path):
+    capture = OutputCapture(buffer_bytes=4096, spill_dir=str(tmp_path), spill_bytes=64 * 1024)
+    noisy, noisy_fd = spawn_writer("import sys\nfor i in range(20000): print('x' * 50, i)")
+    quiet, quiet_fd = spawn_writer("import sys, time\nprint('hello'); sys.stdout.flush(); time.sleep(0.5)\n"
+                                   "print('bye', file=sys.stderr)")
+    try:
+        capture.attach("1", "noisy", noisy_fd)
+        capture.attach("2", "quiet", quiet_fd)
+        # The noisy writer is never blocked on a full pipe: it runs to completion
+        assert noisy.wait(timeout=20) == 0
+        assert quiet.wait(timeout=10) == 0
+        assert wait_for(lambda: not any(s["running"] for s in capture.streams()))
+        out = capture.read("1")
+        assert out["total_bytes"] > 1_000_000 and len(out["output"]) == 4096
+        assert out["dropped_bytes"] == out["total_bytes"] - 4096
+        assert out["output"].endswith(" 19999\n")
+        assert capture.read("2")["output"] == "hello\nbye\n"
+        # Spilled to disk, rotated
+        assert os.path.getsize(os.path.join(str(tmp_path), "noisy-1.log")) <= 64 * 1024
+        assert os.path.exists(os.path.join(str(tmp_path), "noisy-1.log.1"))
+    finally:
+        capture.stop()
+
+@posix_only
+def test_game_output_per_room_and_admin_command(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(str(tmp_path), "server_data", "games", "tmpl"))
+    monkeypatch.chdir(tmp_path)
+    gm = GameManager(port_ranges=[(9880, 9890)], port_quarantine=0)
+    handler = RequestHandler(None, gm)
+    try:
+        rooms = []
+        for config in ({"version": "1.0"}, {"version": "1.0", "hosting": "multi_room"}):
+            room_id = gm.create_room("h", "tmpl", config)
+            ok, info = gm.start_game(room_id, "h")
+            assert ok, info
+            rooms.append((room_id, info["port"]))
+
+        (solo, solo_port), (multi, _) = rooms
+        assert wait_for(lambda: f"listening on {solo_port}" in gm.game_output(solo)["output"])
+        assert gm.game_output(multi)["stream_id"] == "runner:tmpl@1.0"
+
+        class Loopback:
+            def getpeername(self):
+                return ("127.0.0.1", 50000)
+
+        resp = handler.handle_request({FIELD_COMMAND: CMD_ADMIN_GAME_OUTPUT,
+                                       FIELD_PAYLOAD: {"room_id": solo, "tail": 10}}, Loopback())
+        assert resp[FIELD_STATUS] == STATUS_OK and len(resp[FIELD_PAYLOAD]["output"]) <= 10
+        resp = handler.handle_request({FIELD_COMMAND: CMD_ADMIN_GAME_OUTPUT}, Loopback())
+        assert {s["stream_id"] for s in resp[FIELD_PAYLOAD]} == {solo, "runner:tmpl@1.0"}
+
+        # Kept after the match ends, for post-mortems
+        gm.end_game(solo)
+        assert wait_for(lambda: not gm.game_output(solo)["running"])
+        assert f"listening on {solo_port}" in gm.game_output(solo)["output"]
+        gm.end_game(multi)
+    finally:
+        for room_id in list(gm.rooms):
+            gm.end_game(room_id)
+        for runner in gm.runners.runners():
+            runner.retire()
+        handler.matchmaker.stop()
+        gm.shutdown()
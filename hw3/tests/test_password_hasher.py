@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.db_manager import DBManager
+from server.password_hasher import hash_password, verify_password
+
+def test_hash_roundtrip():
+    encoded = hash_password("secret", iterations=1000)
+    assert encoded.startswith("pbkdf2_sha256$1000$")
+    assert verify_password("secret", encoded)
+    assert not verify_password("Secret", encoded)
+    assert encoded != hash_password("secret", iterations=1000) # salted
+
+def test_register_stores_hash_only(tmp_path):
+    db = DBManager(str(tmp_path), kdf_iterations=1000, hash_workers=0)
+    assert db.register_user("players", "p1", "pw")
+    assert not db.register_user("players", "p1", "pw")
+    record = db.users["players"]["p1"]
+    assert "password" not in record
+    assert db.validate_user("players", "p1", "pw")
+    assert not db.validate_user("players", "p1", "wrong")
+    assert not db.validate_user("players", "nobody", "pw")
+
+def test_register_rejects_non_string_credentials(tmp_path):
+    db = DBManager(str(tmp_path), kdf_iterations=1000, hash_workers=0)
+    for username, password in (("p1", None), ("p1", 123), ("p1", ["pw"]), ("p1", ""), (["p1"], "pw"), ("", "pw")):
+        assert not db.register_user("players", username, password)
+    assert db.users["players"] == {}
+
+def test_plaintext_record_is_migrated_on_login(tmp_path):
+    users = {"developers": {"dev": {"password": "123", "games": []}}, "players": {}}
+    with open(os.path.join(str(tmp_path), "users.json"), "w") as f:
+        json.dump(users, f)
+
+    db = DBManager(str(tmp_path), kdf_iterations=1000, hash_workers=0)
+    assert not db.validate_user("developers", "dev", "12")
+    assert "password" in db.users["developers"]["dev"]
+    assert db.validate_user("developers", "dev", "123")
+
+    with open(os.path.join(str(tmp_path), "users.json")) as f:
+        saved = json.load(f)["developers"]["dev"]
+    assert "password" not in saved
+    assert verify_password("123", saved["password_hash"])
+    assert db.validate_user("developers", "dev", "123")
+
+def test_process_pool_verification(tmp_path):
+    db = DBManager(str(tmp_path), kdf_iterations=1000, hash_workers=1)
+    try:
+        assert db.register_user("players", "p1", "pw")
+        assert db.validate_user("players", "p1", "pw")
+        assert not db.validate_user("players", "p1", "nope")
+    finally:
+        db.verifier.shutdown()
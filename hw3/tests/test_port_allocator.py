@@ -0,0 +1,59 @@
+import sys
+import os
+import shutil
+import socket
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.game_manager import GameManager
+from server.port_allocator import PortAllocator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_allocate_release_and_quarantine():
+    ports = PortAllocator([(9000, 9002), (9500, 9501)], quarantine=60)
+    got = [ports.allocate() for _ in range(3)]
+    assert got == [9000, 9001, 9500]
+    assert ports.allocate() is None
+
+    ports.release(9001)
+    ports.release(9001)   # double release is ignored
+    ports.release(12345)  # unmanaged port is ignored
+    assert ports.allocate() is None # still quarantined
+    assert not ports.is_used(9001)
+
+    ports.quarantine = 0
+    assert ports.allocate() == 9001
+    assert ports.available() == 0
+
+def test_reserve_specific_port():
+    ports = PortAllocator([(9000, 9003)], quarantine=0)
+    assert ports.reserve(9001)
+    assert not ports.reserve(9001)
+    assert [ports.allocate(), ports.allocate(), ports.allocate()] == [9000, 9002, None]
+
+def test_probe_skips_ports_in_use():
+    with socket.socket() as holder:
+        holder.bind(('0.0.0.0', 0))
+        busy = holder.getsockname()[1]
+        ports = PortAllocator([(busy, busy + 1)], quarantine=60, probe=True)
+        assert ports.allocate() is None
+
+@pytest.mark.skipif(os.name == 'nt', reason="bind-zero mode needs pass_fds")
+def test_bind_zero_start(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(str(tmp_path), "server_data", "games", "tmpl"))
+    monkeypatch.chdir(tmp_path)
+    gm = GameManager(bind_zero=True)
+    room_id = gm.create_room("host", "tmpl", {})
+    ok, info = gm.start_game(room_id, "host")
+    try:
+        assert ok, info
+        assert info["port"] > 0
+        with socket.create_connection(("127.0.0.1", info["port"]), timeout=5) as s:
+            assert s.recv(64).startswith(b"Welcome")
+    finally:
+        gm.end_game(room_id)
@@ -0,0 +1,69 @@
+import sys
+import os
+import time
+import subprocess
+import threading
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.game_manager import GameManager
+from server.process_reaper import ProcessReaper
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def run_reaper(use_pidfd):
+    exits = []
+    done = threading.Event()
+
+    def on_exit(key, process, returncode):
+        exits.append((key, returncode))
+        if len(exits) == 2:
+            done.set()
+
+    reaper = ProcessReaper(on_exit, poll_interval=0.05)
+    reaper.use_pidfd = reaper.use_pidfd and use_pidfd
+    try:
+        fast = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+        slow = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.3)"])
+        reaper.watch("fast", fast)
+        reaper.watch("slow", slow)
+        assert done.wait(5)
+        assert sorted(exits) == [("fast", 3), ("slow", 0)]
+        assert reaper.watched() == {}
+    finally:
+        reaper.stop()
+
+def test_reaper_with_pidfd_or_fallback():
+    run_reaper(use_pidfd=True)
+
+def test_reaper_polling_fallback():
+    run_reaper(use_pidfd=False)
+
+def test_finished_match_frees_room_and_port(tmp_path, monkeypatch):
+    game_dir = os.path.join(str(tmp_path), "server_data", "games", "quick")
+    os.makedirs(game_dir)
+    with open(os.path.join(game_dir, "server.py"), "w") as f:
+        # start_game waits for listen(), so the match has to open its port
+        f.write("import socket, sys, time\ns = socket.socket()\ns.bind(('0.0.0.0', int(sys.argv[1])))\n"
+                "s.listen()\ntime.sleep(0.2)\nsys.exit(0)\n")
+    monkeypatch.chdir(tmp_path)
+
+    gm = GameManager(port_ranges=[(9900, 9901)], port_quarantine=0)
+    try:
+        room_id = gm.create_room("host", "quick", {})
+        ok, info = gm.start_game(room_id, "host")
+        assert ok, info
+        assert wait_for(lambda: room_id not in gm.rooms)
+        assert gm.ports.available() == 1
+        record = gm.match_history[-1]
+        assert record["room_id"] == room_id and record["exit_code"] == 0
+        assert record["duration"] >= 0.2
+    finally:
+        gm.shutdown()
@@ -0,0 +1,155 @@
+import sys
+import os
+import json
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.game_manager import GameManager, Room
+from server.request_handler import RequestHandler
+from server.resource_monitor import read_proc_usage
+from shared.protocol import *
+
+linux_only = pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="needs /proc and rlimits")
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+# Writes the limits it runs under, burns some CPU, then serves until killed
+LIMITS_SERVER = """
+import json, os, resource, socket, sys, time
+with open("limits.json", "w") as f:
+    json.dump({
+        "as": resource.getrlimit(resource.RLIMIT_AS)[0],
+        "nofile": resource.getrlimit(resource.RLIMIT_NOFILE)[0],
+        "nice": os.nice(0),
+    }, f)
+end = time.process_time() + 0.3
+while time.process_time() < end:
+    pass
+s = socket.socket()
+s.bind(("0.0.0.0", int(sys.argv[1])))
+s.listen()
+time.sleep(30)
+"""
+
+def make_game(tmp_path, monkeypatch):
+    game_dir = os.path.join(str(tmp_path), "server_data", "games", "g")
+    os.makedirs(game_dir)
+    with open(os.path.join(game_dir, "server.py"), "w") as f:
+        f.write(LIMITS_SERVER)
+    monkeypatch.chdir(tmp_path)
+    return game_dir
+
+def test_game_config_only_tightens_limits():
+    gm = GameManager(limits={"memory_mb": 512, "cpu_seconds": None, "open_files": 256, "nice": 5})
+    room = Room("1", "h", "g", {"limits": {"memory_mb": 4096, "cpu_seconds": 60,
+                                           "open_files": 32, "nice": 0, "bogus": 1}})
+    assert gm._match_limits(room) == {"memory_mb": 512, "cpu_seconds": 60, "open_files": 32, "nice": 5}
+    gm.shutdown()
+
+@linux_only
+def test_limits_applied_and_usage_sampled(tmp_path, monkeypatch):
+    game_dir = make_game(tmp_path, monkeypatch)
+    gm = GameManager(port_ranges=[(9920, 9930)], port_quarantine=0, resource_interval=0.1,
+                     limits={"memory_mb": 512, "open_files": 64, "nice": 3})
+    room_id = gm.create_room("host", "g", {"limits": {"open_files": 48}})
+    try:
+        ok, info = gm.start_game(room_id, "host")
+        assert ok, info
+        with open(os.path.join(game_dir, "limits.json")) as f:
+            applied = json.load(f)
+        assert applied["as"] == 512 * 1024 * 1024
+        assert applied["nofile"] == 48
+        assert applied["nice"] >= 3
+
+        report = gm.resource_report()
+        [usage] = report["rooms"]
+        assert usage["room_id"] == room_id and usage["cpu_seconds"] >= 0.25
+        assert usage["rss_bytes"] > 0 and usage["limits"]["open_files"] == 48
+        assert report["games"]["g"]["running"] == 1
+    finally:
+        gm.end_game(room_id)
+    deadline = time.time() + 5
+    while gm.monitor.report()["rooms"] and time.time() < deadline:
+        time.sleep(0.02)
+    totals = gm.resource_report()["games"]["g"]
+    assert totals["matches"] == 1 and totals["cpu_seconds"] >= 0.25
+    assert gm.match_history[-1]["peak_rss_bytes"] > 0
+    gm.shutdown()
+
+PRELOAD_PROBE = """
+import json, os, resource
+with open("preload_limits.json", "w") as f:
+    json.dump({"nofile": resource.getrlimit(resource.RLIMIT_NOFILE)[0], "nice": os.nice(0)}, f)
+"""
+
+@linux_only
+def test_pooled_worker_preloads_under_limits(tmp_path, monkeypatch):
+    game_dir = make_game(tmp_path, monkeypatch)
+    with open(os.path.join(game_dir, "probe.py"), "w") as f:
+        f.write(PRELOAD_PROBE)
+    gm = GameManager(port_ranges=[(9890, 9900)], port_quarantine=0, warm_pool_max=1,
+                     limits={"memory_mb": 512, "open_files": 64, "nice": 3})
+    config = {"version": "1", "preload_modules": ["probe"], "limits": {"open_files": 48}}
+    rooms = []
+    try:
+        for host in ("h1", "h2"): # the first start teaches the pool; the second runs on a worker
+            if host == "h2":
+                assert wait_for(lambda: gm.warm_pool.idle_count(("g", "1")) == 1)
+                os.remove(os.path.join(game_dir, "limits.json"))
+            rooms.append(gm.create_room(host, "g", config))
+            ok, info = gm.start_game(rooms[-1], host)
+            assert ok, info
+        assert gm.warm_pool.hits == 1
+        # The game's own module ran under the lobby's limits already
+        with open(os.path.join(game_dir, "preload_limits.json")) as f:
+            preload = json.load(f)
+        assert preload == {"nofile": 64, "nice": os.nice(0) + 3}
+        # The match tightened them, and its nice was not added twice
+        assert wait_for(lambda: os.path.exists(os.path.join(game_dir, "limits.json")))
+        time.sleep(0.1)
+        with open(os.path.join(game_dir, "limits.json")) as f:
+            applied = json.load(f)
+        assert applied["nofile"] == 48 and applied["nice"] == os.nice(0) + 3
+    finally:
+        for room_id in rooms:
+            gm.end_game(room_id)
+        gm.shutdown()
+
+@linux_only
+def test_read_proc_usage():
+    cpu, rss = read_proc_usage(os.getpid())
+    assert cpu > 0 and rss > 0
+    assert read_proc_usage(2 ** 22 + 1) is None
+
+class PeerSocket:
+    def __init__(self, ip):
+        self.ip = ip
+
+    def getpeername(self):
+        return (self.ip, 50000)
+
+def test_admin_resources_requires_key_or_loopback():
+    gm = GameManager()
+    request = {FIELD_COMMAND: CMD_ADMIN_RESOURCES}
+    try:
+        open_handler = RequestHandler(None, gm)
+        assert open_handler.handle_request(dict(request), PeerSocket("127.0.0.1"))[FIELD_STATUS] == STATUS_OK
+        assert open_handler.handle_request(dict(request), PeerSocket("10.1.2.3"))[FIELD_STATUS] == STATUS_ERROR
+
+        keyed = RequestHandler(None, gm, admin_key="k")
+        assert keyed.handle_request(dict(request), PeerSocket("127.0.0.1"))[FIELD_STATUS] == STATUS_ERROR
+        response = keyed.handle_request(dict(request, token="k"), PeerSocket("10.1.2.3"))
+        assert response[FIELD_STATUS] == STATUS_OK
+        assert response[FIELD_PAYLOAD] == {"rooms": [], "games": {}}
+    finally:
+        gm.shutdown()
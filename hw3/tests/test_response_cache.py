@@ -0,0 +1,66 @@
+import sys
+import os
+import json
+import struct
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.db_manager import DBManager
+from server.game_manager import GameManager
+from server.request_handler import RequestHandler
+from shared.protocol import *
+
+def decode(response):
+    if "_frame" not in response: # uncached reply
+        return response
+    frame = response["_frame"]
+    (length,) = struct.unpack('>I', frame[:4])
+    assert length == len(frame) - 4
+    return json.loads(frame[4:].decode('utf-8'))
+
+def make_handler(tmp_path):
+    db = DBManager(str(tmp_path))
+    db.add_game_update("dev", {"game_id": "g1", "name": "G1", "version": "1.0.0",
+                               "description": "d", "type": "CLI"})
+    return RequestHandler(db, GameManager())
+
+def request(handler, command, payload):
+    return handler.handle_request({FIELD_COMMAND: command, FIELD_PAYLOAD: payload}, None)
+
+def test_store_list_is_served_from_cache_until_mutation(tmp_path):
+    handler = make_handler(tmp_path)
+    first = request(handler, CMD_STORE_LIST, {})
+    second = request(handler, CMD_STORE_LIST, {})
+    assert first["_frame"] is second["_frame"]
+
+    resp = decode(first)
+    assert resp[FIELD_STATUS] == STATUS_OK
+    assert [g["game_id"] for g in resp[FIELD_PAYLOAD]] == ["g1"]
+
+    handler.db.add_review("g1", "p1", 4, "ok")
+    third = decode(request(handler, CMD_STORE_LIST, {}))
+    assert third[FIELD_REVISION] > resp[FIELD_REVISION]
+    assert len(third[FIELD_PAYLOAD][0]["reviews"]) == 1
+
+def test_revalidation_returns_not_modified(tmp_path):
+    handler = make_handler(tmp_path)
+    resp = decode(request(handler, CMD_GAME_DETAIL, {"game_id": "g1"}))
+    revision = resp[FIELD_REVISION]
+
+    again = decode(request(handler, CMD_GAME_DETAIL, {"game_id": "g1", FIELD_REVISION: revision}))
+    assert again == {FIELD_STATUS: STATUS_NOT_MODIFIED, FIELD_REVISION: revision}
+
+    handler.db.delete_game("dev", "g1")
+    gone = decode(request(handler, CMD_GAME_DETAIL, {"game_id": "g1", FIELD_REVISION: revision}))
+    assert gone[FIELD_STATUS] == STATUS_ERROR
+
+def test_unknown_or_invalid_game_ids_are_not_cached(tmp_path):
+    handler = make_handler(tmp_path)
+    resp = request(handler, CMD_GAME_DETAIL, {"game_id": ["g1"]})
+    assert resp[FIELD_STATUS] == STATUS_ERROR
+    for i in range(1000):
+        resp = decode(request(handler, CMD_GAME_DETAIL, {"game_id": f"nope{i}"}))
+        assert resp[FIELD_STATUS] == STATUS_ERROR
+    assert decode(request(handler, CMD_GAME_DETAIL, {"game_id": "g1"}))[FIELD_STATUS] == STATUS_OK
+    assert len(handler.response_cache._entries[1]) == 1
@@ -0,0 +1,82 @@
+import sys
+import os
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.game_manager import GameManager
+from server.request_handler import RequestHandler
+from shared.protocol import *
+
+def make_rooms(gm):
+    """Rooms 1..6 alternating between games a and b, hosted by h1..h6."""
+    return [gm.create_room(f"h{i}", "a" if i % 2 else "b", {}) for i in range(1, 7)]
+
+def ids(rooms):
+    return [r["id"] for r in rooms]
+
+def test_filters_by_game_and_status():
+    gm = GameManager()
+    make_rooms(gm)
+    assert ids(gm.list_rooms()) == ["1", "2", "3", "4", "5", "6"]
+    assert ids(gm.list_rooms(game_id="a")) == ["1", "3", "5"]
+    with gm.rooms["3"].lock:
+        gm._set_status(gm.rooms["3"], "PLAYING")
+    assert ids(gm.list_rooms(status="PLAYING")) == ["3"]
+    assert ids(gm.list_rooms(game_id="a", status="WAITING")) == ["1", "5"]
+    assert gm.list_rooms(game_id="missing") == []
+    # Back to WAITING (failed start) keeps the listing in room order
+    with gm.rooms["3"].lock:
+        gm._set_status(gm.rooms["3"], "WAITING")
+    assert ids(gm.list_rooms(game_id="a", status="WAITING")) == ["1", "3", "5"]
+    gm.shutdown()
+
+def test_cursor_pagination():
+    gm = GameManager()
+    make_rooms(gm)
+    page, cursor = gm.page_rooms(limit=4)
+    assert ids(page) == ["1", "2", "3", "4"] and cursor == 4
+    page, cursor = gm.page_rooms(cursor=cursor, limit=4)
+    assert ids(page) == ["5", "6"] and cursor is None
+    # A room closed between pages does not shift the next page
+    page, cursor = gm.page_rooms(game_id="b", limit=1)
+    assert ids(page) == ["2"]
+    gm.end_game("4")
+    page, cursor = gm.page_rooms(game_id="b", cursor=cursor, limit=1)
+    assert ids(page) == ["6"] and cursor is None
+    gm.shutdown()
+
+def test_end_game_clears_indexes():
+    gm = GameManager()
+    room_ids = make_rooms(gm)
+    gm.join_room(room_ids[0], "p")
+    for room_id in room_ids:
+        gm.end_game(room_id)
+    assert gm._numbers == [] and gm._by_game == {} and gm._by_status == {} and gm._by_player == {}
+    gm.shutdown()
+
+def test_disconnect_touches_only_own_rooms():
+    gm = GameManager()
+    room_ids = make_rooms(gm)
+    gm.join_room(room_ids[1], "h1")
+    gm.join_room(room_ids[2], "p")
+    gm.handle_player_disconnect("h1")
+    assert "1" not in gm.rooms                # hosted: closed
+    assert gm.rooms["2"].players == ["h2"]    # joined: left
+    assert gm.rooms["3"].players == ["h3", "p"]
+    assert "h1" not in gm._by_player and gm._by_player["p"] == {"3"}
+    gm.shutdown()
+
+def test_room_list_request_pages():
+    gm = GameManager()
+    make_rooms(gm)
+    handler = RequestHandler(None, gm)
+    try:
+        resp = handler.handle_room_list({"game_id": "a", "limit": 2}, None)
+        assert ids(resp[FIELD_PAYLOAD]) == ["1", "3"] and resp["next_cursor"] == 3
+        resp = handler.handle_room_list({"game_id": "a", "limit": 2, "cursor": 3}, None)
+        assert ids(resp[FIELD_PAYLOAD]) == ["5"] and resp["next_cursor"] is None
+        assert handler.handle_room_list({"cursor": "x"}, None)[FIELD_STATUS] == STATUS_ERROR
+    finally:
+        handler.matchmaker.stop()
+        gm.shutdown()
@@ -0,0 +1,52 @@
+import sys
+import os
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.db_manager import DBManager
+from server.search_index import SearchIndex
+
+def game(game_id, name, description="", type_="CLI", reviews=()):
+    return {"game_id": game_id, "name": name, "description": description, "type": type_,
+            "reviews": [{"user": "u", "rating": 5, "comment": c} for c in reviews]}
+
+def test_ranking_prefix_and_pagination():
+    index = SearchIndex()
+    index.update_game("a", game("a", "Space Chess", "turn based"))
+    index.update_game("b", game("b", "Chess Arena", "chess with friends"))
+    index.update_game("c", game("c", "Checkers", "board game"))
+
+    total, ids = index.search("chess")
+    assert total == 2 and ids == ["b", "a"] # name + description beats name only
+    assert index.search("che")[0] == 3      # prefix matches Checkers too
+    assert index.search("ch arena")[1] == ["b"]
+    assert index.search("chess", offset=1, limit=1) == (2, ["a"])
+    assert index.search("nothing") == (0, [])
+
+def test_incremental_updates_and_reviews():
+    index = SearchIndex()
+    index.update_game("a", game("a", "Snake", reviews=["addictive fun"]))
+    assert index.search("addictive") == (0, [])
+    assert index.search("addictive", include_reviews=True) == (1, ["a"])
+
+    index.update_game("a", game("a", "Python", reviews=["addictive fun"]))
+    assert index.search("snake") == (0, [])
+    assert index.search("pyth") == (1, ["a"])
+
+    index.remove_game("a")
+    assert index.search("python") == (0, [])
+    assert index._vocab == []
+
+def test_db_manager_keeps_index_in_sync(tmp_path):
+    db = DBManager(str(tmp_path))
+    db.add_game_update("dev", {"game_id": "g1", "name": "Tetris", "version": "1.0.0",
+                               "description": "falling blocks", "type": "GUI"})
+    db.add_review("g1", "p1", 5, "classic")
+    assert db.search_games("block")[1][0]["game_id"] == "g1"
+    assert db.search_games("classic", include_reviews=True)[0] == 1
+
+    # Index is rebuilt from games.json on startup
+    assert DBManager(str(tmp_path)).search_games("tetris")[0] == 1
+    db.delete_game("dev", "g1")
+    assert db.search_games("tetris") == (0, [])
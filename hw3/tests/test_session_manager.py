@@ -0,0 +1,70 @@
+import sys
+import os
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.db_manager import DBManager
+from server.game_manager import GameManager
+from server.request_handler import RequestHandler
+from server.session_manager import SessionRegistry, TokenSigner
+from shared.protocol import *
+
+def test_tokens_are_signed_and_expire():
+    signer = TokenSigner(b"k" * 32)
+    token = signer.issue("alice:1", "players", time.time() + 60)
+    assert signer.verify(token) == ("alice:1", "players")
+    assert signer.verify(token, now=time.time() + 120) is None
+    assert TokenSigner(b"x" * 32).verify(token) is None
+    assert signer.verify(token[:-1] + ("0" if token[-1] != "0" else "1")) is None
+    assert signer.verify("alice") is None
+
+def test_registry_indexes_by_socket_and_user():
+    registry = SessionRegistry()
+    sock_a, sock_b = object(), object()
+    session = registry.create("alice", "players", sock_a)
+    assert registry.get_by_sock(sock_a) is session
+    assert registry.get_by_user("alice") is session
+    assert registry.create("alice", "players", sock_b) is None # double login
+    assert registry.online_users() == ["alice"]
+
+    assert registry.remove_by_sock(sock_a) is session
+    assert "alice" not in registry
+    assert registry.remove_by_sock(sock_a) is None
+
+def test_expired_session_can_be_replaced():
+    registry = SessionRegistry(ttl=-1)
+    registry.create("alice", "players", object())
+    assert registry.online_users() == []
+    assert registry.create("alice", "players", object()) is not None
+
+def test_handler_requires_signed_token(tmp_path):
+    db = DBManager(str(tmp_path), kdf_iterations=1000, hash_workers=0)
+    db.add_game_update("dev", {"game_id": "g1", "name": "G1", "version": "1.0.0",
+                               "description": "", "type": "CLI"})
+    handler = RequestHandler(db, GameManager())
+    sock = object()
+
+    def request(command, payload, token=None):
+        req = {FIELD_COMMAND: command, FIELD_PAYLOAD: payload}
+        if token:
+            req[FIELD_TOKEN] = token
+        return handler.handle_request(req, sock)
+
+    request(CMD_PLAYER_REGISTER, {"username": "p1", "password": "pw"})
+    token = request(CMD_PLAYER_LOGIN, {"username": "p1", "password": "pw"})[FIELD_TOKEN]
+
+    # The old scheme (token == username) and forged payload users are rejected
+    assert request(CMD_ROOM_CREATE, {"game_id": "g1"}, token="p1")[FIELD_STATUS] == STATUS_ERROR
+    assert request(CMD_ROOM_CREATE, {"game_id": "g1", "_user": "p1"})[FIELD_STATUS] == STATUS_ERROR
+    resp = request(CMD_ROOM_CREATE, {"game_id": "g1"}, token=token)
+    assert resp[FIELD_STATUS] == STATUS_OK
+    assert handler.gm.rooms[resp[FIELD_PAYLOAD]["room_id"]].host == "p1"
+
+    # Player tokens do not grant developer commands
+    assert request(CMD_GAME_LIST_MY, {}, token=token)[FIELD_STATUS] == STATUS_ERROR
+
+    handler.handle_disconnect(sock)
+    assert handler.sessions.online_users() == []
+    assert handler.gm.rooms == {}
@@ -0,0 +1,144 @@
+import sys
+import os
+import shutil
+import socket
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from server.game_manager import GameManager
+from server.warm_pool import WarmPool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+class FakeProcess:
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+class FakeWorker:
+    def __init__(self, key):
+        self.key = key
+        self.process = FakeProcess()
+
+    def alive(self):
+        return self.process.poll() is None
+
+def make_pool(**kwargs):
+    spawned, closed = [], []
+
+    def spawn(key):
+        worker = FakeWorker(key)
+        spawned.append(worker)
+        return worker
+
+    pool = WarmPool(spawn, closed.append, refill_interval=0.02, **kwargs)
+    return pool, spawned, closed
+
+def test_pool_size_follows_demand():
+    pool, spawned, closed = make_pool(max_size=3, headroom=1.0, window=0.5)
+    key = ("g", "1.0")
+    try:
+        assert pool.take(key) is None # never started: nothing pre-spawned
+        for _ in range(5):
+            pool.record_start(key)
+        assert pool.target_size(key) == 3 # clamped to max_size
+        assert wait_for(lambda: pool.idle_count(key) == 3)
+        worker = pool.take(key)
+        assert worker is not None and worker.key == key
+        # No starts within the window: the pool drains
+        assert wait_for(lambda: pool.idle_count(key) == 0)
+        assert len(closed) >= 2 and worker not in closed
+    finally:
+        pool.shutdown()
+
+def test_take_skips_dead_workers():
+    pool, spawned, closed = make_pool(max_size=2, headroom=1.0)
+    key = ("g", "1.0")
+    try:
+        pool.record_start(key)
+        pool.record_start(key)
+        assert wait_for(lambda: pool.idle_count(key) == 2)
+        first = pool._idle[key][0]
+        first.process.returncode = 1
+        worker = pool.take(key)
+        assert worker is not None and worker is not first
+        assert first in closed
+    finally:
+        pool.shutdown()
+
+def test_invalidate_discards_workers_of_old_version():
+    pool, spawned, closed = make_pool(max_size=2, headroom=1.0)
+    old, other = ("g", "1.0"), ("h", "1.0")
+    try:
+        for key in (old, other):
+            pool.record_start(key)
+        assert wait_for(lambda: pool.idle_count(old) == 1 and pool.idle_count(other) == 1)
+        pool.invalidate("g")
+        assert pool.idle_count(old) == 0 and pool.target_size(old) == 0
+        assert pool.idle_count(other) == 1
+        assert [w.key for w in closed] == [old]
+    finally:
+        pool.shutdown()
+    assert len(closed) == len(spawned) # shutdown closes the rest
+
+@pytest.mark.skipif(os.name == 'nt', reason="warm pool needs pass_fds")
+@pytest.mark.parametrize("bind_zero", [False, True])
+def test_start_game_uses_pooled_worker(tmp_path, monkeypatch, bind_zero):
+    shutil.copytree(os.path.join(ROOT, "games", "template"),
+                    os.path.join(str(tmp_path), "server_data", "games", "tmpl"))
+    monkeypatch.chdir(tmp_path)
+    gm = GameManager(port_ranges=[(9910, 9920)], port_quarantine=0,
+                     bind_zero=bind_zero, warm_pool_max=1)
+    config = {"version": "1.0"}
+    rooms = []
+    try:
+        # First start is cold and teaches the pool that "tmpl" is in demand
+        rooms.append(gm.create_room("host", "tmpl", config))
+        ok, info = gm.start_game(rooms[-1], "host")
+        assert ok, info
+        assert wait_for(lambda: gm.warm_pool.idle_count(("tmpl", "1.0")) == 1)
+
+        rooms.append(gm.create_room("host2", "tmpl", config))
+        ok, info = gm.start_game(rooms[-1], "host2")
+        assert ok, info
+        assert gm.warm_pool.hits == 1
+        # Without bind-zero the port is returned before the game listens
+        def connects():
+            try:
+                with socket.create_connection(("127.0.0.1", info["port"]), timeout=5) as s:
+                    return s.recv(64).startswith(b"Welcome")
+            except ConnectionRefusedError:
+                return False
+        assert wait_for(connects)
+    finally:
+        for room_id in rooms:
+            gm.end_game(room_id)
+        gm.shutdown()
+
+def test_preload_modules_are_limited_to_an_allowlist_and_the_game(tmp_path, monkeypatch):
+    game_dir = os.path.join(str(tmp_path), "server_data", "games", "g")
+    os.makedirs(os.path.join(game_dir, "assets"))
+    open(os.path.join(game_dir, "rules.py"), "w").close()
+    open(os.path.join(game_dir, "assets", "__init__.py"), "w").close()
+    monkeypatch.chdir(tmp_path)
+    gm = GameManager()
+    try:
+        requested = ["math", "rules", "assets.maps", "os", "subprocess", "../evil", "", 7, "numpy"]
+        assert gm._allowed_preloads("g", requested) == ["math", "rules", "assets.maps", "numpy"]
+        assert gm._allowed_preloads("g", "math") == []
+    finally:
+        gm.shutdown()